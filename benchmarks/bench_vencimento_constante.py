@@ -0,0 +1,41 @@
+"""
+Compara o laço original (um filtro por Data Base) com calcular_taxas_vencimento_constante
+sobre um histórico sintético completo. Uso: python -m benchmarks.bench_vencimento_constante
+"""
+import time
+import pandas as pd
+from benchmarks.dados_sinteticos import gerar_tesouro_sintetico
+from utils.tesouro_utils import calcular_taxas_vencimento_constante
+
+def _juro_10a_laco(df_tesouro, tipo):
+    # Implementação anterior, mantida aqui apenas como referência de desempenho e de resultado
+    df_tipo = df_tesouro[df_tesouro['Tipo Titulo'] == tipo].copy()
+    resultados = {}
+    for data_base in df_tipo['Data Base'].unique():
+        df_dia = df_tipo[df_tipo['Data Base'] == data_base]
+        vencimentos_do_dia = df_dia['Data Vencimento'].unique()
+        if len(vencimentos_do_dia) > 0:
+            target_10y = pd.to_datetime(data_base) + pd.DateOffset(years=10)
+            venc_10y = min(vencimentos_do_dia, key=lambda d: abs(d - target_10y))
+            resultados[data_base] = df_dia[df_dia['Data Vencimento'] == venc_10y]['Taxa Compra Manha'].iloc[0]
+    return pd.Series(resultados).sort_index()
+
+def _cronometrar(func, *args):
+    inicio = time.perf_counter()
+    resultado = func(*args)
+    return resultado, time.perf_counter() - inicio
+
+def main():
+    # Ordenado por vencimento para o laço desempatar como o motor (vencimento mais curto primeiro)
+    df = gerar_tesouro_sintetico(anos=24).sort_values('Data Vencimento', kind='stable')
+    print(f"Base sintética: {len(df):,} linhas, {df['Data Base'].nunique():,} datas-base")
+    for tipo in ['Tesouro IPCA+ com Juros Semestrais', 'Tesouro Prefixado']:
+        serie_laco, t_laco = _cronometrar(_juro_10a_laco, df, tipo)
+        df_vetor, t_vetor = _cronometrar(calcular_taxas_vencimento_constante, df, tipo, (10,))
+        iguais = serie_laco.equals(df_vetor[10].rename(None))
+        print(f"{tipo}: laço {t_laco:.2f}s | vetorizado {t_vetor:.3f}s | {t_laco / t_vetor:.0f}x | resultados idênticos: {iguais}")
+    _, t_multi = _cronometrar(calcular_taxas_vencimento_constante, df, 'Tesouro IPCA+ com Juros Semestrais', (2, 5, 10, 20))
+    print(f"NTN-B 2/5/10/20 anos em uma passada: {t_multi:.3f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Teste de carga com várias sessões abertas das páginas do app, via streamlit.testing (AppTest), sobre dados reproduzidos.
+Cada sessão abre a página e executa o seu roteiro de interações; para cada número de sessões são medidos o
+tempo de rerun (p50/p95), o RSS do processo por sessão e o tamanho do st.session_state de cada sessão.
+Um passo conta como erro se levanta exceção, se a página mostra st.error ou st.warning ou se alguma chamada
+ficou sem gravação na reprodução (mesmo que o carregador a tenha engolido). Uma página cujo aquecimento
+termina com erro ou sem nenhum gráfico ou tabela não é medida.
+O AppTest troca o runtime global do Streamlit a cada execução, então os reruns das sessões são intercalados,
+não paralelos: a medida mostra o efeito das sessões vivas (memória, caches e registro compartilhados), não a
+disputa de CPU entre scripts simultâneos.
+Uso: python -m benchmarks.carga [filtro ...] [--sessoes 1 5 10] [--transporte reproduzir|real|gravar] [--saida arquivo.json]
+As gravações vêm de `python -m benchmarks.transporte gravar`, que também conduz estes roteiros com --transporte gravar.
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import tempfile
+import gc
+import numpy as np
+from datetime import timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMEOUT_RERUN = 600
+
+def _vencimento_alternativo(at):
+    multiselect = at.multiselect(key='multi_venc_ntnb')
+    return multiselect.set_value(multiselect.options[-3:])
+
+def _data_posterior(at, chave, dias):
+    campo = at.date_input(key=chave)
+    return campo.set_value(campo.value + timedelta(days=dias))
+
+def _clicar(at, rotulo):
+    return next(botao for botao in at.button if botao.label == rotulo).click()
+
+def _analisar_ratio(at):
+    at.text_input(key='ticker_a_key').input('PETR4.SA')
+    at.text_input(key='ticker_b_key').input('VALE3.SA')
+    at.number_input(key='window_size_key').set_value(120)
+    return _clicar(at, "Analisar Ratio")
+
+# --- Roteiros: página -> interações executadas após a primeira renderização (cada uma gera um rerun) ---
+ROTEIROS = {
+    'App.py': [],
+    'pages/1_NTN-Bs.py': [_vencimento_alternativo, lambda at: at.radio(key='metrica_ntnb').set_value('PU')],
+    'pages/2_Curva_de_Juros.py': [lambda at: _data_posterior(at, 'data_curva_nss', -30),
+                                  lambda at: at.multiselect(key='vertices_nss').set_value([252, 1260, 2520])],
+    'pages/3_Crédito_Privado.py': [],
+    'pages/4_Econômicos_BR.py': [lambda at: _data_posterior(at, 'bcb_start', 365)],
+    'pages/5_Commodities.py': [lambda at: at.radio(key='categoria_commodities').set_value('Agricultura'),
+                               lambda at: at.toggle(key='modo_leve_commodities').set_value(False)],
+    'pages/6_Internacional.py': [],
+    'pages/7_Ações_BR.py': [_analisar_ratio, lambda at: _clicar(at, "Analisar Amplitude do Mercado (Lento na 1ª vez)")],
+}
+# Páginas só de texto: o aquecimento não exige gráficos nem tabelas
+SEM_DADOS = {'App.py'}
+
+def _rss_mb():
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for linha in f:
+                if linha.startswith('VmRSS:'): return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _tamanho_estado_kb(at):
+    total = 0
+    for _, valor in at.session_state.items():
+        try:
+            total += len(pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            pass
+    return total / 1e3
+
+def _abrir_sessao(pagina, segredos):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(RAIZ, pagina), default_timeout=TIMEOUT_RERUN)
+    for chave, valor in segredos.items(): at.secrets[chave] = valor
+    return at
+
+def _falhas_renderizadas(at):
+    return [f"{tipo}: {elemento.value}" for tipo, elementos in (('exceção', at.exception), ('st.error', at.error), ('st.warning', at.warning))
+            for elemento in elementos]
+
+def _tem_dados(at):
+    return bool(at.get('plotly_chart')) or bool(at.dataframe)
+
+def _executar_passo(at, passo):
+    """Aplica a interação e roda o rerun. Retorna (segundos, erro)."""
+    from utils.transporte_utils import gravacoes_ausentes
+    ausentes = len(gravacoes_ausentes())
+    try:
+        alvo = passo(at)
+        inicio = time.perf_counter()
+        alvo.run()
+        segundos = time.perf_counter() - inicio
+    except Exception as e:
+        return None, repr(e)
+    falhas = [f"sem gravação: {identificador}" for identificador in gravacoes_ausentes()[ausentes:]] + _falhas_renderizadas(at)
+    return segundos, (falhas[0] if falhas else None)
+
+def _percentil(valores, p):
+    return float(np.percentile(valores, p)) if valores else float('nan')
+
+def medir_pagina(pagina, sessoes, segredos):
+    """
+    Abre `sessoes` sessões da página, que ficam vivas até o fim (como abas abertas), e as conduz pelo roteiro
+    intercaladas: o passo k de todas as sessões roda antes do passo k+1 de qualquer uma.
+    """
+    gc.collect()
+    rss_inicial = _rss_mb()
+    abertas = [_abrir_sessao(pagina, segredos) for _ in range(sessoes)]
+    ativas, tempos, erros = list(abertas), [], []
+    for passo in [lambda at: at] + ROTEIROS[pagina]:
+        for at in list(ativas):
+            segundos, erro = _executar_passo(at, passo)
+            if segundos is not None: tempos.append(segundos)
+            if erro:
+                erros.append(erro)
+                ativas.remove(at)
+    gc.collect()
+    rss_final = _rss_mb()
+    return {
+        'sessoes': sessoes, 'reruns': len(tempos),
+        'p50_s': _percentil(tempos, 50), 'p95_s': _percentil(tempos, 95), 'max_s': max(tempos, default=float('nan')),
+        'rss_por_sessao_mb': (rss_final - rss_inicial) / sessoes, 'rss_total_mb': rss_final,
+        'estado_por_sessao_kb': sum(_tamanho_estado_kb(at) for at in abertas) / sessoes,
+        'com_dados': sum(_tem_dados(at) for at in ativas),
+        'erros': len(erros), 'primeiro_erro': erros[0][:200] if erros else None,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.carga', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('filtros', nargs='*', help="Roda só as páginas cujo caminho contém algum dos filtros.")
+    parser.add_argument('--sessoes', type=int, nargs='+', default=[1, 5, 10], help="Níveis de concorrência.")
+    parser.add_argument('--transporte', choices=('reproduzir', 'real', 'gravar'), default='reproduzir')
+    parser.add_argument('--fixtures', help="Diretório das gravações (padrão: MOBBT_FIXTURES ou .mobbt_fixtures).")
+    parser.add_argument('--latencia-ms', type=float, default=0, help="Latência simulada por requisição na reprodução.")
+    parser.add_argument('--banda-kbps', type=float, default=0, help="Banda simulada na reprodução (0 = sem limite).")
+    parser.add_argument('--saida', help="Grava as medidas em JSON.")
+    args = parser.parse_args(argv)
+
+    # Antes de importar utils: dados em diretório descartável e fontes pelo transporte escolhido
+    os.environ.setdefault('MOBBT_DIRETORIO_DADOS', tempfile.mkdtemp(prefix='mobbt_carga_'))
+    os.environ['MOBBT_TRANSPORTE'] = args.transporte
+    os.environ['MOBBT_REPLAY_LATENCIA_MS'] = str(args.latencia_ms)
+    os.environ['MOBBT_REPLAY_BANDA_KBPS'] = str(args.banda_kbps)
+    if args.fixtures: os.environ['MOBBT_FIXTURES'] = os.path.abspath(args.fixtures)
+    if RAIZ not in sys.path: sys.path.insert(0, RAIZ)
+    segredos = {'FRED_API_KEY': os.environ.get('FRED_API_KEY') or ('reproducao' if args.transporte == 'reproduzir' else '')}
+
+    paginas = [p for p in ROTEIROS if not args.filtros or any(filtro in p for filtro in args.filtros)]
+    medidas, sem_medida = {}, []
+    print(f"{'página':<30} {'sessões':>7} {'reruns':>6} {'p50 (s)':>8} {'p95 (s)':>8} {'máx (s)':>8} {'RSS/sessão (MB)':>15} {'estado (KB)':>11} {'erros':>5}")
+    for pagina in paginas:
+        # Aquecimento: a primeira sessão paga a carga a frio (downloads, caches); não entra nos percentis
+        inicio = time.perf_counter()
+        aquecimento = medir_pagina(pagina, 1, segredos)
+        erro = f"  erro: {aquecimento['primeiro_erro'][:80]}" if aquecimento['erros'] else ''
+        print(f"{pagina:<30} aquecimento {time.perf_counter() - inicio:.2f}s{erro}", flush=True)
+        if aquecimento['erros'] or (pagina not in SEM_DADOS and not aquecimento['com_dados']):
+            # Sem dados a página renderiza só avisos, e medir isso esconderia a falha atrás de tempos baixos
+            motivo = aquecimento['primeiro_erro'] or 'nenhum gráfico ou tabela renderizado'
+            print(f"{'':<30} página não medida: {motivo[:80]}", flush=True)
+            medidas[pagina] = {'erro': motivo}
+            sem_medida.append(pagina)
+            continue
+        medidas[pagina] = []
+        for sessoes in args.sessoes:
+            m = medir_pagina(pagina, sessoes, segredos)
+            medidas[pagina].append(m)
+            print(f"{'':<30} {m['sessoes']:>7} {m['reruns']:>6} {m['p50_s']:>8.3f} {m['p95_s']:>8.3f} {m['max_s']:>8.3f} {m['rss_por_sessao_mb']:>15.1f} {m['estado_por_sessao_kb']:>11.1f} {m['erros']:>5}", flush=True)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f: json.dump(medidas, f, indent=2, ensure_ascii=False)
+        print(f"Medidas salvas em {args.saida}")
+    return 1 if sem_medida or any(m['erros'] for lista in medidas.values() if isinstance(lista, list) for m in lista) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
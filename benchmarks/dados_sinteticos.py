@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+# --- Dados sintéticos de tamanho realista para os benchmarks (sem acesso à rede) ---
+TIPOS_TESOURO = {
+    # tipo: (anos entre vencimentos, prazo máximo na emissão em anos)
+    'Tesouro Prefixado': (1, 8),
+    'Tesouro Prefixado com Juros Semestrais': (2, 12),
+    'Tesouro IPCA+': (5, 35),
+    'Tesouro IPCA+ com Juros Semestrais': (2, 40),
+    'Tesouro Selic': (1, 6),
+}
+
+def gerar_tesouro_sintetico(anos=20, fim='2025-12-31', semente=0):
+    """Frame no formato de obter_dados_tesouro: uma linha por título ativo por dia útil."""
+    rng = np.random.default_rng(semente)
+    datas = pd.bdate_range(end=fim, periods=252 * anos)
+    partes = []
+    for tipo, (passo, prazo_max) in TIPOS_TESOURO.items():
+        anos_venc = range(datas[0].year, datas[-1].year + prazo_max + 1, passo)
+        for ano in anos_venc:
+            vencimento = pd.Timestamp(ano, 1 if 'Prefixado' in tipo else 5, 1 if 'Prefixado' in tipo else 15)
+            emissao = vencimento - pd.DateOffset(years=prazo_max)
+            datas_ativas = datas[(datas >= emissao) & (datas < vencimento)]
+            if datas_ativas.empty: continue
+            nivel = 10.0 if 'Prefixado' in tipo else 5.0
+            taxa = nivel + np.cumsum(rng.normal(0, 0.03, len(datas_ativas)))
+            partes.append(pd.DataFrame({
+                'Tipo Titulo': tipo,
+                'Data Vencimento': vencimento,
+                'Data Base': datas_ativas,
+                'Taxa Compra Manha': taxa.round(2),
+                'Taxa Venda Manha': (taxa + 0.01).round(2),
+                'PU Compra Manha': (1000 * (1 + taxa / 100) ** -((vencimento - datas_ativas).days / 365)).round(2),
+            }))
+    df = pd.concat(partes, ignore_index=True).sample(frac=1, random_state=semente).reset_index(drop=True)
+    df['Tipo Titulo'] = df['Tipo Titulo'].astype('category')
+    return df
+
+def gerar_precos_sinteticos(dias=4000, tickers=800, fim='2025-12-31', semente=0):
+    """Matriz float32 datas x tickers (.SA) no formato do armazém de preços, com estreias ao longo do histórico e lacunas."""
+    rng = np.random.default_rng(semente)
+    datas = pd.bdate_range(end=fim, periods=dias)
+    retornos = rng.normal(0.0003, 0.02, (dias, tickers)) + rng.normal(0, 0.01, (dias, 1))
+    precos = (20 * np.exp(np.cumsum(retornos, axis=0))).astype('float32')
+    estreias = rng.integers(0, dias // 2, tickers) * (rng.random(tickers) < 0.4)
+    precos[np.arange(dias)[:, None] < estreias[None, :]] = np.nan
+    precos[rng.random((dias, tickers)) < 0.005] = np.nan
+    return pd.DataFrame(precos, index=datas, columns=[f"TK{i:03d}3.SA" for i in range(tickers)])
+
+def gerar_commodities_sinteticas(dias=6000, fim='2025-12-31', semente=0):
+    """Dicionário categoria -> DataFrame, no formato de carregar_dados_commodities."""
+    from utils.commodities_utils import CATEGORIZED_COMMODITIES
+    rng = np.random.default_rng(semente)
+    datas = pd.bdate_range(end=fim, periods=dias)
+    return {
+        categoria: pd.DataFrame({nome: 50 * np.exp(np.cumsum(rng.normal(0, 0.015, dias))) for nome in nomes}, index=datas)
+        for categoria, nomes in CATEGORIZED_COMMODITIES.items()
+    }
+
+def gerar_idex_sintetico(dias=1500, emissores=300, fim='2025-12-31', semente=0):
+    """Aba 'Detalhado' sintética (uma linha por emissor por dia), com as colunas de geral/low_rated e de infra."""
+    rng = np.random.default_rng(semente)
+    datas = pd.bdate_range(end=fim, periods=dias)
+    nomes = np.array([f"EMISSOR {i:03d}" for i in range(emissores)] + ['AMERICANAS SA', 'Aeris'])
+    n = len(nomes)
+    pesos = rng.dirichlet(np.ones(n), dias).ravel() * 100
+    spreads = np.abs(rng.normal(0.02, 0.01, (dias, n))).ravel()
+    return pd.DataFrame({
+        'Data': np.repeat(datas, n),
+        'Emissor': np.tile(nomes, dias),
+        'Peso no índice (%)': pesos,
+        'Spread de compra (%)': spreads,
+        'MID spread (Bps/NTNB)': spreads * 10000,
+    })
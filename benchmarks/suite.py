@@ -0,0 +1,147 @@
+"""
+Suíte de benchmarks dos cálculos (calcular_*) e gráficos (gerar_grafico_*) sobre dados sintéticos, sem rede.
+Mede tempo (melhor de N repetições), pico de memória (tracemalloc) e tamanho do JSON das figuras, e compara
+com a linha de base salva em benchmarks/linha_de_base.json.
+Uso: python -m benchmarks.suite [filtro ...] [--repeticoes N] [--salvar-base] [--tolerancia 0.3]
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import tracemalloc
+
+# Os cálculos incrementais persistem estado: a suíte usa um diretório de dados descartável
+os.environ.setdefault('MOBBT_DIRETORIO_DADOS', tempfile.mkdtemp(prefix='mobbt_bench_'))
+
+import pandas as pd
+import plotly.graph_objects as go
+from benchmarks.dados_sinteticos import gerar_tesouro_sintetico, gerar_precos_sinteticos, gerar_commodities_sinteticas, gerar_idex_sintetico
+from utils import tesouro_utils, acoes_br_utils, commodities_utils, credito_utils, curva_juros_utils
+from utils.amplitude_utils import reconstruir_amplitude, calcular_indicadores_amplitude
+from utils.ratio_utils import calcular_ranking_pares
+
+ARQUIVO_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'linha_de_base.json')
+TOLERANCIA_JSON = 0.05
+# Diferenças absolutas abaixo destes pisos são ruído de medição, não regressão
+PISOS = {'segundos': 0.01, 'pico_mb': 1.0, 'json_kb': 1.0}
+
+def _sem_cache(funcao):
+    # Funções com st.cache_data ou instrumentadas: mede o cálculo ou o gráfico, não o cache nem a instrumentação
+    return getattr(funcao, '__wrapped__', funcao)
+
+def _metricas_ratio_sem_cache(par, ticker_a, ticker_b, janela):
+    # calcular_metricas_ratio chama preparar_ratio, que tem st.cache_data própria: sem trocá-la pela original,
+    # da segunda repetição em diante o caso mediria um acerto de cache
+    original = acoes_br_utils.preparar_ratio
+    acoes_br_utils.preparar_ratio = _sem_cache(original)
+    try:
+        return _sem_cache(acoes_br_utils.calcular_metricas_ratio)(par, ticker_a, ticker_b, janela)
+    finally:
+        acoes_br_utils.preparar_ratio = original
+
+def _fixtures():
+    tesouro = gerar_tesouro_sintetico(anos=20)
+    precos = gerar_precos_sinteticos(dias=4000, tickers=800)
+    idex = gerar_idex_sintetico()
+    commodities = gerar_commodities_sinteticas()
+    juro_real = _sem_cache(tesouro_utils.calcular_juro_real_10a_br)(tesouro)
+    amplitude = reconstruir_amplitude(precos, 200)[1].dropna()
+    indicadores = calcular_indicadores_amplitude(precos)
+    par = precos.iloc[:, :2].dropna()
+    metricas_ratio = _metricas_ratio_sem_cache(par, par.columns[0], par.columns[1], 252)
+    ntnb = tesouro[tesouro['Tipo Titulo'] == 'Tesouro IPCA+ com Juros Semestrais']
+    spread_idex = _sem_cache(credito_utils.calcular_spread_ponderado)(idex, 'Spread de compra (%)', 'spread')['spread']
+    spreads_idex = pd.DataFrame({'IDEX Geral (Filtrado)': spread_idex, 'IDEX Low Rated (Filtrado)': spread_idex * 1.5})
+    return locals()
+
+def _casos(f):
+    """{nome: função sem argumentos} — cada caso usa apenas fixtures já montadas."""
+    par_a, par_b = f['par'].columns[:2]
+    vencimentos = sorted(f['ntnb']['Data Vencimento'].unique())[-6:]
+    return {
+        'calcular_juro_real_10a_br': lambda: _sem_cache(tesouro_utils.calcular_juro_real_10a_br)(f['tesouro']),
+        'calcular_juro_prefixado_10a_br': lambda: _sem_cache(tesouro_utils.calcular_juro_prefixado_10a_br)(f['tesouro']),
+        'calcular_inflacao_implicita': lambda: _sem_cache(tesouro_utils.calcular_inflacao_implicita)(f['tesouro']),
+        'ajustar_curvas_nss': lambda: _sem_cache(curva_juros_utils.ajustar_curvas)(f['tesouro']),
+        'calcular_dados_amplitude': lambda: reconstruir_amplitude(f['precos'], 200),
+        'calcular_indicadores_amplitude': lambda: calcular_indicadores_amplitude(f['precos']),
+        'calcular_ranking_pares': lambda: _sem_cache(calcular_ranking_pares)(f['precos'].iloc[:, :300]),
+        'calcular_metricas_ratio': lambda: _metricas_ratio_sem_cache(f['par'], par_a, par_b, 120),
+        'calcular_variacao_commodities': lambda: _sem_cache(commodities_utils.calcular_variacao_commodities)(f['commodities']),
+        'calcular_spread_ponderado_idex': lambda: _sem_cache(credito_utils.calcular_spread_ponderado)(f['idex'], 'Spread de compra (%)', 'spread'),
+        'gerar_grafico_juro_real_10a_br': lambda: _sem_cache(tesouro_utils.gerar_grafico_juro_real_10a_br)(f['juro_real']),
+        'gerar_grafico_ntnb_multiplos_vencimentos': lambda: _sem_cache(tesouro_utils.gerar_grafico_ntnb_multiplos_vencimentos)(f['ntnb'], vencimentos, 'Taxa Compra Manha'),
+        'gerar_grafico_amplitude': lambda: _sem_cache(acoes_br_utils.gerar_grafico_amplitude)(f['amplitude'], f['amplitude'].median()),
+        'gerar_grafico_painel_amplitude': lambda: _sem_cache(acoes_br_utils.gerar_grafico_painel_amplitude)(f['indicadores']),
+        'gerar_grafico_ratio': lambda: _sem_cache(acoes_br_utils.gerar_grafico_ratio)(f['metricas_ratio'], par_a, par_b, 252),
+        'gerar_dashboard_commodities': lambda: _sem_cache(commodities_utils.gerar_dashboard_commodities)(f['commodities']),
+        'gerar_dashboard_commodities_leve': lambda: _sem_cache(commodities_utils.gerar_dashboard_commodities)({'Energia': f['commodities']['Energia']}, modo_leve=True),
+        'gerar_grafico_idex': lambda: _sem_cache(credito_utils.gerar_grafico_idex)(f['spreads_idex']),
+    }
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    tracemalloc.start()
+    funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    medida = {'segundos': min(tempos), 'pico_mb': pico / 1e6}
+    if isinstance(resultado, go.Figure):
+        medida['json_kb'] = len(resultado.to_json().encode('utf-8')) / 1e3
+    return medida
+
+def comparar(medida, base, tolerancia):
+    """Lista de métricas que pioraram além da tolerância em relação à linha de base."""
+    if not base: return []
+    limites = {'segundos': tolerancia, 'pico_mb': tolerancia, 'json_kb': TOLERANCIA_JSON}
+    return [metrica for metrica, limite in limites.items()
+            if metrica in medida and metrica in base
+            and medida[metrica] > base[metrica] * (1 + limite) and medida[metrica] - base[metrica] > PISOS[metrica]]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('filtros', nargs='*', help="Roda só os casos cujo nome contém algum dos filtros.")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--tolerancia', type=float, default=0.3, help="Piora relativa aceita em tempo e memória.")
+    parser.add_argument('--salvar-base', action='store_true', help="Grava as medidas como nova linha de base.")
+    args = parser.parse_args(argv)
+
+    base = {}
+    if os.path.exists(ARQUIVO_BASE):
+        with open(ARQUIVO_BASE, 'r', encoding='utf-8') as f: base = json.load(f)
+
+    print("Montando dados sintéticos...", flush=True)
+    casos = _casos(_fixtures())
+    casos = {nome: caso for nome, caso in casos.items() if not args.filtros or any(filtro in nome for filtro in args.filtros)}
+
+    medidas, regressoes = {}, {}
+    print(f"{'caso':<42} {'tempo (s)':>10} {'base':>8} {'pico (MB)':>10} {'base':>8} {'JSON (KB)':>10} {'base':>8}")
+    for nome, caso in casos.items():
+        medidas[nome] = medida = medir(caso, args.repeticoes)
+        anterior = base.get(nome, {})
+        piores = comparar(medida, anterior, args.tolerancia)
+        if piores: regressoes[nome] = piores
+        colunas = []
+        for metrica, casas in (('segundos', 3), ('pico_mb', 1), ('json_kb', 0)):
+            atual = f"{medida[metrica]:>10.{casas}f}" if metrica in medida else f"{'-':>10}"
+            ref = f"{anterior[metrica]:>8.{casas}f}" if metrica in anterior else f"{'-':>8}"
+            colunas.append(f"{atual} {ref}")
+        print(f"{nome:<42} {' '.join(colunas)}{'  <- REGRESSÃO: ' + ', '.join(piores) if piores else ''}", flush=True)
+
+    if args.salvar_base:
+        base.update(medidas)
+        with open(ARQUIVO_BASE, 'w', encoding='utf-8') as f: json.dump(base, f, indent=2, sort_keys=True)
+        print(f"Linha de base salva em {ARQUIVO_BASE}")
+    if regressoes:
+        print(f"{len(regressoes)} caso(s) com regressão além da tolerância.")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
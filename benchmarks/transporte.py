@@ -0,0 +1,98 @@
+"""
+Gravação e reprodução das fontes externas para medições sem rede.
+  gravar [datasets]   roda o pipeline contra as fontes reais, em um diretório de dados vazio, gravando cada resposta;
+                      depois roda de novo no mesmo diretório (caminhos incrementais) e conduz duas vezes os roteiros
+                      das páginas de benchmarks.carga, que pedem séries e tickers fora do pipeline
+  servir              sobe o servidor local de gravações (use MOBBT_TRANSPORTE=reproduzir MOBBT_SERVIDOR_REPLAY=<url>)
+  medir [datasets]    mede carga a frio e atualização do pipeline sobre as gravações, com latência e banda simuladas
+  listar              lista as gravações
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _preparar_ambiente(modo, args):
+    # Antes de importar utils: o diretório de dados e o transporte são lidos na importação
+    os.environ['MOBBT_DIRETORIO_DADOS'] = tempfile.mkdtemp(prefix=f'mobbt_{modo}_')
+    os.environ['MOBBT_TRANSPORTE'] = modo
+    os.environ['MOBBT_INSTRUMENTACAO'] = '0'
+    if args.fixtures: os.environ['MOBBT_FIXTURES'] = os.path.abspath(args.fixtures)
+    if modo == 'reproduzir':
+        os.environ['MOBBT_REPLAY_LATENCIA_MS'] = str(args.latencia_ms)
+        os.environ['MOBBT_REPLAY_BANDA_KBPS'] = str(args.banda_kbps)
+        # A chave não é usada na reprodução, mas a biblioteca do FRED exige uma
+        os.environ.setdefault('FRED_API_KEY', 'reproducao')
+
+def _rodar_pipeline(datasets, forcar, rotulo):
+    from pipeline.grafo import executar_grafo
+    from pipeline.datasets import NOS
+    inicio = time.perf_counter()
+    def _ao_concluir(nome, resultado):
+        detalhe = f"{resultado['segundos']:.2f}s" if resultado['status'] in ('executado', 'inalterado') else (resultado['erro'] or '')
+        print(f"  [{resultado['status']:>10}] {nome:<24} {detalhe}", flush=True)
+    print(f"{rotulo}:")
+    resultados = executar_grafo(NOS, datasets or None, forcar=forcar, ao_concluir=_ao_concluir)
+    print(f"  total: {time.perf_counter() - inicio:.2f}s")
+    return resultados
+
+def _gravar_paginas(rotulo):
+    # Processo novo a cada passada: sem caches em memória, as páginas pedem às fontes o que falta no diretório de dados
+    print(f"{rotulo}:", flush=True)
+    return subprocess.run([sys.executable, '-m', 'benchmarks.carga', '--transporte', 'gravar', '--sessoes', '1'], cwd=RAIZ, env=os.environ.copy()).returncode
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.transporte', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('comando', choices=('gravar', 'servir', 'medir', 'listar'))
+    parser.add_argument('datasets', nargs='*', help="Datasets do pipeline (padrão: todos).")
+    parser.add_argument('--fixtures', help="Diretório das gravações (padrão: MOBBT_FIXTURES ou .mobbt_fixtures).")
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--latencia-ms', type=float, default=0, help="Latência simulada por requisição.")
+    parser.add_argument('--banda-kbps', type=float, default=0, help="Banda simulada em kbit/s (0 = sem limite).")
+    parser.add_argument('--sem-paginas', action='store_true', help="Ao gravar, não conduz os roteiros das páginas.")
+    args = parser.parse_args(argv)
+
+    if args.comando == 'gravar':
+        _preparar_ambiente('gravar', args)
+        falhas = 0
+        for forcar, rotulo in ((True, "Gravando a carga a frio"), (False, "Gravando a atualização")):
+            resultados = _rodar_pipeline(args.datasets, forcar, rotulo)
+            falhas += sum(r['status'] in ('falhou', 'bloqueado') for r in resultados.values())
+        if not args.sem_paginas:
+            for rotulo in ("Gravando as páginas (primeira passada)", "Gravando as páginas (atualização)"):
+                falhas += _gravar_paginas(rotulo) != 0
+        from utils.transporte_utils import CONFIG
+        print(f"Gravações em {CONFIG['fixtures']}")
+        return 1 if falhas else 0
+
+    if args.comando == 'medir':
+        _preparar_ambiente('reproduzir', args)
+        banda = f"{args.banda_kbps:.0f} kbit/s" if args.banda_kbps else "sem limite"
+        print(f"Reprodução com latência de {args.latencia_ms:.0f} ms e banda {banda}")
+        _rodar_pipeline(args.datasets, True, "Carga a frio")
+        _rodar_pipeline(args.datasets, True, "Atualização")
+        return 0
+
+    if args.fixtures: os.environ['MOBBT_FIXTURES'] = os.path.abspath(args.fixtures)
+    from utils.transporte_utils import CONFIG, listar_fixtures, iniciar_servidor_replay
+    if args.comando == 'listar':
+        gravacoes = listar_fixtures()
+        for meta in gravacoes:
+            print(f"{meta['fonte'] or '-':<10} {meta['tipo']:<7} {meta['bytes'] / 1e3:>10.1f} KB  {meta['identificador']}")
+        print(f"{len(gravacoes)} gravação(ões) em {CONFIG['fixtures']}")
+        return 0
+
+    servidor, url = iniciar_servidor_replay(args.porta, args.latencia_ms, args.banda_kbps)
+    print(f"Servindo {CONFIG['fixtures']} em {url} (Ctrl+C encerra)", flush=True)
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
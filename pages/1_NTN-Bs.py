@@ -5,9 +5,9 @@ import plotly.express as px
 # --- Imports da nova estrutura utils ---
 from utils.tesouro_utils import (
     obter_dados_tesouro,
-    calcular_inflacao_implicita,
-    calcular_juro_real_10a_br,  # Renomeada
-    calcular_juro_prefixado_10a_br, # Nova
+    obter_inflacao_implicita,
+    obter_juro_real_10a_br,  # Renomeada
+    obter_juro_prefixado_10a_br, # Nova
     gerar_grafico_ntnb_multiplos_vencimentos,
     gerar_grafico_juro_prefixado_10a_br, # Nova
 )
@@ -61,7 +61,7 @@ if not df_tesouro.empty:
     col1, col2, col3 = st.columns(3)
     with col1:
         st.subheader("Inflação Implícita (Breakeven)")
-        df_breakeven = calcular_inflacao_implicita(df_tesouro)
+        df_breakeven = obter_inflacao_implicita(df_tesouro)
         if not df_breakeven.empty:
             fig_breakeven = px.bar(df_breakeven, y='Inflação Implícita (% a.a.)', text_auto='.2f', title='Inflação Implícita por Vencimento').update_traces(textposition='outside')
             fig_breakeven.update_layout(title_x=0, template='plotly_dark')
@@ -71,7 +71,7 @@ if not df_tesouro.empty:
             
     with col2:
         st.subheader("Juro Prefixado de ~10 Anos")
-        df_juro_prefixado_br = calcular_juro_prefixado_10a_br(df_tesouro)
+        df_juro_prefixado_br = obter_juro_prefixado_10a_br(df_tesouro)
         if not df_juro_prefixado_br.empty:
             fig_juro_10a = gerar_grafico_juro_prefixado_10a_br(df_juro_prefixado_br)
             st.plotly_chart(fig_juro_10a, use_container_width=True, config={'modeBarButtonsToRemove': ['autoscale']})
@@ -91,7 +91,7 @@ if not df_tesouro.empty:
         df_fred_br_tab = carregar_dados_fred(FRED_API_KEY, {'DGS10': 'Juros 10 Anos EUA'})
         if not df_fred_br_tab.empty:
             # Usando a função correta para o juro REAL aqui
-            df_juro_br_spread = calcular_juro_real_10a_br(df_tesouro) 
+            df_juro_br_spread = obter_juro_real_10a_br(df_tesouro) 
             if not df_juro_br_spread.empty:
                 fig_spread_br_eua = gerar_grafico_spread_br_eua(df_juro_br_spread, df_fred_br_tab)
                 st.plotly_chart(fig_spread_br_eua, use_container_width=True, config={'modeBarButtonsToRemove': ['autoscale']})
@@ -1,7 +1,9 @@
 import streamlit as st
+import pandas as pd
 
 # --- Imports da nova estrutura utils ---
 from utils.tesouro_utils import obter_dados_tesouro, gerar_grafico_ettj_curto_prazo, gerar_grafico_ettj_longo_prazo
+from utils.curva_juros_utils import obter_parametros_curva, gerar_grafico_curva_ajustada, gerar_grafico_vertices_historicos
 
 # --- Configuração da Página ---
 st.set_page_config(layout="wide", page_title="Curva de Juros")
@@ -21,5 +23,21 @@ if not df_tesouro.empty:
     
     st.subheader("Comparativo de Longo Prazo (Histórico)")
     st.plotly_chart(gerar_grafico_ettj_longo_prazo(df_tesouro), use_container_width=True)
+
+    st.markdown("---")
+
+    st.subheader("Curva Ajustada (Nelson-Siegel-Svensson)")
+    st.info("Curva paramétrica ajustada para cada data do histórico a partir das LTNs e NTN-Fs. Os parâmetros ficam armazenados, então qualquer data e vértice é avaliado instantaneamente.")
+    df_parametros = obter_parametros_curva(df_tesouro)
+    if not df_parametros.empty:
+        col1, col2 = st.columns([0.3, 0.7])
+        with col1:
+            data_curva = st.date_input("Data da Curva", df_parametros.index.max().date(), min_value=df_parametros.index.min().date(), max_value=df_parametros.index.max().date(), key='data_curva_nss')
+        with col2:
+            vertices_selecionados = st.multiselect("Vértices (dias úteis)", options=[126, 252, 504, 756, 1260, 2520], default=[252, 756, 1260], key='vertices_nss')
+        st.plotly_chart(gerar_grafico_curva_ajustada(df_tesouro, df_parametros, pd.Timestamp(data_curva)), use_container_width=True)
+        st.plotly_chart(gerar_grafico_vertices_historicos(df_parametros, vertices_selecionados), use_container_width=True)
+    else:
+        st.warning("Não foi possível ajustar a curva de juros.")
 else:
     st.warning("Não foi possível carregar os dados do Tesouro Direto.")
@@ -2,6 +2,7 @@ import streamlit as st
 
 # --- Imports da nova estrutura utils ---
 from utils.commodities_utils import carregar_dados_commodities, calcular_variacao_commodities, colorir_negativo_positivo, gerar_dashboard_commodities
+from utils.graficos_utils import medir_figura
 
 # --- Configuração da Página ---
 st.set_page_config(layout="wide", page_title="Commodities")
@@ -25,7 +26,17 @@ if dados_commodities_categorizados:
     
     st.markdown("---")
     
-    fig_commodities = gerar_dashboard_commodities(dados_commodities_categorizados)
+    col1, col2 = st.columns([0.25, 0.75])
+    with col1:
+        modo_leve = st.toggle("Modo leve", value=True, key='modo_leve_commodities', help="Gráficos WebGL, histórico antigo reduzido e apenas a categoria selecionada.")
+    with col2:
+        if modo_leve:
+            categoria = st.radio("Categoria", list(dados_commodities_categorizados.keys()), horizontal=True, key='categoria_commodities')
+    dados_grafico = {categoria: dados_commodities_categorizados[categoria]} if modo_leve else dados_commodities_categorizados
+    with col1:
+        mostrar_tamanho = st.checkbox("Mostrar tamanho da figura", value=False, key='tamanho_figura_commodities')
+    fig_commodities, segundos, tamanho = medir_figura(gerar_dashboard_commodities, dados_grafico, modo_leve=modo_leve, serializar=mostrar_tamanho)
     st.plotly_chart(fig_commodities, use_container_width=True, config={'modeBarButtonsToRemove': ['autoscale']})
+    st.caption(f"Figura gerada em {segundos * 1000:.0f} ms" + (f", {tamanho / 1024:,.0f} KB serializados." if tamanho is not None else "."))
 else:
     st.warning("Não foi possível carregar os dados de Commodities.")
@@ -10,10 +10,14 @@ from utils.acoes_br_utils import (
     gerar_grafico_ratio,
     obter_tickers_cvm_amplitude,
     obter_precos_historicos_amplitude,
-    calcular_dados_amplitude,
+    obter_dados_amplitude,
     gerar_grafico_amplitude,
-    gerar_grafico_distribuicao_amplitude
+    gerar_grafico_distribuicao_amplitude,
+    carregar_precos_screener,
+    obter_painel_amplitude,
+    gerar_grafico_painel_amplitude
 )
+from utils.ratio_utils import calcular_ranking_pares
 
 # --- Configuração da Página ---
 st.set_page_config(layout="wide", page_title="Ações BR")
@@ -69,6 +73,35 @@ with st.container():
     if st.session_state.get('fig_ratio'):
         st.plotly_chart(st.session_state.fig_ratio, use_container_width=True, config={'modeBarButtonsToRemove': ['autoscale']})
 
+    st.write("#### Screener de Pares")
+    st.caption("Calcula o z-score do ratio atual de todos os pares de um universo, contra as bandas móveis (janela acima) e contra o histórico inteiro, e lista os pares mais esticados.")
+    col1, col2 = st.columns([0.3, 0.7])
+    with col1:
+        universo_screener = st.radio("Universo", ["Lista personalizada", "Universo da amplitude (CVM)"], key='universo_screener')
+        top_n_screener = st.number_input("Pares no ranking", min_value=10, max_value=500, value=50, key='top_n_screener')
+    with col2:
+        lista_screener = st.text_area("Tickers (separados por vírgula)", "PETR4.SA, VALE3.SA, ITUB4.SA, BBDC4.SA, BBAS3.SA, ABEV3.SA, WEGE3.SA, B3SA3.SA, SUZB3.SA, GGBR4.SA, ELET3.SA, RENT3.SA, PRIO3.SA, EQTL3.SA, RADL3.SA", key='lista_screener', disabled=universo_screener != "Lista personalizada")
+
+    if st.button("Rodar Screener de Pares", use_container_width=True):
+        with st.spinner("Carregando preços e calculando os z-scores de todos os pares..."):
+            if universo_screener == "Lista personalizada":
+                tickers_screener = tuple(dict.fromkeys(t.strip().upper() for t in lista_screener.split(',') if t.strip()))
+                precos_screener = carregar_precos_screener(tickers_screener)
+            else:
+                lista_tickers = obter_tickers_cvm_amplitude()
+                precos_screener = obter_precos_historicos_amplitude(lista_tickers) if lista_tickers else None
+            if precos_screener is None or precos_screener.empty:
+                st.session_state.ranking_pares = None
+                st.error("Não foi possível obter preços para o universo selecionado.")
+            else:
+                st.session_state.ranking_pares = calcular_ranking_pares(precos_screener, janela=st.session_state.window_size_key, top_n=top_n_screener)
+
+    if st.session_state.get('ranking_pares') is not None:
+        st.dataframe(
+            st.session_state.ranking_pares.style.format({'Ratio Atual': '{:.4f}', 'Z Móvel': '{:+.2f}', 'Z Estático': '{:+.2f}'}),
+            use_container_width=True, hide_index=True
+        )
+
 st.markdown("---")
 
 # Seção 2: Análise de Insiders
@@ -121,7 +154,7 @@ with st.container():
             lista_tickers = obter_tickers_cvm_amplitude()
             if lista_tickers:
                 precos = obter_precos_historicos_amplitude(lista_tickers)
-                dados_amplitude = calcular_dados_amplitude(precos)
+                dados_amplitude = obter_dados_amplitude(precos)
                 
                 if not dados_amplitude.empty:
                     mediana_amplitude = dados_amplitude.median()
@@ -129,6 +162,7 @@ with st.container():
                     st.session_state.dados_amplitude = dados_amplitude
                     st.session_state.fig_amplitude = gerar_grafico_amplitude(dados_amplitude, mediana_amplitude)
                     st.session_state.fig_dist_amplitude = gerar_grafico_distribuicao_amplitude(dados_amplitude, mediana_amplitude)
+                    st.session_state.fig_painel_amplitude = gerar_grafico_painel_amplitude(obter_painel_amplitude(precos))
                 else:
                     st.session_state.fig_amplitude = None
                     st.session_state.fig_dist_amplitude = None
@@ -151,3 +185,6 @@ with st.container():
             st.plotly_chart(st.session_state.fig_amplitude, use_container_width=True)
         with col2:
             st.plotly_chart(st.session_state.fig_dist_amplitude, use_container_width=True)
+
+        if st.session_state.get('fig_painel_amplitude') is not None:
+            st.plotly_chart(st.session_state.fig_painel_amplitude, use_container_width=True)
@@ -0,0 +1,70 @@
+import os
+import hmac
+import pandas as pd
+import streamlit as st
+
+# --- Imports da nova estrutura utils ---
+from utils.instrumentacao_utils import ATIVA, CONFIG, TAMANHO_BUFFER, configurar_instrumentacao, eventos, limpar_eventos, resumo_eventos, exportar_eventos
+
+# --- Configuração da Página ---
+st.set_page_config(layout="wide", page_title="Diagnóstico")
+
+# --- Acesso restrito ---
+SENHA_ADMIN = os.environ.get("MOBBT_SENHA_ADMIN") or st.secrets.get("ADMIN_SENHA")
+
+if not SENHA_ADMIN:
+    st.error("Página restrita. Configure o secret 'ADMIN_SENHA' (ou a variável MOBBT_SENHA_ADMIN) para habilitá-la.")
+    st.stop()
+
+if not st.session_state.get('admin_autenticado'):
+    senha = st.text_input("Senha de administrador", type="password")
+    if not senha:
+        st.stop()
+    if not hmac.compare_digest(senha, SENHA_ADMIN):
+        st.error("Senha incorreta.")
+        st.stop()
+    st.session_state.admin_autenticado = True
+
+# --- Conteúdo da Página ---
+st.header("Diagnóstico de Desempenho")
+st.markdown("---")
+
+if not ATIVA:
+    st.warning("Instrumentação desligada (MOBBT_INSTRUMENTACAO=0). Nenhum evento é registrado neste processo.")
+
+medir_payload = st.toggle("Medir o tamanho do JSON das figuras", value=CONFIG['medir_payload'], disabled=not ATIVA,
+                          help="Serializa cada figura gerada, em todas as sessões deste processo. Ligue só durante o diagnóstico.")
+if medir_payload != CONFIG['medir_payload']: configurar_instrumentacao(medir_payload=medir_payload)
+
+df_eventos = eventos()
+st.caption(f"{len(df_eventos)} eventos no buffer deste processo (capacidade {TAMANHO_BUFFER}).")
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    if st.button("Exportar eventos (JSONL)"):
+        st.success(f"Eventos gravados em {exportar_eventos()}")
+with col2:
+    st.download_button("Baixar eventos (CSV)", df_eventos.to_csv(index=False).encode('utf-8'), file_name="eventos_diagnostico.csv", mime="text/csv", disabled=df_eventos.empty)
+with col3:
+    if st.button("Limpar buffer"):
+        limpar_eventos()
+        st.rerun()
+
+if df_eventos.empty:
+    st.info("Nenhuma chamada instrumentada registrada ainda. Navegue pelas outras páginas e volte aqui.")
+    st.stop()
+
+formato = {'p50 (ms)': '{:.1f}', 'p90 (ms)': '{:.1f}', 'p99 (ms)': '{:.1f}', 'total (s)': '{:.2f}', 'acertos de cache (%)': '{:.0f}',
+           'linhas (média)': '{:,.0f}', 'bytes recebidos': '{:,.0f}', 'payload (KB, média)': '{:,.1f}'}
+
+st.subheader("Por Fonte de Dados")
+st.dataframe(resumo_eventos(df_eventos, por='fonte').style.format(formato, na_rep='-'), use_container_width=True)
+
+st.subheader("Por Função")
+st.dataframe(resumo_eventos(df_eventos, por='funcao').style.format(formato, na_rep='-'), use_container_width=True)
+
+st.subheader("Eventos Recentes")
+df_recentes = df_eventos.tail(200).iloc[::-1].copy()
+df_recentes['momento'] = pd.to_datetime(df_recentes['momento'], unit='s').dt.strftime('%d/%m %H:%M:%S')
+df_recentes['segundos'] = df_recentes['segundos'] * 1000
+st.dataframe(df_recentes.rename(columns={'segundos': 'ms'}), use_container_width=True, hide_index=True)
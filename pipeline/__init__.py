@@ -0,0 +1,4 @@
+"""
+Pipeline offline que monta os datasets do MOBBT fora das páginas do Streamlit.
+Uso: python -m pipeline [datasets ...] [--forcar] [--listar]
+"""
@@ -0,0 +1,35 @@
+import sys
+import argparse
+from pipeline.grafo import executar_grafo, ordenar_nos
+from pipeline.datasets import NOS
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pipeline', description="Atualiza os datasets do MOBBT e publica snapshots versionados.")
+    parser.add_argument('datasets', nargs='*', help="Datasets a atualizar (com as dependências). Padrão: todos.")
+    parser.add_argument('--forcar', action='store_true', help="Executa também os nós cujas entradas não mudaram.")
+    parser.add_argument('--listar', action='store_true', help="Lista os datasets e suas dependências, sem executar.")
+    parser.add_argument('--threads', type=int, default=4, help="Workers para nós de E/S.")
+    parser.add_argument('--processos', type=int, default=None, help="Workers para nós de CPU (padrão: número de CPUs).")
+    args = parser.parse_args(argv)
+
+    try:
+        ordem = ordenar_nos(NOS, args.datasets)
+    except (KeyError, ValueError) as e:
+        parser.error(str(e.args[0]))
+    if args.listar:
+        for nome in ordem:
+            entradas = ', '.join(NOS[nome]['entradas']) or '-'
+            print(f"{nome:<24} {NOS[nome]['tipo']:<4} <- {entradas}")
+        return 0
+
+    def _ao_concluir(nome, resultado):
+        detalhe = f"{resultado['segundos']:.1f}s" if resultado['status'] in ('executado', 'inalterado') else (resultado['erro'] or '')
+        print(f"[{resultado['status']:>10}] {nome:<24} {detalhe}", flush=True)
+
+    resultados = executar_grafo(NOS, args.datasets, forcar=args.forcar, max_threads=args.threads, max_processos=args.processos, ao_concluir=_ao_concluir)
+    falhas = [nome for nome, r in resultados.items() if r['status'] in ('falhou', 'bloqueado')]
+    print(f"{len(resultados) - len(falhas)} de {len(resultados)} datasets atualizados ou em dia.")
+    return 1 if falhas else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
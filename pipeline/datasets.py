@@ -0,0 +1,117 @@
+import os
+import pandas as pd
+import streamlit as st
+from datetime import datetime
+
+# --- Datasets do pipeline offline ---
+# As funções ficam no nível do módulo para poderem ser enviadas ao pool de processos (nós 'cpu').
+# Fontes (sem entradas) sempre rodam, mas já são incrementais: só baixam o que mudou desde a última carga.
+# Cálculos com st.cache_data são chamados pela função original: fora do Streamlit o cache só gastaria memória.
+
+def _sem_cache(funcao):
+    return getattr(funcao, '__wrapped__', funcao)
+
+def _chave_fred():
+    chave = os.environ.get('FRED_API_KEY')
+    if chave: return chave
+    try:
+        return st.secrets.get('FRED_API_KEY')
+    except Exception:
+        return None
+
+def tesouro():
+    from utils.tesouro_utils import _atualizar_base_tesouro
+    return _atualizar_base_tesouro()
+
+def juro_real_10a(df_tesouro):
+    from utils.tesouro_utils import calcular_juro_real_10a_br
+    return _sem_cache(calcular_juro_real_10a_br)(df_tesouro).to_frame('juro_real_10a')
+
+def juro_prefixado_10a(df_tesouro):
+    from utils.tesouro_utils import calcular_juro_prefixado_10a_br
+    return _sem_cache(calcular_juro_prefixado_10a_br)(df_tesouro).to_frame('juro_prefixado_10a')
+
+def inflacao_implicita(df_tesouro):
+    # Indexada por vencimento: a Data Base de referência vai em uma coluna, para os leitores saberem se está em dia
+    from utils.tesouro_utils import calcular_inflacao_implicita
+    return _sem_cache(calcular_inflacao_implicita)(df_tesouro).assign(**{'Data Base': df_tesouro['Data Base'].max()})
+
+def curva_nss(df_tesouro):
+    from utils.curva_juros_utils import atualizar_parametros_curva
+    return atualizar_parametros_curva(df_tesouro)
+
+def fred_dgs10():
+    from utils.internacional_utils import obter_serie_fred
+    chave = _chave_fred()
+    if not chave: raise RuntimeError("FRED_API_KEY não configurada (variável de ambiente ou secrets do Streamlit)")
+    return obter_serie_fred('DGS10', chave).to_frame('DGS10')
+
+def spread_br_eua(df_juro_real, df_fred):
+    from utils.internacional_utils import calcular_spread_br_eua
+    return calcular_spread_br_eua(df_juro_real['juro_real_10a'], df_fred)
+
+def bcb():
+    from utils.economicos_br_utils import _carregar_dados_bcb
+    return _carregar_dados_bcb()[0]
+
+def commodities():
+    from utils.commodities_utils import _atualizar_base_commodities
+    return _atualizar_base_commodities()[0]
+
+def idex():
+    from utils.credito_utils import _carregar_dados_idex
+    return _carregar_dados_idex()
+
+def idex_infra():
+    from utils.credito_utils import _carregar_dados_idex_infra
+    return _carregar_dados_idex_infra()
+
+def insiders():
+    from utils.acoes_br_utils import _executar_analise_insiders
+    df_controladores, df_outros, ultimo_mes = _executar_analise_insiders()
+    if df_controladores is None: raise RuntimeError("Falha ao processar os dados de insiders da CVM")
+    df = pd.concat([df_controladores.assign(Grupo='Controladores'), df_outros.assign(Grupo='Outros')], ignore_index=True)
+    return df.assign(Mes=ultimo_mes.to_timestamp())
+
+def universo_amplitude():
+    from utils.cvm_utils import obter_universo_tickers
+    return pd.DataFrame({'ticker': sorted(obter_universo_tickers(datetime.now().year))})
+
+def precos_amplitude(df_universo):
+    # A matriz em si é publicada como arquivo mapeado; o snapshot guarda só a versão, que muda a cada publicação
+    from utils.acoes_br_utils import _atualizar_precos_amplitude
+    versao = _atualizar_precos_amplitude(tuple(df_universo['ticker']))
+    if versao is None: raise RuntimeError("Nenhum preço disponível para o universo de amplitude")
+    return pd.DataFrame({'versao': [versao], 'tickers': [len(df_universo)]})
+
+def _matriz_amplitude(df_precos):
+    from utils.acoes_br_utils import NOME_MATRIZ_AMPLITUDE
+    from utils.matriz_compartilhada_utils import abrir_matriz
+    return abrir_matriz(NOME_MATRIZ_AMPLITUDE, df_precos['versao'].iloc[0])
+
+def amplitude_mma200(df_precos):
+    from utils.amplitude_utils import atualizar_amplitude
+    return atualizar_amplitude(_matriz_amplitude(df_precos), janela=200).to_frame('percentual')
+
+def indicadores_amplitude(df_precos):
+    from utils.amplitude_utils import calcular_indicadores_amplitude
+    return calcular_indicadores_amplitude(_matriz_amplitude(df_precos))
+
+NOS = {
+    'tesouro': {'funcao': tesouro, 'entradas': [], 'tipo': 'io'},
+    'juro_real_10a': {'funcao': juro_real_10a, 'entradas': ['tesouro'], 'tipo': 'cpu'},
+    'juro_prefixado_10a': {'funcao': juro_prefixado_10a, 'entradas': ['tesouro'], 'tipo': 'cpu'},
+    'inflacao_implicita': {'funcao': inflacao_implicita, 'entradas': ['tesouro'], 'tipo': 'cpu'},
+    'curva_nss': {'funcao': curva_nss, 'entradas': ['tesouro'], 'tipo': 'cpu'},
+    'fred_dgs10': {'funcao': fred_dgs10, 'entradas': [], 'tipo': 'io'},
+    'spread_br_eua': {'funcao': spread_br_eua, 'entradas': ['juro_real_10a', 'fred_dgs10'], 'tipo': 'cpu'},
+    'bcb': {'funcao': bcb, 'entradas': [], 'tipo': 'io'},
+    'commodities': {'funcao': commodities, 'entradas': [], 'tipo': 'io'},
+    'idex': {'funcao': idex, 'entradas': [], 'tipo': 'io'},
+    'idex_infra': {'funcao': idex_infra, 'entradas': [], 'tipo': 'io'},
+    'insiders': {'funcao': insiders, 'entradas': [], 'tipo': 'io'},
+    'universo_amplitude': {'funcao': universo_amplitude, 'entradas': [], 'tipo': 'io'},
+    'precos_amplitude': {'funcao': precos_amplitude, 'entradas': ['universo_amplitude'], 'tipo': 'io'},
+    'amplitude_mma200': {'funcao': amplitude_mma200, 'entradas': ['precos_amplitude'], 'tipo': 'cpu'},
+    'indicadores_amplitude': {'funcao': indicadores_amplitude, 'entradas': ['precos_amplitude'], 'tipo': 'cpu'},
+}
@@ -0,0 +1,100 @@
+import time
+import hashlib
+import multiprocessing
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from utils.armazenamento_utils import publicar_snapshot, ler_snapshot, versao_snapshot, ler_metadados, salvar_metadados
+
+# --- Execução do grafo de datasets ---
+# Cada nó é {'funcao', 'entradas', 'tipo'}: a função recebe os DataFrames das entradas, na ordem declarada,
+# e devolve um DataFrame, publicado como snapshot versionado. Nós 'io' rodam em threads e nós 'cpu' em
+# um pool de processos iniciados com 'spawn' (um fork com as threads de E/S rodando herdaria travas presas). Um nó com entradas é pulado quando as impressões digitais das entradas são as mesmas
+# da última execução bem-sucedida (registradas no manifesto) e o seu snapshot ainda existe. Um nó executado
+# (como as fontes, que sempre rodam) cuja saída tem a mesma impressão da versão publicada não gera versão nova.
+NOME_MANIFESTO = 'pipeline_manifesto'
+
+def impressao_digital(df):
+    hash_linhas = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return hashlib.sha256(hash_linhas.tobytes() + '|'.join(map(str, df.columns)).encode('utf-8')).hexdigest()[:16]
+
+def ordenar_nos(nos, alvos=None):
+    """Nós necessários para `alvos` (todos, se None) em ordem topológica. Erro para nó desconhecido ou ciclo."""
+    ordem, visitando, visitados = [], set(), set()
+    def _visitar(nome):
+        if nome in visitados: return
+        if nome not in nos: raise KeyError(f"Dataset desconhecido: {nome}")
+        if nome in visitando: raise ValueError(f"Ciclo no grafo de datasets passando por {nome}")
+        visitando.add(nome)
+        for entrada in nos[nome]['entradas']: _visitar(entrada)
+        visitando.discard(nome); visitados.add(nome); ordem.append(nome)
+    for nome in (alvos or nos): _visitar(nome)
+    return ordem
+
+def _executar_no(funcao, entradas):
+    inicio = time.perf_counter()
+    saida = funcao(*entradas)
+    if isinstance(saida, pd.Series): saida = saida.to_frame()
+    return saida, time.perf_counter() - inicio
+
+def executar_grafo(nos, alvos=None, forcar=False, max_threads=4, max_processos=None, ao_concluir=None):
+    """
+    Executa os nós necessários para `alvos`, em paralelo assim que as entradas ficam prontas.
+    Retorna {nome: {'status', 'segundos', 'versao', 'erro'}}, com status 'executado', 'inalterado' (executado, mas
+    com a saída idêntica à versão já publicada), 'pulado', 'falhou' ou 'bloqueado'.
+    `ao_concluir(nome, resultado)` é chamado a cada nó finalizado.
+    """
+    ordem = ordenar_nos(nos, alvos)
+    manifesto = ler_metadados(NOME_MANIFESTO)
+    impressoes, saidas, resultados = {}, {}, {}
+    pendentes, em_execucao = list(ordem), {}
+
+    def _finalizar(nome, resultado):
+        resultados[nome] = resultado
+        if ao_concluir: ao_concluir(nome, resultado)
+
+    def _saida(nome):
+        if nome not in saidas: saidas[nome], _ = ler_snapshot(nome)
+        return saidas[nome]
+
+    with ThreadPoolExecutor(max_workers=max_threads) as threads, ProcessPoolExecutor(max_workers=max_processos, mp_context=multiprocessing.get_context('spawn')) as processos:
+        while pendentes or em_execucao:
+            for nome in list(pendentes):
+                no = nos[nome]
+                if any(entrada not in resultados for entrada in no['entradas']): continue
+                pendentes.remove(nome)
+                if any(resultados[entrada]['status'] in ('falhou', 'bloqueado') for entrada in no['entradas']):
+                    _finalizar(nome, {'status': 'bloqueado', 'segundos': 0.0, 'versao': None, 'erro': None})
+                    continue
+                impressoes_entradas = {entrada: impressoes[entrada] for entrada in no['entradas']}
+                anterior = manifesto.get(nome, {})
+                if (not forcar and no['entradas'] and anterior.get('entradas') == impressoes_entradas
+                        and versao_snapshot(nome) == anterior.get('versao')):
+                    impressoes[nome] = anterior['saida']
+                    _finalizar(nome, {'status': 'pulado', 'segundos': 0.0, 'versao': anterior['versao'], 'erro': None})
+                    continue
+                entradas = [_saida(entrada) for entrada in no['entradas']]
+                if any(entrada is None for entrada in entradas):
+                    _finalizar(nome, {'status': 'falhou', 'segundos': 0.0, 'versao': None, 'erro': 'snapshot de entrada ausente'})
+                    continue
+                executor = processos if no['tipo'] == 'cpu' else threads
+                em_execucao[executor.submit(_executar_no, no['funcao'], entradas)] = (nome, impressoes_entradas)
+
+            if not em_execucao: continue
+            concluidos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                nome, impressoes_entradas = em_execucao.pop(futuro)
+                anterior = manifesto.get(nome, {})
+                try:
+                    saida, segundos = futuro.result()
+                    impressao = impressao_digital(saida)
+                    inalterado = impressao == anterior.get('saida') and versao_snapshot(nome) == anterior.get('versao')
+                    versao = anterior['versao'] if inalterado else publicar_snapshot(nome, saida)
+                except Exception as e:
+                    _finalizar(nome, {'status': 'falhou', 'segundos': 0.0, 'versao': None, 'erro': repr(e)})
+                    continue
+                saidas[nome], impressoes[nome] = saida, impressao
+                manifesto[nome] = {'entradas': impressoes_entradas, 'saida': impressao, 'versao': versao, 'executado_em': datetime.now().isoformat()}
+                salvar_metadados(NOME_MANIFESTO, manifesto)
+                _finalizar(nome, {'status': 'inalterado' if inalterado else 'executado', 'segundos': segundos, 'versao': versao, 'erro': None})
+    return resultados
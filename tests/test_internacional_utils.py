@@ -0,0 +1,32 @@
+import collections
+import pandas as pd
+import pytest
+from fredapi import Fred
+from utils import armazenamento_utils, registro_dados_utils
+from utils.internacional_utils import carregar_dados_fred
+
+INDICADORES_NTNB = {'DGS10': 'Juros 10 Anos EUA'}
+INDICADORES_INTERNACIONAL = {'T10Y2Y': 'Spread 10a-2a', 'BAMLH0A0HYM2': 'High Yield', 'DGS10': 'Juros 10 Anos EUA'}
+
+@pytest.fixture
+def chamadas(monkeypatch, tmp_path):
+    monkeypatch.setattr(armazenamento_utils, 'DIRETORIO_DADOS', str(tmp_path))
+    contagem = collections.Counter()
+    def _get_series(self, serie_id, observation_start=None, **kwargs):
+        contagem[serie_id] += 1
+        if observation_start is not None: return pd.Series(dtype='float64')
+        return pd.Series([1.0, 2.0, 3.0], index=pd.date_range('2024-01-01', periods=3))
+    monkeypatch.setattr(Fred, 'get_series', _get_series)
+    yield contagem
+    for serie_id in INDICADORES_INTERNACIONAL: registro_dados_utils.descartar_dataset(f'fred_{serie_id}')
+
+def test_uma_busca_por_serie_entre_as_paginas(chamadas):
+    df_ntnb = carregar_dados_fred('chave', INDICADORES_NTNB)
+    df_internacional = carregar_dados_fred('chave', INDICADORES_INTERNACIONAL)
+    assert list(df_ntnb.columns) == ['DGS10']
+    assert set(df_internacional.columns) == set(INDICADORES_INTERNACIONAL)
+    assert chamadas == {serie_id: 1 for serie_id in INDICADORES_INTERNACIONAL}
+
+    threads = [registro_dados_utils.atualizar_em_segundo_plano(f'fred_{serie_id}') for serie_id in INDICADORES_INTERNACIONAL]
+    for thread in threads: thread.join()
+    assert chamadas == {serie_id: 2 for serie_id in INDICADORES_INTERNACIONAL}
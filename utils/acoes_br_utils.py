@@ -3,58 +3,48 @@ import pandas as pd
 import numpy as np
 import yfinance as yf
 from datetime import datetime, timedelta
-import os
-import requests
-import zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import io
 import plotly.express as px
 import plotly.graph_objects as go
+from utils.amplitude_utils import atualizar_amplitude, calcular_indicadores_amplitude
+from plotly.subplots import make_subplots
+from utils.precos_utils import atualizar_armazem_precos, baixar_fechamentos
+from utils.cvm_utils import obter_movimentacoes, obter_mapa_cnpj_ticker, obter_universo_tickers
+from utils.valor_mercado_utils import obter_valores_de_mercado
+from utils.graficos_utils import reduzir_figura
+from utils.ratio_utils import somas_prefixadas, media_desvio_movel
+from utils.matriz_compartilhada_utils import publicar_matriz, obter_matriz_compartilhada, versao_atual
+from utils.registro_dados_utils import obter_dataset, interface_carga
+from utils.armazenamento_utils import ler_snapshot, ler_snapshot_em_dia
+from utils.instrumentacao_utils import instrumentar, cache_instrumentado
+from utils.transporte_utils import chamar_fonte
 
 # --- Funções para Radar de Insiders ---
-@st.cache_data(ttl=3600*24)
+@instrumentar('insiders')
 def executar_analise_insiders():
+    return obter_dataset('insiders', _executar_analise_insiders, validade=3600*24, inicial=_insiders_do_snapshot)
+
+def _insiders_do_snapshot():
+    # Snapshot publicado pelo pipeline offline (python -m pipeline insiders), com os dois grupos empilhados
+    df, _ = ler_snapshot('insiders')
+    if df is None or df.empty: return None
+    grupos = {grupo: dados.drop(columns=['Grupo', 'Mes']).reset_index(drop=True) for grupo, dados in df.groupby('Grupo')}
+    vazio = df.drop(columns=['Grupo', 'Mes']).iloc[0:0]
+    return grupos.get('Controladores', vazio), grupos.get('Outros', vazio), df['Mes'].iloc[0].to_period('M')
+
+def _executar_analise_insiders():
+    tela = interface_carga()
     ANO_ATUAL = datetime.now().year
-    URL_MOVIMENTACOES = f"https://dados.cvm.gov.br/dados/CIA_ABERTA/DOC/VLMO/DADOS/vlmo_cia_aberta_{ANO_ATUAL}.zip"
-    URL_CADASTRO = f"https://dados.cvm.gov.br/dados/CIA_ABERTA/DOC/FCA/DADOS/fca_cia_aberta_{ANO_ATUAL}.zip"
-    ZIP_MOVIMENTACOES, CSV_MOVIMENTACOES = "movimentacoes.zip", f"vlmo_cia_aberta_con_{ANO_ATUAL}.csv"
-    ZIP_CADASTRO, CSV_CADASTRO = "cadastro.zip", f"fca_cia_aberta_valor_mobiliario_{ANO_ATUAL}.csv"
-
-    def _cvm_baixar_zip(url, nome_zip, nome_csv):
-        try:
-            response = requests.get(url, timeout=60)
-            response.raise_for_status()
-            with open(nome_zip, 'wb') as f: f.write(response.content)
-            with zipfile.ZipFile(nome_zip, 'r') as z: z.extract(nome_csv)
-            os.remove(nome_zip)
-            return nome_csv
-        except Exception as e:
-            st.error(f"Erro no download de {url}: {e}")
-            if os.path.exists(nome_zip): os.remove(nome_zip)
-            return None
-
-    def _obter_market_cap_individual(ticker):
-        if pd.isna(ticker) or not isinstance(ticker, str): return ticker, np.nan
-        try:
-            stock = yf.Ticker(f"{ticker.strip()}.SA")
-            return ticker, stock.info.get('marketCap', np.nan)
-        except Exception:
-            return ticker, np.nan
-
-    caminho_csv_mov = _cvm_baixar_zip(URL_MOVIMENTACOES, ZIP_MOVIMENTACOES, CSV_MOVIMENTACOES)
-    caminho_csv_cad = _cvm_baixar_zip(URL_CADASTRO, ZIP_CADASTRO, CSV_CADASTRO)
-
-    if not caminho_csv_mov or not caminho_csv_cad: return None, None, None
-
-    df_mov = pd.read_csv(caminho_csv_mov, sep=';', encoding='ISO-8859-1', on_bad_lines='skip')
-    df_cad = pd.read_csv(caminho_csv_cad, sep=';', encoding='ISO-8859-1', on_bad_lines='skip', usecols=['CNPJ_Companhia', 'Codigo_Negociacao'])
-    os.remove(caminho_csv_mov); os.remove(caminho_csv_cad)
-
-    df_mov['Data_Movimentacao'] = pd.to_datetime(df_mov['Data_Movimentacao'], errors='coerce')
-    df_mov.dropna(subset=['Data_Movimentacao'], inplace=True)
+    try:
+        df_mov = obter_movimentacoes(ANO_ATUAL)
+        df_tickers = obter_mapa_cnpj_ticker(ANO_ATUAL)
+    except Exception as e:
+        tela.error(f"Erro no download dos dados da CVM: {e}")
+        return None, None, None
+
     df_mov = df_mov[df_mov['Tipo_Movimentacao'].isin(['Compra à vista', 'Venda à vista'])]
     ultimo_mes = df_mov['Data_Movimentacao'].max().to_period('M')
     df_mes = df_mov[df_mov['Data_Movimentacao'].dt.to_period('M') == ultimo_mes].copy()
+    df_mes = df_mes.astype({'CNPJ_Companhia': str, 'Nome_Companhia': str, 'Tipo_Cargo': str, 'Tipo_Movimentacao': str})
     df_mes['Volume_Net'] = np.where(df_mes['Tipo_Movimentacao'] == 'Compra à vista', df_mes['Volume'], -df_mes['Volume'])
 
     df_controladores = df_mes[df_mes['Tipo_Cargo'] == 'Controlador ou Vinculado'].copy()
@@ -64,18 +54,13 @@ def executar_analise_insiders():
     df_net_outros = df_outros.groupby(['CNPJ_Companhia', 'Nome_Companhia'])['Volume_Net'].sum().reset_index()
 
     cnpjs_unicos = pd.concat([df_net_controladores[['CNPJ_Companhia']], df_net_outros[['CNPJ_Companhia']]]).drop_duplicates()
-    df_tickers = df_cad.dropna().drop_duplicates(subset=['CNPJ_Companhia'])
     df_lookup = pd.merge(cnpjs_unicos, df_tickers, on='CNPJ_Companhia', how='left')
 
-    market_caps = {}
     tickers_para_buscar = df_lookup['Codigo_Negociacao'].dropna().unique().tolist()
-    progress_bar = st.progress(0, text="Buscando valores de mercado...")
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_ticker = {executor.submit(_obter_market_cap_individual, ticker): ticker for ticker in tickers_para_buscar}
-        for i, future in enumerate(as_completed(future_to_ticker)):
-            ticker, market_cap = future.result()
-            market_caps[ticker] = market_cap
-            progress_bar.progress((i + 1) / len(tickers_para_buscar), text=f"Buscando valores de mercado... ({i+1}/{len(tickers_para_buscar)})")
+    progress_bar = tela.progress(0, text="Buscando valores de mercado...")
+    def _ao_progredir(concluidos, total):
+        progress_bar.progress(concluidos / total, text=f"Buscando valores de mercado... ({concluidos}/{total})")
+    market_caps = obter_valores_de_mercado(tickers_para_buscar, ao_progredir=_ao_progredir)
     progress_bar.empty()
     df_market_caps = pd.DataFrame(list(market_caps.items()), columns=['Codigo_Negociacao', 'MarketCap'])
     df_market_cap_lookup = pd.merge(df_lookup, df_market_caps, on="Codigo_Negociacao", how="left")
@@ -90,6 +75,7 @@ def executar_analise_insiders():
 
     return df_final_controladores, df_final_outros, ultimo_mes
 
+@instrumentar('insiders')
 def gerar_graficos_insiders_plotly(df_dados, top_n=10):
     if df_dados.empty: return None, None
     df_plot_volume = df_dados.sort_values(by='Volume_Net', ascending=True).tail(top_n)
@@ -103,33 +89,51 @@ def gerar_graficos_insiders_plotly(df_dados, top_n=10):
     return fig_volume, fig_relevancia
 
 # --- Funções para Análise de Ratio ---
-@st.cache_data
+@cache_instrumentado('ratio')
 def carregar_dados_acoes(tickers, period="max"):
     try:
-        data = yf.download(tickers, period=period, auto_adjust=True)['Close']
+        data = chamar_fonte('yfinance', f"{','.join(tickers)}|{period}", yf.download, tickers, period=period, auto_adjust=True)['Close']
         if isinstance(data, pd.Series):
             data = data.to_frame(tickers[0])
         return data.dropna()
     except Exception:
         return pd.DataFrame()
 
-@st.cache_data
+@cache_instrumentado('ratio')
+def preparar_ratio(_data, ticker_a, ticker_b, impressao):
+    """
+    Ratio do par, estatísticas estáticas e somas prefixadas, em cache por par e por uma impressão barata dos preços:
+    o DataFrame fica fora da chave, então mudar a janela não re-hasheia os dados.
+    """
+    ratio = _data[ticker_a] / _data[ticker_b]
+    return ratio, ratio.median(), ratio.std(), somas_prefixadas(ratio.values)
+
+@instrumentar('ratio')
 def calcular_metricas_ratio(data, ticker_a, ticker_b, window=252):
-    ratio = data[ticker_a] / data[ticker_b]
+    # Somas das colunas, não só a última data: o ajuste por proventos reescreve o histórico mantendo a última data
+    impressao = (len(data), data.index.max(), float(data[ticker_a].sum()), float(data[ticker_b].sum()))
+    ratio, static_median, static_std, somas = preparar_ratio(data, ticker_a, ticker_b, impressao)
+    rolling_mean, rolling_std = media_desvio_movel(somas, window)
     df_metrics = pd.DataFrame({'Ratio': ratio})
-    df_metrics['Rolling_Mean'] = ratio.rolling(window=window).mean()
-    rolling_std = ratio.rolling(window=window).std()
-    static_median = ratio.median()
-    static_std = ratio.std()
+    df_metrics['Rolling_Mean'] = rolling_mean
     df_metrics['Static_Median'] = static_median
-    df_metrics['Upper_Band_2x_Rolling'] = df_metrics['Rolling_Mean'] + (2 * rolling_std)
-    df_metrics['Lower_Band_2x_Rolling'] = df_metrics['Rolling_Mean'] - (2 * rolling_std)
+    df_metrics['Upper_Band_2x_Rolling'] = rolling_mean + (2 * rolling_std)
+    df_metrics['Lower_Band_2x_Rolling'] = rolling_mean - (2 * rolling_std)
     df_metrics['Upper_Band_1x_Static'] = static_median + (1 * static_std)
     df_metrics['Lower_Band_1x_Static'] = static_median - (1 * static_std)
     df_metrics['Upper_Band_2x_Static'] = static_median + (2 * static_std)
     df_metrics['Lower_Band_2x_Static'] = static_median - (2 * static_std)
     return df_metrics
 
+@cache_instrumentado('ratio', ttl=86400)
+def carregar_precos_screener(tickers, anos_historico=5):
+    """Fechamentos de uma lista livre de tickers (com .SA) para o screener, em lotes e sem descartar datas com lacunas."""
+    data_final = datetime.now()
+    precos, falhas = baixar_fechamentos(list(tickers), data_final - timedelta(days=anos_historico*365), data_final)
+    for lote, total_lotes, e in falhas:
+        st.warning(f"Falha ao baixar o lote {lote}/{total_lotes}. Erro: {e}")
+    return precos
+
 def calcular_kpis_ratio(df_metrics):
     if 'Ratio' not in df_metrics or df_metrics['Ratio'].dropna().empty: return None
     ratio_series = df_metrics['Ratio'].dropna()
@@ -138,6 +142,7 @@ def calcular_kpis_ratio(df_metrics):
     else: kpis["variacao_para_media"] = np.inf
     return kpis
 
+@instrumentar('ratio')
 def gerar_grafico_ratio(df_metrics, ticker_a, ticker_b, window):
     fig = go.Figure()
     static_median_val = df_metrics['Static_Median'].iloc[-1]
@@ -151,97 +156,102 @@ def gerar_grafico_ratio(df_metrics, ticker_a, ticker_b, window):
     fig.add_trace(go.Scatter(x=df_metrics.index, y=df_metrics['Rolling_Mean'], mode='lines', line_color='orange', line_dash='dash', name=f'Média Móvel ({window}d)'))
     fig.add_trace(go.Scatter(x=df_metrics.index, y=df_metrics['Ratio'], mode='lines', line_color='#636EFA', name='Ratio Atual', line_width=2.5))
     fig.update_layout(title_text=f'Análise de Ratio: {ticker_a} / {ticker_b}', template='plotly_dark', title_x=0, legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-    return fig
+    return reduzir_figura(fig)
 
 # --- Funções para Amplitude de Mercado ---
-@st.cache_data(ttl=86400)
+@cache_instrumentado('amplitude', ttl=86400)
 def obter_tickers_cvm_amplitude():
     st.info("Buscando lista de tickers da CVM... (rápido se em cache diário)")
-    ano = datetime.now().year
-    url = f'https://dados.cvm.gov.br/dados/CIA_ABERTA/DOC/FCA/DADOS/fca_cia_aberta_{ano}.zip'
-    nome_arquivo_csv = f'fca_cia_aberta_valor_mobiliario_{ano}.csv'
     try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-            with z.open(nome_arquivo_csv) as f:
-                df = pd.read_csv(f, sep=';', encoding='ISO-8859-1', dtype={'Valor_Mobiliario': 'category', 'Mercado': 'category'})
-        df_filtrado = df[(df['Valor_Mobiliario'].isin(['Ações Ordinárias', 'Ações Preferenciais'])) & (df['Mercado'] == 'Bolsa')]
-        tickers = df_filtrado['Codigo_Negociacao'].dropna().unique().tolist()
+        tickers = obter_universo_tickers(datetime.now().year)
         st.success(f"{len(tickers)} tickers encontrados na CVM.")
         return tickers
     except Exception as e:
         st.error(f"ERRO: Não foi possível obter os dados da CVM. {e}")
         return None
 
-@st.cache_data(ttl=86400)
-def obter_precos_historicos_amplitude(tickers, anos_historico=15):
+NOME_MATRIZ_AMPLITUDE = 'precos_amplitude'
+
+def _atualizar_precos_amplitude(tickers, anos_historico=15):
     """
-    Baixa os dados históricos de preços usando yfinance e o cache do Streamlit,
-    agora com download em lotes para maior robustez.
+    Atualiza o armazém local de preços (só a cauda que falta é baixada do yfinance, com recarga completa
+    periódica para capturar ajustes) e publica a matriz do universo como nova versão mapeada em memória.
+    Retorna a versão publicada, ou None se não há preços.
     """
-    st.info(f"Buscando {anos_historico} anos de dados de preços para {len(tickers)} ativos...")
-    st.warning("Este processo é lento e pode levar vários minutos na primeira execução do dia. Por favor, aguarde.")
-    
-    tickers_sa = [ticker + ".SA" for ticker in tickers]
-    data_final = datetime.now()
-    data_inicial = data_final - timedelta(days=anos_historico*365)
-    
-    # Lógica de download em lotes
-    batch_size = 100
-    all_close_prices = []
-    progress_text = "Baixando dados de preços em lotes..."
-    progress_bar = st.progress(0, text=progress_text)
-    total_batches = (len(tickers_sa) + batch_size - 1) // batch_size
-    
-    for i, n in enumerate(range(0, len(tickers_sa), batch_size)):
-        batch = tickers_sa[n:n+batch_size]
-        try:
-            data = yf.download(
-                batch,
-                start=data_inicial,
-                end=data_final,
-                auto_adjust=True,
-                progress=False,
-                threads=True
-            )
-            if not data.empty:
-                if isinstance(data.columns, pd.MultiIndex):
-                    close_prices = data['Close']
-                else:
-                    if 'Close' in data.columns:
-                        close_prices = data[['Close']].rename(columns={'Close': batch[0]})
-                    else:
-                        close_prices = data
-                all_close_prices.append(close_prices)
-        except Exception as e:
-            st.warning(f"Falha ao baixar o lote {i+1}/{total_batches}. Erro: {e}")
-
-        progress_bar.progress((i + 1) / total_batches, text=f"Lote {i+1} de {total_batches} baixado.")
+    tela = interface_carga()
+    tela.info(f"Atualizando {anos_historico} anos de dados de preços para {len(tickers)} ativos...")
+    progress_bar = tela.progress(0, text="Baixando dados de preços em lotes...")
+    def _ao_progredir(lote, total_lotes):
+        progress_bar.progress(lote / total_lotes, text=f"Lote {lote} de {total_lotes} baixado.")
 
+    full_df, falhas = atualizar_armazem_precos(tickers, anos_historico=anos_historico, ao_progredir=_ao_progredir)
     progress_bar.empty()
+    for lote, total_lotes, e in falhas:
+        tela.warning(f"Falha ao baixar o lote {lote}/{total_lotes}. Erro: {e}")
 
-    if not all_close_prices:
-        st.error("ERRO: Falha total no download dos dados de preços. Verifique a conexão ou tente mais tarde.")
-        return pd.DataFrame()
-        
-    full_df = pd.concat(all_close_prices, axis=1)
-    full_df = full_df.loc[:,~full_df.columns.duplicated()]
-    
-    st.success(f"Download de dados para {full_df.shape[1]} ativos concluído.")
-    return full_df.astype('float32')
-
-@st.cache_data(ttl=86400)
+    if full_df.empty:
+        tela.error("ERRO: Falha total no download dos dados de preços. Verifique a conexão ou tente mais tarde.")
+        return None
+
+    tela.success(f"Dados de preços disponíveis para {full_df.shape[1]} ativos.")
+    return publicar_matriz(NOME_MATRIZ_AMPLITUDE, full_df)
+
+@instrumentar('amplitude')
+def obter_precos_historicos_amplitude(tickers, anos_historico=15):
+    """
+    Matriz de preços do universo de amplitude, compartilhada (somente leitura) entre sessões e processos.
+    Com uma versão já publicada em disco ela é servida na hora e a atualização do armazém corre em segundo plano.
+    """
+    versao = obter_dataset(
+        f'{NOME_MATRIZ_AMPLITUDE}_{anos_historico}', lambda: _atualizar_precos_amplitude(tickers, anos_historico),
+        validade=86400, inicial=lambda: versao_atual(NOME_MATRIZ_AMPLITUDE)
+    )
+    matriz = obter_matriz_compartilhada(NOME_MATRIZ_AMPLITUDE) if versao is not None else None
+    return pd.DataFrame() if matriz is None else matriz
+
+@cache_instrumentado('amplitude', ttl=86400)
 def calcular_dados_amplitude(precos_fechamento):
     if precos_fechamento.empty: return pd.Series()
     st.info("Calculando o indicador de amplitude...")
-    mma200 = precos_fechamento.rolling(window=200).mean()
-    acima_da_media = precos_fechamento > mma200
-    percentual_acima_media = (acima_da_media.sum(axis=1) / precos_fechamento.notna().sum(axis=1)) * 100
-    percentual_acima_media.dropna(inplace=True)
+    percentual_acima_media = atualizar_amplitude(precos_fechamento, janela=200).dropna()
     dados_filtrados = percentual_acima_media[percentual_acima_media.index >= '2014-01-01']
     return dados_filtrados
 
+@cache_instrumentado('amplitude', ttl=86400)
+def calcular_painel_amplitude(precos_fechamento):
+    if precos_fechamento.empty: return pd.DataFrame()
+    indicadores = calcular_indicadores_amplitude(precos_fechamento)
+    return indicadores[indicadores.index >= '2014-01-01']
+
+# --- Amplitude: snapshots do pipeline offline quando em dia com a matriz de preços, cálculo como alternativa ---
+def obter_dados_amplitude(precos_fechamento):
+    df = ler_snapshot_em_dia('amplitude_mma200', precos_fechamento.index.max())
+    if df is None: return calcular_dados_amplitude(precos_fechamento)
+    percentual = df['percentual'].rename(None).dropna()
+    return percentual[percentual.index >= '2014-01-01']
+
+def obter_painel_amplitude(precos_fechamento):
+    indicadores = ler_snapshot_em_dia('indicadores_amplitude', precos_fechamento.index.max())
+    if indicadores is None: return calcular_painel_amplitude(precos_fechamento)
+    return indicadores[indicadores.index >= '2014-01-01']
+
+@instrumentar('amplitude')
+def gerar_grafico_painel_amplitude(indicadores):
+    if indicadores.empty: return None
+    fig = make_subplots(rows=4, cols=1, shared_xaxes=True, vertical_spacing=0.04, row_heights=[0.35, 0.2, 0.2, 0.25],
+                        subplot_titles=('% de Ativos Acima das Médias Móveis', 'Novas Máximas / Mínimas de 52 Semanas', 'Linha de Avanço-Declínio', 'Oscilador McClellan'))
+    for coluna, cor in zip([c for c in indicadores.columns if c.startswith('% Acima')], ['#FFA15A', '#00CC96', '#636EFA']):
+        fig.add_trace(go.Scatter(x=indicadores.index, y=indicadores[coluna], mode='lines', name=coluna, line=dict(color=cor, width=1.5)), row=1, col=1)
+    fig.add_trace(go.Bar(x=indicadores.index, y=indicadores['Novas Máximas'], name='Novas Máximas', marker_color='#4CAF50'), row=2, col=1)
+    fig.add_trace(go.Bar(x=indicadores.index, y=-indicadores['Novas Mínimas'], name='Novas Mínimas', marker_color='#F44336'), row=2, col=1)
+    fig.add_trace(go.Scatter(x=indicadores.index, y=indicadores['Linha A/D'], mode='lines', name='Linha A/D', line=dict(color='#AB63FA')), row=3, col=1)
+    fig.add_trace(go.Scatter(x=indicadores.index, y=indicadores['McClellan'], mode='lines', name='McClellan', line=dict(color='#FECB52')), row=4, col=1)
+    fig.add_hline(y=0, line_color='gray', line_dash='dash', row=4, col=1)
+    fig.update_yaxes(range=[0, 100], row=1, col=1)
+    fig.update_layout(template='plotly_dark', height=900, barmode='relative', bargap=0, title_x=0, legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+    return reduzir_figura(fig)
+
+@instrumentar('amplitude')
 def gerar_grafico_amplitude(dados_amplitude, mediana):
     if dados_amplitude.empty: return None
     st.info("Gerando o gráfico de linha...")
@@ -252,8 +262,9 @@ def gerar_grafico_amplitude(dados_amplitude, mediana):
     fig.add_hline(y=30, line_color='green', line_dash='dash', annotation_text='Sobrevenda (30%)', annotation_position="bottom right")
     fig.add_trace(go.Scatter(x=dados_amplitude.index, y=dados_amplitude, mode='lines', name='% Acima da MMA 200', line=dict(color='#636EFA', width=2)))
     fig.update_layout(title_text='Raio-X do Mercado (desde 2014)', title_x=0, yaxis_title='Percentual de Ativos (%)', xaxis_title='Data', template='plotly_dark', yaxis_range=[0, 100], legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-    return fig
+    return reduzir_figura(fig)
 
+@instrumentar('amplitude')
 def gerar_grafico_distribuicao_amplitude(dados_amplitude, mediana):
     if dados_amplitude.empty: return None
     st.info("Gerando o gráfico de distribuição...")
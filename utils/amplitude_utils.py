@@ -0,0 +1,162 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.armazenamento_utils import caminho_dados, escrever_atomico, ler_parquet, salvar_parquet
+
+# --- Estado incremental do indicador de amplitude (% de ativos acima da MMA) ---
+# O estado guarda, por ticker, os últimos `janela` preços (buffer circular), a soma dos preços
+# válidos da janela e quantos faltantes ela contém. Avançar um dia custa O(tickers).
+# As somas são feitas em float64 sobre preços float32, o que é exato para qualquer janela
+# realista e reproduz bit a bit o rolling(janela).mean() do pandas.
+NOME_ESTADO_AMPLITUDE = 'amplitude_estado'
+NOME_SERIE_AMPLITUDE = 'amplitude_serie'
+
+def _estado_vazio(tickers, janela):
+    n = len(tickers)
+    return {
+        'tickers': np.asarray(tickers, dtype=str),
+        'janela': np.int64(janela),
+        'buffer': np.full((janela, n), np.nan, dtype='float32'),
+        'posicao': np.int64(0),
+        'soma': np.zeros(n, dtype='float64'),
+        'faltantes': np.full(n, janela, dtype='int64'),
+        'ultima_data': np.datetime64('NaT', 'ns'),
+    }
+
+def _avancar(estado, precos_dia):
+    """Insere os preços de um dia no estado e retorna o % de ativos acima da média (NaN se não há preços)."""
+    janela, posicao = int(estado['janela']), int(estado['posicao'])
+    saindo = estado['buffer'][posicao]
+    saindo_nan = np.isnan(saindo)
+    estado['soma'] -= np.where(saindo_nan, 0.0, saindo)
+    estado['faltantes'] -= saindo_nan
+
+    entrando_nan = np.isnan(precos_dia)
+    estado['buffer'][posicao] = precos_dia
+    estado['soma'] += np.where(entrando_nan, 0.0, precos_dia.astype('float64'))
+    estado['faltantes'] += entrando_nan
+    estado['posicao'] = np.int64((posicao + 1) % janela)
+
+    media = np.where(estado['faltantes'] == 0, estado['soma'] / janela, np.nan)
+    validos = (~entrando_nan).sum()
+    return (precos_dia > media).sum() / validos * 100 if validos else np.nan
+
+def _buffer_cronologico(estado):
+    return np.roll(estado['buffer'], -int(estado['posicao']), axis=0)
+
+def _estado_compativel(estado, precos):
+    """O estado só é reaproveitado se os tickers são os mesmos e a janela armazenada bate com os preços atuais
+    (um ajuste de proventos/desdobramento no histórico baixado força a reconstrução)."""
+    if estado is None or set(estado['tickers']) != set(precos.columns): return False
+    ultima_data = pd.Timestamp(estado['ultima_data'])
+    if pd.isna(ultima_data) or ultima_data not in precos.index: return False
+    janela = int(estado['janela'])
+    recentes = precos.loc[:ultima_data, list(estado['tickers'])].tail(janela).to_numpy(dtype='float32')
+    esperado = _buffer_cronologico(estado)[janela - len(recentes):]
+    return np.array_equal(recentes, esperado, equal_nan=True)
+
+def carregar_estado_amplitude():
+    caminho = caminho_dados(f'{NOME_ESTADO_AMPLITUDE}.npz')
+    serie = ler_parquet(NOME_SERIE_AMPLITUDE)
+    if not os.path.exists(caminho) or serie is None: return None, None
+    try:
+        with np.load(caminho, allow_pickle=False) as arquivo:
+            estado = {chave: arquivo[chave][()] if arquivo[chave].ndim == 0 else arquivo[chave] for chave in arquivo.files}
+    except Exception:
+        return None, None
+    serie = serie.iloc[:, 0]
+    # Estado e série são dois arquivos: se discordam na última data (queda entre as gravações), reconstrói
+    if serie.empty or serie.index[-1] != pd.Timestamp(estado['ultima_data']): return None, None
+    return estado, serie
+
+def salvar_estado_amplitude(estado, serie):
+    # Série antes do estado: o estado nunca fica à frente da série gravada
+    salvar_parquet(serie.to_frame('percentual'), NOME_SERIE_AMPLITUDE)
+    def _escrever(caminho_tmp):
+        with open(caminho_tmp, 'wb') as f: np.savez(f, **estado)
+    escrever_atomico(caminho_dados(f'{NOME_ESTADO_AMPLITUDE}.npz'), _escrever)
+
+def _processar_dias(estado, precos):
+    valores = precos.to_numpy(dtype='float32')
+    percentuais = np.array([_avancar(estado, linha) for linha in valores], dtype='float64')
+    if len(precos): estado['ultima_data'] = np.datetime64(precos.index[-1], 'ns')
+    return pd.Series(percentuais, index=precos.index)
+
+def reconstruir_amplitude(precos, janela=200):
+    """Reconstrução completa (usada na primeira execução e para verificação): mesmo caminho de cálculo do modo incremental."""
+    estado = _estado_vazio(precos.columns, janela)
+    return estado, _processar_dias(estado, precos)
+
+def atualizar_amplitude(precos, janela=200, reconstruir=False):
+    """
+    Série histórica do % de ativos acima da MMA de `janela` dias. Reaproveita o estado persistido
+    e processa apenas as datas posteriores à última já calculada; `reconstruir=True` força o recálculo integral.
+    """
+    estado, serie = (None, None) if reconstruir else carregar_estado_amplitude()
+    if estado is not None and int(estado['janela']) == janela and _estado_compativel(estado, precos):
+        precos_novos = precos.loc[precos.index > pd.Timestamp(estado['ultima_data']), list(estado['tickers'])]
+        serie = pd.concat([serie, _processar_dias(estado, precos_novos)])
+    else:
+        estado, serie = reconstruir_amplitude(precos, janela)
+    salvar_estado_amplitude(estado, serie)
+    return serie
+
+# --- Indicadores de amplitude em uma passada por blocos de colunas ---
+# Cada bloco de tickers contribui com contagens por data (acima das MMAs, máximas/mínimas de 52 semanas,
+# altas e baixas); só os vetores de contagem, do tamanho do número de datas, acumulam entre blocos.
+# O pico de memória fica limitado a algumas cópias de um bloco (datas x tamanho_bloco), não da matriz inteira.
+JANELAS_MEDIAS_AMPLITUDE = (20, 50, 200)
+JANELA_EXTREMOS = 252
+TAMANHO_BLOCO_AMPLITUDE = 256
+
+def _contagens_bloco(bloco, janelas, janela_extremos):
+    precos = bloco.to_numpy(dtype='float32')
+    validos = ~np.isnan(precos)
+    contagens = {'validos': validos.sum(axis=1)}
+
+    acumulado = np.zeros((len(precos) + 1, precos.shape[1]), dtype='float64')
+    np.cumsum(np.where(validos, precos, 0.0), axis=0, out=acumulado[1:])
+    faltantes = np.zeros_like(acumulado, dtype='int64')
+    np.cumsum(~validos, axis=0, out=faltantes[1:])
+    for janela in janelas:
+        acima = np.zeros(len(precos), dtype='int64')
+        if janela <= len(precos):
+            completos = (faltantes[janela:] - faltantes[:-janela]) == 0
+            media = (acumulado[janela:] - acumulado[:-janela]) / janela
+            acima[janela - 1:] = (completos & (precos[janela - 1:] > media)).sum(axis=1)
+        contagens[f'acima_{janela}'] = acima
+
+    maximas = bloco.rolling(janela_extremos, min_periods=janela_extremos).max().to_numpy()
+    minimas = bloco.rolling(janela_extremos, min_periods=janela_extremos).min().to_numpy()
+    contagens['maximas'] = (precos >= maximas).sum(axis=1)
+    contagens['minimas'] = (precos <= minimas).sum(axis=1)
+
+    variacao = np.diff(precos, axis=0, prepend=np.nan)
+    contagens['altas'] = (variacao > 0).sum(axis=1)
+    contagens['baixas'] = (variacao < 0).sum(axis=1)
+    return contagens
+
+def calcular_indicadores_amplitude(precos, janelas=JANELAS_MEDIAS_AMPLITUDE, janela_extremos=JANELA_EXTREMOS, tamanho_bloco=TAMANHO_BLOCO_AMPLITUDE):
+    """
+    % de ativos acima de cada MMA em `janelas`, novas máximas/mínimas de `janela_extremos` pregões,
+    altas/baixas do dia, linha de avanço-declínio e oscilador McClellan (MME 19 - MME 39 das altas líquidas).
+    O % acima da média usa como denominador os ativos com preço no dia, como o indicador incremental acima.
+    """
+    totais = None
+    for inicio in range(0, precos.shape[1], tamanho_bloco):
+        contagens = _contagens_bloco(precos.iloc[:, inicio:inicio + tamanho_bloco], janelas, janela_extremos)
+        totais = contagens if totais is None else {chave: totais[chave] + valor for chave, valor in contagens.items()}
+    if totais is None: return pd.DataFrame()
+
+    validos = np.where(totais['validos'] > 0, totais['validos'], np.nan)
+    indicadores = pd.DataFrame(index=precos.index)
+    for janela in janelas:
+        indicadores[f'% Acima MMA {janela}'] = totais[f'acima_{janela}'] / validos * 100
+    indicadores['Novas Máximas'] = totais['maximas']
+    indicadores['Novas Mínimas'] = totais['minimas']
+    indicadores['Altas'] = totais['altas']
+    indicadores['Baixas'] = totais['baixas']
+    liquido = pd.Series(totais['altas'] - totais['baixas'], index=precos.index, dtype='float64')
+    indicadores['Linha A/D'] = liquido.cumsum()
+    indicadores['McClellan'] = liquido.ewm(span=19, adjust=False).mean() - liquido.ewm(span=39, adjust=False).mean()
+    return indicadores[totais['validos'] > 0]
@@ -0,0 +1,100 @@
+import os
+import json
+import tempfile
+import pandas as pd
+
+# --- Armazenamento local (Parquet + metadados) compartilhado pelos carregadores ---
+DIRETORIO_DADOS = os.environ.get(
+    'MOBBT_DIRETORIO_DADOS',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.mobbt_dados')
+)
+
+def caminho_dados(*partes):
+    caminho = os.path.join(DIRETORIO_DADOS, *partes)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    return caminho
+
+def escrever_atomico(caminho, escrever):
+    """Escreve em um arquivo temporário no mesmo diretório e o move para o destino com os.replace."""
+    fd, caminho_tmp = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+    os.close(fd)
+    try:
+        escrever(caminho_tmp)
+        os.replace(caminho_tmp, caminho)
+    except Exception:
+        if os.path.exists(caminho_tmp): os.remove(caminho_tmp)
+        raise
+
+def ler_parquet(nome):
+    caminho = caminho_dados(f'{nome}.parquet')
+    if not os.path.exists(caminho): return None
+    try:
+        return pd.read_parquet(caminho)
+    except Exception:
+        # Arquivo corrompido ou de versão incompatível: o chamador recarrega da fonte
+        return None
+
+def salvar_parquet(df, nome):
+    escrever_atomico(caminho_dados(f'{nome}.parquet'), lambda caminho_tmp: df.to_parquet(caminho_tmp))
+
+def ler_metadados(nome):
+    caminho = caminho_dados(f'{nome}.json')
+    if not os.path.exists(caminho): return {}
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f: return json.load(f)
+    except Exception:
+        return {}
+
+def salvar_metadados(nome, metadados):
+    def _escrever(caminho_tmp):
+        with open(caminho_tmp, 'w', encoding='utf-8') as f: json.dump(metadados, f, ensure_ascii=False, default=str)
+    escrever_atomico(caminho_dados(f'{nome}.json'), _escrever)
+
+# --- Snapshots versionados (escritos pelo pipeline offline, lidos pelas páginas) ---
+# Cada publicação grava snapshots/<nome>/<versao>.parquet e só então troca o ponteiro ATUAL.json;
+# leitores sempre enxergam uma versão completa. Só as VERSOES_SNAPSHOT mais recentes são mantidas.
+VERSOES_SNAPSHOT = 3
+
+def publicar_snapshot(nome, df, metadados=None):
+    versao = pd.Timestamp.now().strftime('%Y%m%d%H%M%S%f')
+    diretorio = os.path.dirname(caminho_dados('snapshots', nome, 'ATUAL.json'))
+    escrever_atomico(os.path.join(diretorio, f'{versao}.parquet'), lambda caminho_tmp: df.to_parquet(caminho_tmp))
+    def _escrever(caminho_tmp):
+        with open(caminho_tmp, 'w', encoding='utf-8') as f: json.dump({**(metadados or {}), 'versao': versao}, f, ensure_ascii=False, default=str)
+    escrever_atomico(os.path.join(diretorio, 'ATUAL.json'), _escrever)
+    antigas = sorted(a for a in os.listdir(diretorio) if a.endswith('.parquet') and a != f'{versao}.parquet')
+    for antiga in antigas[:max(len(antigas) - (VERSOES_SNAPSHOT - 1), 0)]:
+        os.remove(os.path.join(diretorio, antiga))
+    return versao
+
+def versao_snapshot(nome):
+    try:
+        with open(os.path.join(DIRETORIO_DADOS, 'snapshots', nome, 'ATUAL.json'), 'r', encoding='utf-8') as f: return json.load(f)['versao']
+    except Exception:
+        return None
+
+# Última versão lida de cada snapshot: reruns das páginas só relêem o Parquet quando o ponteiro muda
+_snapshots_lidos = {}
+
+def ler_snapshot(nome):
+    """(DataFrame, metadados) da versão atual do snapshot `nome`; (None, {}) se não houver."""
+    diretorio = os.path.join(DIRETORIO_DADOS, 'snapshots', nome)
+    try:
+        with open(os.path.join(diretorio, 'ATUAL.json'), 'r', encoding='utf-8') as f: metadados = json.load(f)
+        lido = _snapshots_lidos.get(nome)
+        if lido is None or lido[1]['versao'] != metadados['versao']:
+            lido = pd.read_parquet(os.path.join(diretorio, f"{metadados['versao']}.parquet")), metadados
+            _snapshots_lidos[nome] = lido
+        return lido[0].copy(deep=False), dict(lido[1])
+    except Exception:
+        return None, {}
+
+def ler_snapshot_em_dia(nome, ultima_data, coluna=None):
+    """
+    Snapshot `nome` se ele já cobre `ultima_data`, a última data da entrada de que ele deriva (pelo índice ou
+    por `coluna`); None se não houver snapshot ou se ele estiver atrasado, e o chamador calcula a partir da entrada.
+    """
+    df, _ = ler_snapshot(nome)
+    if df is None or df.empty or pd.isna(ultima_data): return None
+    data_snapshot = df.index.max() if coluna is None else df[coluna].max()
+    return df if data_snapshot == pd.Timestamp(ultima_data) else None
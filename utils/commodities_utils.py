@@ -1,26 +1,85 @@
-import streamlit as st
 import pandas as pd
 import numpy as np
 import yfinance as yf
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from utils.armazenamento_utils import ler_parquet, salvar_parquet
+from utils.graficos_utils import reduzir_pontos
+from utils.registro_dados_utils import obter_dataset, interface_carga
+from utils.instrumentacao_utils import instrumentar, cache_instrumentado
+from utils.transporte_utils import chamar_fonte
 
-@st.cache_data(ttl=3600*4)
+COMMODITIES_MAP = {'Petróleo Brent': 'BZ=F', 'Cacau': 'CC=F', 'Petróleo WTI': 'CL=F', 'Algodão': 'CT=F', 'Ouro': 'GC=F', 'Cobre': 'HG=F', 'Óleo de Aquecimento': 'HO=F', 'Café': 'KC=F', 'Trigo (KC HRW)': 'KE=F', 'Madeira': 'LBS=F', 'Gado Bovino': 'LE=F', 'Gás Natural': 'NG=F', 'Suco de Laranja': 'OJ=F', 'Paládio': 'PA=F', 'Platina': 'PL=F', 'Gasolina RBOB': 'RB=F', 'Açúcar': 'SB=F', 'Prata': 'SI=F', 'Milho': 'ZC=F', 'Óleo de Soja': 'ZL=F', 'Aveia': 'ZO=F', 'Arroz': 'ZR=F', 'Soja': 'ZS=F'}
+CATEGORIZED_COMMODITIES = {'Energia': ['Petróleo Brent', 'Petróleo WTI', 'Óleo de Aquecimento', 'Gás Natural', 'Gasolina RBOB'], 'Metais Preciosos': ['Ouro', 'Paládio', 'Platina', 'Prata'], 'Metais Industriais': ['Cobre'], 'Agricultura': ['Cacau', 'Algodão', 'Café', 'Trigo (KC HRW)', 'Madeira', 'Gado Bovino', 'Suco de Laranja', 'Açúcar', 'Milho', 'Óleo de Soja', 'Aveia', 'Arroz', 'Soja']}
+NOME_BASE_COMMODITIES = 'commodities_precos'
+DIAS_SOBREPOSICAO_COMMODITIES = 5
+DIAS_DEFASAGEM_COMMODITIES = 10
+PONTOS_HISTORICO_MODO_LEVE = 300
+
+def _baixar_fechamentos_commodities(tickers, **periodo):
+    """Uma única chamada multi-ticker ao yfinance. Retorna (fechamentos, tickers_sem_dados)."""
+    identificador = f"{','.join(tickers)}|{periodo.get('period', 'incremental')}"
+    data = chamar_fonte('yfinance', identificador, yf.download, tickers, auto_adjust=True, progress=False, threads=True, **periodo)
+    if data.empty: return pd.DataFrame(), list(tickers)
+    fechamentos = data['Close'] if isinstance(data.columns, pd.MultiIndex) else data[['Close']].rename(columns={'Close': tickers[0]})
+    fechamentos = fechamentos.dropna(axis=1, how='all')
+    return fechamentos, [t for t in tickers if t not in fechamentos.columns]
+
+def _atualizar_base_commodities():
+    """Atualiza a matriz local de fechamentos: histórico completo só para tickers ainda não armazenados,
+    e apenas as barras posteriores à última data salva para os demais."""
+    tickers = list(COMMODITIES_MAP.values())
+    armazenada = ler_parquet(NOME_BASE_COMMODITIES)
+    sem_historico = tickers if armazenada is None else [t for t in tickers if t not in armazenada.columns]
+    com_historico = [t for t in tickers if t not in sem_historico]
+    partes, falhas = [], []
+    if com_historico:
+        # Os tickers em dia vão juntos, a partir da última data válida mais antiga entre eles (falhas de dias anteriores
+        # não viram lacunas); um contrato atrasado (vencido, sem negociação) vai sozinho, sem alargar a janela do lote
+        ultimas = armazenada[com_historico].apply(pd.Series.last_valid_index)
+        em_dia = ultimas >= ultimas.max() - timedelta(days=DIAS_DEFASAGEM_COMMODITIES)
+        grupos = [(list(ultimas.index[em_dia]), False)] + [([ticker], True) for ticker in ultimas.index[~em_dia]]
+        for grupo, atrasado in grupos:
+            inicio = ultimas[grupo].min() - timedelta(days=DIAS_SOBREPOSICAO_COMMODITIES)
+            cauda, falhas_cauda = _baixar_fechamentos_commodities(grupo, start=inicio)
+            partes.append(cauda)
+            # Nenhuma barra nova para o lote em dia (fim de semana/feriado) não é falha; um atrasado sem barras segue em falha
+            if not cauda.empty or atrasado: falhas += falhas_cauda
+    if sem_historico:
+        completos, falhas_completos = _baixar_fechamentos_commodities(sem_historico, period='max')
+        partes.append(completos)
+        falhas += falhas_completos
+    matriz = armazenada
+    for novos in partes:
+        if not novos.empty:
+            matriz = novos if matriz is None else novos.combine_first(matriz)
+    if matriz is not None and any(not p.empty for p in partes):
+        salvar_parquet(matriz.sort_index(), NOME_BASE_COMMODITIES)
+    return matriz, falhas
+
+@instrumentar('commodities')
 def carregar_dados_commodities():
-    commodities_map = {'Petróleo Brent': 'BZ=F', 'Cacau': 'CC=F', 'Petróleo WTI': 'CL=F', 'Algodão': 'CT=F', 'Ouro': 'GC=F', 'Cobre': 'HG=F', 'Óleo de Aquecimento': 'HO=F', 'Café': 'KC=F', 'Trigo (KC HRW)': 'KE=F', 'Madeira': 'LBS=F', 'Gado Bovino': 'LE=F', 'Gás Natural': 'NG=F', 'Suco de Laranja': 'OJ=F', 'Paládio': 'PA=F', 'Platina': 'PL=F', 'Gasolina RBOB': 'RB=F', 'Açúcar': 'SB=F', 'Prata': 'SI=F', 'Milho': 'ZC=F', 'Óleo de Soja': 'ZL=F', 'Aveia': 'ZO=F', 'Arroz': 'ZR=F', 'Soja': 'ZS=F'}
-    dados_commodities_raw = {}
-    with st.spinner("Baixando dados históricos de commodities... (cache de 4h)"):
-        for nome, ticker in commodities_map.items():
-            try:
-                dado = yf.download(ticker, period='max', auto_adjust=True, progress=False)
-                if not dado.empty:
-                    dados_commodities_raw[nome] = dado['Close']
-            except Exception:
-                pass
-    categorized_commodities = {'Energia': ['Petróleo Brent', 'Petróleo WTI', 'Óleo de Aquecimento', 'Gás Natural', 'Gasolina RBOB'], 'Metais Preciosos': ['Ouro', 'Paládio', 'Platina', 'Prata'], 'Metais Industriais': ['Cobre'], 'Agricultura': ['Cacau', 'Algodão', 'Café', 'Trigo (KC HRW)', 'Madeira', 'Gado Bovino', 'Suco de Laranja', 'Açúcar', 'Milho', 'Óleo de Soja', 'Aveia', 'Arroz', 'Soja']}
+    return obter_dataset(NOME_BASE_COMMODITIES, _carregar_dados_commodities, validade=3600*4, inicial=lambda: _organizar_por_categoria(ler_parquet(NOME_BASE_COMMODITIES)))
+
+def _carregar_dados_commodities():
+    tela = interface_carga()
+    with tela.spinner("Atualizando dados históricos de commodities... (cache de 4h)"):
+        try:
+            matriz, falhas = _atualizar_base_commodities()
+        except Exception as e:
+            tela.warning(f"Falha ao atualizar commodities, usando a última versão local: {e}")
+            matriz, falhas = ler_parquet(NOME_BASE_COMMODITIES), []
+    nomes_por_ticker = {ticker: nome for nome, ticker in COMMODITIES_MAP.items()}
+    for ticker in falhas:
+        tela.warning(f"Não foi possível atualizar '{nomes_por_ticker[ticker]}' ({ticker}).")
+    return _organizar_por_categoria(matriz)
+
+def _organizar_por_categoria(matriz):
+    if matriz is None: return {}
+    dados_commodities_raw = {nome: matriz[ticker].dropna() for nome, ticker in COMMODITIES_MAP.items() if ticker in matriz.columns and matriz[ticker].notna().any()}
     dados_por_categoria = {}
-    for categoria, nomes in categorized_commodities.items():
+    for categoria, nomes in CATEGORIZED_COMMODITIES.items():
         series_da_categoria = {nome: dados_commodities_raw[nome] for nome in nomes if nome in dados_commodities_raw}
         if series_da_categoria:
             df_cat = pd.concat(series_da_categoria, axis=1)
@@ -28,6 +87,7 @@ def carregar_dados_commodities():
             dados_por_categoria[categoria] = df_cat
     return dados_por_categoria
 
+@instrumentar('commodities')
 def calcular_variacao_commodities(dados_por_categoria):
     all_series = [s for df in dados_por_categoria.values() for s in [df[col].dropna() for col in df.columns]]
     if not all_series: return pd.DataFrame()
@@ -52,17 +112,27 @@ def colorir_negativo_positivo(val):
     if pd.isna(val) or val == 0: return ''
     return f"color: {'#4CAF50' if val > 0 else '#F44336'}"
 
-def gerar_dashboard_commodities(dados_preco_por_categoria):
+@instrumentar('commodities')
+def gerar_dashboard_commodities(dados_preco_por_categoria, modo_leve=False):
+    """
+    No modo leve os traces usam WebGL (Scattergl) e cada série leva o último ano em resolução total
+    mais o histórico anterior reduzido a PONTOS_HISTORICO_MODO_LEVE pontos.
+    """
     all_commodity_names = [name for df in dados_preco_por_categoria.values() for name in df.columns]
     total_subplots = len(all_commodity_names)
     if total_subplots == 0: return go.Figure().update_layout(title_text="Nenhum dado de commodity disponível.")
     num_cols, num_rows = 4, int(np.ceil(total_subplots / 4))
     fig = make_subplots(rows=num_rows, cols=num_cols, subplot_titles=all_commodity_names)
-    idx = 0
+    idx = 0; inicio_resolucao_total = datetime.now() - timedelta(days=365)
     for df_cat in dados_preco_por_categoria.values():
         for commodity_name in df_cat.columns:
             row, col = (idx // num_cols) + 1, (idx % num_cols) + 1
-            fig.add_trace(go.Scatter(x=df_cat.index, y=df_cat[commodity_name], mode='lines', name=commodity_name), row=row, col=col)
+            if modo_leve:
+                serie = df_cat[commodity_name].dropna()
+                x, y = reduzir_pontos(serie.index.values, serie.values, PONTOS_HISTORICO_MODO_LEVE, inicio_resolucao_total)
+                fig.add_trace(go.Scattergl(x=x, y=y, mode='lines', name=commodity_name), row=row, col=col)
+            else:
+                fig.add_trace(go.Scatter(x=df_cat.index, y=df_cat[commodity_name], mode='lines', name=commodity_name), row=row, col=col)
             idx += 1
     end_date = datetime.now(); buttons = [];
     periods = {'1M': 30, '3M': 91, '6M': 182, 'YTD': 'ytd', '1A': 365, '5A': 365*5, '10A': 3650, 'Máx': 'max'}
@@ -1,62 +1,118 @@
 import streamlit as st
 import pandas as pd
-import requests
 import io
+from concurrent.futures import ThreadPoolExecutor
 import plotly.express as px
 import plotly.graph_objects as go
+from utils.armazenamento_utils import ler_parquet, salvar_parquet, ler_metadados, salvar_metadados, ler_snapshot
+from utils.rede_utils import baixar_se_modificado
+from utils.graficos_utils import reduzir_figura
+from utils.registro_dados_utils import obter_dataset, interface_carga
+from utils.instrumentacao_utils import instrumentar
 
-@st.cache_data(ttl=3600*4)
-def carregar_dados_idex():
-    st.info("Carregando dados do IDEX JGP... (Cache de 4h)")
-    url_geral = "https://jgp-credito-public-s3.s3.us-east-1.amazonaws.com/idex/idex_cdi_geral_datafile.xlsx"
-    url_low_rated = "https://jgp-credito-public-s3.s3.us-east-1.amazonaws.com/idex/idex_cdi_low_rated_datafile.xlsx"
-    emissores_para_remover = ['AMERICANAS SA', 'Light - Servicos de Eletricidade', 'Aeris', 'Viveo']
+URLS_IDEX = {
+    'geral': "https://jgp-credito-public-s3.s3.us-east-1.amazonaws.com/idex/idex_cdi_geral_datafile.xlsx",
+    'low_rated': "https://jgp-credito-public-s3.s3.us-east-1.amazonaws.com/idex/idex_cdi_low_rated_datafile.xlsx",
+    'infra': "https://jgp-credito-public-s3.s3.us-east-1.amazonaws.com/idex/idex_infra_geral_datafile.xlsx",
+}
+COLUNAS_IDEX = {
+    'geral': ['Data', 'Emissor', 'Peso no índice (%)', 'Spread de compra (%)'],
+    'low_rated': ['Data', 'Emissor', 'Peso no índice (%)', 'Spread de compra (%)'],
+    'infra': ['Data', 'Peso no índice (%)', 'MID spread (Bps/NTNB)'],
+}
+EMISSORES_PARA_REMOVER = ['AMERICANAS SA', 'Light - Servicos de Eletricidade', 'Aeris', 'Viveo']
+
+def _obter_detalhado_idex(nome):
+    """Aba 'Detalhado' da planilha, parseada uma única vez por versão (ETag) e guardada em Parquet."""
+    nome_base = f'idex_{nome}'
+    df_local = ler_parquet(nome_base)
+    metadados = ler_metadados(nome_base) if df_local is not None else {}
+    conteudo, novos_metadados = baixar_se_modificado(URLS_IDEX[nome], metadados)
+    if conteudo is None: return df_local
+    df = pd.read_excel(io.BytesIO(conteudo), sheet_name='Detalhado')
+    df.columns = df.columns.str.strip()
+    df = df[COLUNAS_IDEX[nome]].copy()
+    df['Data'] = pd.to_datetime(df['Data'])
+    salvar_parquet(df, nome_base)
+    salvar_metadados(nome_base, novos_metadados)
+    return df
+
+def _obter_detalhado_idex_ou_local(nome):
+    # Uma planilha com problema não derruba as outras: vale a última versão local dela, se houver
+    try:
+        return _obter_detalhado_idex(nome), None
+    except Exception as e:
+        return ler_parquet(f'idex_{nome}'), e
 
-    def _processar_url(url):
-        response = requests.get(url)
-        response.raise_for_status()
-        df = pd.read_excel(io.BytesIO(response.content), sheet_name='Detalhado')
-        df.columns = df.columns.str.strip()
-        df_filtrado = df[~df['Emissor'].isin(emissores_para_remover)].copy()
-        df_filtrado['Data'] = pd.to_datetime(df_filtrado['Data'])
-        df_filtrado['weighted_spread'] = df_filtrado['Peso no índice (%)'] * df_filtrado['Spread de compra (%)']
-        daily_spread = df_filtrado.groupby('Data').apply(lambda x: x['weighted_spread'].sum() / x['Peso no índice (%)'].sum() if x['Peso no índice (%)'].sum() != 0 else 0).reset_index(name='spread')
-        return daily_spread.set_index('Data')
+@instrumentar('idex')
+def obter_planilhas_idex(nomes=tuple(URLS_IDEX)):
+    """
+    Baixa as planilhas pedidas do IDEX em paralelo (cada uma só se mudou na origem). Cada carregador pede só as
+    suas, então uma planilha que falhe sem cópia local afeta apenas quem depende dela.
+    """
+    with ThreadPoolExecutor(max_workers=len(nomes)) as executor:
+        futuros = {nome: executor.submit(_obter_detalhado_idex_ou_local, nome) for nome in nomes}
+    planilhas = {}
+    for nome, futuro in futuros.items():
+        df, erro = futuro.result()
+        if df is None: raise RuntimeError(f"Planilha '{nome}' do IDEX indisponível: {erro}")
+        if erro is not None: interface_carga().warning(f"Falha ao atualizar a planilha '{nome}' do IDEX, usando a última versão local: {erro}")
+        planilhas[nome] = df
+    return planilhas
 
+def calcular_spread_ponderado(df, coluna_spread, nome_resultado):
+    """Spread médio ponderado pelo peso no índice para cada data, com somas agrupadas (sem callback por data)."""
+    ponderado = (df['Peso no índice (%)'] * df[coluna_spread]).groupby(df['Data']).sum()
+    soma_pesos = df.groupby('Data')['Peso no índice (%)'].sum()
+    spread = (ponderado / soma_pesos).where(soma_pesos != 0, 0.0)
+    return spread.rename(nome_resultado).to_frame()
+
+def _idex_do_snapshot(nome):
+    # Snapshot publicado pelo pipeline offline (python -m pipeline idex idex_infra)
+    df, _ = ler_snapshot(nome)
+    return df
+
+@instrumentar('idex')
+def carregar_dados_idex():
+    """Spreads do IDEX JGP: o snapshot do pipeline é servido na hora e as planilhas são conferidas em segundo plano a cada 4h."""
     try:
-        spread_geral = _processar_url(url_geral)
-        spread_low_rated = _processar_url(url_low_rated)
-        df_final = pd.merge(spread_geral, spread_low_rated, on='Data', how='outer', suffixes=('_geral', '_low_rated'))
-        df_final.rename(columns={'spread_geral': 'IDEX Geral (Filtrado)', 'spread_low_rated': 'IDEX Low Rated (Filtrado)'}, inplace=True)
-        return df_final.sort_index()
+        return obter_dataset('idex', _carregar_dados_idex, validade=3600*4, inicial=lambda: _idex_do_snapshot('idex'))
     except Exception as e:
         st.error(f"Erro ao carregar dados do IDEX JGP: {e}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=3600*4)
+def _carregar_dados_idex():
+    planilhas = obter_planilhas_idex(('geral', 'low_rated'))
+    spreads = {}
+    for nome in ['geral', 'low_rated']:
+        df_filtrado = planilhas[nome][~planilhas[nome]['Emissor'].isin(EMISSORES_PARA_REMOVER)]
+        spreads[nome] = calcular_spread_ponderado(df_filtrado, 'Spread de compra (%)', 'spread')
+    df_final = pd.merge(spreads['geral'], spreads['low_rated'], on='Data', how='outer', suffixes=('_geral', '_low_rated'))
+    df_final.rename(columns={'spread_geral': 'IDEX Geral (Filtrado)', 'spread_low_rated': 'IDEX Low Rated (Filtrado)'}, inplace=True)
+    return df_final.sort_index()
+
+@instrumentar('idex')
 def carregar_dados_idex_infra():
-    st.info("Carregando dados do IDEX INFRA... (Cache de 4h)")
-    url_infra = "https://jgp-credito-public-s3.s3.us-east-1.amazonaws.com/idex/idex_infra_geral_datafile.xlsx"
+    """Spread do IDEX INFRA, servido como o IDEX JGP (snapshot na hora, planilha conferida em segundo plano)."""
     try:
-        response = requests.get(url_infra)
-        response.raise_for_status()
-        df = pd.read_excel(io.BytesIO(response.content), sheet_name='Detalhado')
-        df.columns = df.columns.str.strip()
-        df['Data'] = pd.to_datetime(df['Data'])
-        df['weighted_spread'] = df['Peso no índice (%)'] * df['MID spread (Bps/NTNB)']
-        daily_spread = df.groupby('Data').apply(lambda x: x['weighted_spread'].sum() / x['Peso no índice (%)'].sum() if x['Peso no índice (%)'].sum() != 0 else 0).reset_index(name='spread_bps_ntnb')
-        return daily_spread.set_index('Data').sort_index()
+        return obter_dataset('idex_infra', _carregar_dados_idex_infra, validade=3600*4, inicial=lambda: _idex_do_snapshot('idex_infra'))
     except Exception as e:
         st.error(f"Erro ao carregar dados do IDEX INFRA: {e}")
         return pd.DataFrame()
 
+def _carregar_dados_idex_infra():
+    df = obter_planilhas_idex(('infra',))['infra']
+    return calcular_spread_ponderado(df, 'MID spread (Bps/NTNB)', 'spread_bps_ntnb').sort_index()
+
+@instrumentar('idex')
 def gerar_grafico_idex_infra(df_idex_infra):
     if df_idex_infra.empty:
         return go.Figure().update_layout(title_text="Não foi possível gerar o gráfico do IDEX INFRA.")
     fig = px.line(df_idex_infra, y='spread_bps_ntnb', title='Histórico do Spread Médio Ponderado: IDEX INFRA', template='plotly_dark')
     fig.update_layout(title_x=0, yaxis_title='Spread Médio (Bps sobre NTNB)', xaxis_title='Data', showlegend=False)
-    return fig
+    return reduzir_figura(fig)
 
+@instrumentar('idex')
 def gerar_grafico_idex(df_idex):
     if df_idex.empty:
         return go.Figure().update_layout(title_text="Não foi possível gerar o gráfico do IDEX.")
@@ -64,4 +120,4 @@ def gerar_grafico_idex(df_idex):
     fig.update_yaxes(tickformat=".2%")
     fig.update_traces(hovertemplate='%{y:.2%}')
     fig.update_layout(title_x=0, yaxis_title='Spread Médio Ponderado (%)', xaxis_title='Data', legend_title_text='Índice', legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-    return fig
+    return reduzir_figura(fig)
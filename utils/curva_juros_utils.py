@@ -0,0 +1,183 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from utils.armazenamento_utils import ler_parquet, salvar_parquet, ler_snapshot_em_dia
+from utils.graficos_utils import reduzir_figura
+from utils.instrumentacao_utils import instrumentar, cache_instrumentado
+
+# --- Ajuste em lote da ETTJ prefixada (Nelson-Siegel-Svensson) ---
+# As taxas de LTN e NTN-F são tratadas como taxas zero (aproximação usual para as NTN-F),
+# com o prazo medido em dias úteis / 252, como nos gráficos de ETTJ existentes.
+TIPOS_PREFIXADOS = ['Tesouro Prefixado', 'Tesouro Prefixado com Juros Semestrais']
+COLUNAS_PARAMETROS = ['beta0', 'beta1', 'beta2', 'beta3', 'tau1', 'tau2']
+NOME_BASE_PARAMETROS = 'curva_nss_parametros'
+MINIMO_TITULOS = 4
+# Ridge só nos fatores de inclinação e curvatura: sem ele, pares de tau quase colineares levam a betas de centenas
+REGULARIZACAO = 1e-3
+GRADE_TAU1 = np.geomspace(0.15, 6, 10)
+GRADE_TAU2 = np.geomspace(0.5, 25, 10)
+FATORES_REFINAMENTO = np.array([0.7, 0.85, 1.0, 1.15, 1.35])
+
+def _cargas_nss(prazos, tau1, tau2):
+    """Matriz de cargas (..., 4) do modelo NSS. prazos: (D, M); tau1, tau2: (D, 1)."""
+    x1, x2 = prazos / tau1, prazos / tau2
+    e1, e2 = np.exp(-x1), np.exp(-x2)
+    f1 = (1 - e1) / x1
+    f3 = (1 - e2) / x2 - e2
+    return np.stack([np.ones_like(prazos), f1, f1 - e1, f3], axis=-1)
+
+def _resolver_betas(prazos, taxas, mascara, tau1, tau2):
+    """Mínimos quadrados (com leve regularização) para todas as datas de uma vez, dados os taus de cada data."""
+    X = _cargas_nss(prazos, tau1, tau2) * mascara[..., None]
+    XtX = np.einsum('dmi,dmj->dij', X, X) + np.diag([0.0, REGULARIZACAO, REGULARIZACAO, REGULARIZACAO])
+    Xty = np.einsum('dmi,dm->di', X, taxas * mascara)
+    betas = np.linalg.solve(XtX, Xty[..., None])[..., 0]
+    residuos = (np.einsum('dmi,di->dm', X, betas) - taxas) * mascara
+    return betas, (residuos ** 2).sum(axis=1)
+
+def _melhor_candidato(prazos, taxas, mascara, candidatos_tau1, candidatos_tau2, melhor=None):
+    """Avalia K pares (tau1, tau2) por data — arrays (D, K) — e mantém o de menor erro em cada data."""
+    n_datas = prazos.shape[0]
+    if melhor is None:
+        melhor = (np.full((n_datas, 4), np.nan), np.full(n_datas, np.nan), np.full(n_datas, np.nan), np.full(n_datas, np.inf))
+    betas_m, tau1_m, tau2_m, sse_m = (a.copy() for a in melhor)
+    for k in range(candidatos_tau1.shape[1]):
+        t1, t2 = candidatos_tau1[:, k:k+1], candidatos_tau2[:, k:k+1]
+        validos = np.isfinite(t1[:, 0]) & np.isfinite(t2[:, 0])
+        if not validos.any(): continue
+        betas, sse = _resolver_betas(prazos, taxas, mascara, np.where(np.isfinite(t1), t1, 1.0), np.where(np.isfinite(t2), t2, 1.0))
+        melhora = validos & (sse < sse_m)
+        betas_m[melhora], sse_m[melhora] = betas[melhora], sse[melhora]
+        tau1_m[melhora], tau2_m[melhora] = t1[melhora, 0], t2[melhora, 0]
+    return betas_m, tau1_m, tau2_m, sse_m
+
+def _grade_local(tau1, tau2):
+    # O refinamento não sai do intervalo da grade global
+    f1, f2 = np.meshgrid(FATORES_REFINAMENTO, FATORES_REFINAMENTO, indexing='ij')
+    return (np.clip(tau1[:, None] * f1.ravel()[None, :], GRADE_TAU1[0], GRADE_TAU1[-1]),
+            np.clip(tau2[:, None] * f2.ravel()[None, :], GRADE_TAU2[0], GRADE_TAU2[-1]))
+
+def _ajustar_bloco(prazos, taxas, mascara, tau1_inicial=None, tau2_inicial=None, rodadas_refinamento=3):
+    """
+    Ajusta um bloco de datas consecutivas. Sem chute inicial, parte de uma grade global;
+    com chute (parâmetros do dia anterior já armazenados), refina apenas ao redor dele.
+    Em seguida cada dia também testa os taus do dia anterior (partida a quente ao longo do bloco).
+    """
+    n_datas = prazos.shape[0]
+    if tau1_inicial is None:
+        g1, g2 = np.meshgrid(GRADE_TAU1, GRADE_TAU2, indexing='ij')
+        g1, g2 = g1.ravel(), g2.ravel()
+        pares = g2 > g1 * 1.5
+        cand1, cand2 = np.broadcast_to(g1[pares], (n_datas, pares.sum())), np.broadcast_to(g2[pares], (n_datas, pares.sum()))
+    else:
+        cand1, cand2 = _grade_local(np.full(n_datas, tau1_inicial), np.full(n_datas, tau2_inicial))
+    melhor = _melhor_candidato(prazos, taxas, mascara, cand1, cand2)
+    for _ in range(rodadas_refinamento):
+        _, tau1, tau2, _ = melhor
+        melhor = _melhor_candidato(prazos, taxas, mascara, *_grade_local(tau1, tau2), melhor=melhor)
+        anterior1, anterior2 = np.r_[np.nan, tau1[:-1]], np.r_[np.nan, tau2[:-1]]
+        melhor = _melhor_candidato(prazos, taxas, mascara, anterior1[:, None], anterior2[:, None], melhor=melhor)
+    betas, tau1, tau2, sse = melhor
+    return np.column_stack([betas, tau1, tau2, np.sqrt(sse / np.maximum(mascara.sum(axis=1), 1))])
+
+def preparar_pontos_curva(df_tesouro, tipos_titulo=TIPOS_PREFIXADOS):
+    """Empacota os títulos de cada Data Base em matrizes (datas x títulos) preenchidas com zeros e uma máscara."""
+    df = df_tesouro.loc[df_tesouro['Tipo Titulo'].isin(tipos_titulo), ['Data Base', 'Data Vencimento', 'Taxa Compra Manha']].dropna()
+    df = df[df['Data Vencimento'] > df['Data Base']].sort_values(['Data Base', 'Data Vencimento'])
+    contagem = df.groupby('Data Base').size()
+    contagem = contagem[contagem >= MINIMO_TITULOS]
+    df = df[df['Data Base'].isin(contagem.index)]
+    datas = pd.DatetimeIndex(contagem.index)
+    if datas.empty:
+        return datas, np.empty((0, 0)), np.empty((0, 0)), np.empty((0, 0))
+    linha = np.repeat(np.arange(len(datas)), contagem.values)
+    coluna = np.arange(len(df)) - np.repeat(np.r_[0, np.cumsum(contagem.values)[:-1]], contagem.values)
+    dias_uteis = np.busday_count(df['Data Base'].values.astype('M8[D]'), df['Data Vencimento'].values.astype('M8[D]'))
+    prazos = np.ones((len(datas), contagem.max()))
+    taxas = np.zeros_like(prazos)
+    mascara = np.zeros_like(prazos)
+    prazos[linha, coluna] = np.maximum(dias_uteis, 1) / 252
+    taxas[linha, coluna] = df['Taxa Compra Manha'].values
+    mascara[linha, coluna] = 1.0
+    return datas, prazos, taxas, mascara
+
+def ajustar_curvas(df_tesouro, parametros_anteriores=None, tamanho_bloco=500):
+    """Ajusta a curva NSS para todas as datas-base ainda não presentes em `parametros_anteriores`, em blocos de datas."""
+    datas, prazos, taxas, mascara = preparar_pontos_curva(df_tesouro)
+    tau1_inicial = tau2_inicial = None
+    if parametros_anteriores is not None and not parametros_anteriores.empty:
+        novas = ~datas.isin(parametros_anteriores.index)
+        datas, prazos, taxas, mascara = datas[novas], prazos[novas], taxas[novas], mascara[novas]
+        tau1_inicial, tau2_inicial = parametros_anteriores[['tau1', 'tau2']].iloc[-1].astype(float)
+    if datas.empty:
+        return parametros_anteriores if parametros_anteriores is not None else pd.DataFrame(columns=COLUNAS_PARAMETROS + ['rmse'])
+
+    blocos = [slice(i, i + tamanho_bloco) for i in range(0, len(datas), tamanho_bloco)]
+    resultados = [_ajustar_bloco(prazos[b], taxas[b], mascara[b], tau1_inicial, tau2_inicial) for b in blocos]
+
+    novos = pd.DataFrame(np.vstack(resultados), index=datas, columns=COLUNAS_PARAMETROS + ['rmse']).astype('float32')
+    novos['n_titulos'] = mascara.sum(axis=1).astype('int16')
+    if parametros_anteriores is None or parametros_anteriores.empty:
+        return novos
+    return pd.concat([parametros_anteriores, novos]).sort_index()
+
+@cache_instrumentado('curva', ttl=3600*4)
+def obter_parametros_curva(df_tesouro):
+    """Parâmetros NSS por Data Base: o snapshot do pipeline offline (curva_nss) se estiver em dia com a base; senão, ajustados aqui."""
+    parametros = ler_snapshot_em_dia('curva_nss', df_tesouro['Data Base'].max())
+    return atualizar_parametros_curva(df_tesouro) if parametros is None else parametros
+
+def impressoes_por_data(df_tesouro, tipos_titulo=TIPOS_PREFIXADOS):
+    """Impressão digital dos pontos de cada Data Base (soma dos hashes das linhas): muda quando a origem corrige a data."""
+    df = df_tesouro.loc[df_tesouro['Tipo Titulo'].isin(tipos_titulo), ['Data Base', 'Data Vencimento', 'Taxa Compra Manha']].dropna()
+    return pd.util.hash_pandas_object(df, index=False).groupby(df['Data Base'].values).sum()
+
+def atualizar_parametros_curva(df_tesouro):
+    """
+    Parâmetros NSS por Data Base, persistidos localmente com a impressão dos pontos de cada data. A cada atualização
+    só são ajustadas as datas novas e as que a origem corrigiu (impressão diferente da gravada).
+    """
+    armazenados = ler_parquet(NOME_BASE_PARAMETROS)
+    impressoes = impressoes_por_data(df_tesouro)
+    parametros = None
+    if armazenados is not None and 'impressao' in armazenados:
+        parametros = armazenados[armazenados['impressao'] == impressoes.reindex(armazenados.index)].drop(columns='impressao')
+    atualizados = ajustar_curvas(df_tesouro, parametros)
+    atualizados['impressao'] = impressoes.reindex(atualizados.index).to_numpy()
+    if armazenados is None or 'impressao' not in armazenados or not atualizados['impressao'].equals(armazenados['impressao']):
+        salvar_parquet(atualizados, NOME_BASE_PARAMETROS)
+    return atualizados.drop(columns='impressao')
+
+def avaliar_curva(parametros, prazos_anos):
+    """Taxa (% a.a.) da curva ajustada nos prazos pedidos. `parametros` é uma linha ou um DataFrame de linhas."""
+    p = parametros.to_frame().T if isinstance(parametros, pd.Series) else parametros
+    prazos = np.maximum(np.atleast_1d(np.asarray(prazos_anos, dtype=float)), 1e-6)[None, :]
+    cargas = _cargas_nss(np.broadcast_to(prazos, (len(p), prazos.shape[1])), p[['tau1']].values.astype(float), p[['tau2']].values.astype(float))
+    taxas = np.einsum('dmi,di->dm', cargas, p[['beta0', 'beta1', 'beta2', 'beta3']].values.astype(float))
+    return pd.DataFrame(taxas, index=p.index, columns=np.atleast_1d(prazos_anos))
+
+@instrumentar('curva')
+def gerar_grafico_curva_ajustada(df_tesouro, parametros, data_base):
+    data_real = parametros.index[parametros.index <= pd.Timestamp(data_base)].max()
+    if pd.isna(data_real):
+        return go.Figure().update_layout(title_text="Não há curva ajustada para a data escolhida.", template='plotly_dark')
+    dias_uteis = np.arange(21, 252 * 12 + 1, 21)
+    curva = avaliar_curva(parametros.loc[data_real], dias_uteis / 252).iloc[0]
+    df_dia = df_tesouro[(df_tesouro['Data Base'] == data_real) & (df_tesouro['Tipo Titulo'].isin(TIPOS_PREFIXADOS))].sort_values('Data Vencimento')
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=dias_uteis, y=curva.values, mode='lines', name='Curva Ajustada (NSS)'))
+    fig.add_trace(go.Scatter(x=np.busday_count(df_dia['Data Base'].values.astype('M8[D]'), df_dia['Data Vencimento'].values.astype('M8[D]')), y=df_dia['Taxa Compra Manha'], mode='markers', name='Títulos (LTN/NTN-F)'))
+    fig.update_layout(title_text=f'Curva Ajustada em {data_real.strftime("%d/%m/%Y")} (RMSE {parametros.loc[data_real, "rmse"]:.3f} p.p.)', title_x=0, xaxis_title='Dias Úteis até o Vencimento', yaxis_title='Taxa (% a.a.)', template='plotly_dark', legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+    return fig
+
+@instrumentar('curva')
+def gerar_grafico_vertices_historicos(parametros, vertices_du):
+    if parametros.empty or not vertices_du:
+        return go.Figure().update_layout(title_text="Selecione um ou mais vértices para visualizar.", template='plotly_dark')
+    historico = avaliar_curva(parametros, np.asarray(vertices_du) / 252)
+    fig = go.Figure()
+    for du, coluna in zip(vertices_du, historico.columns):
+        fig.add_trace(go.Scatter(x=historico.index, y=historico[coluna], mode='lines', name=f'{du} d.u.'))
+    fig.update_layout(title_text='Histórico das Taxas nos Vértices da Curva Ajustada', title_x=0, xaxis_title='Data', yaxis_title='Taxa (% a.a.)', template='plotly_dark', legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+    return reduzir_figura(fig)
@@ -0,0 +1,69 @@
+import streamlit as st
+import pandas as pd
+import zipfile
+import io
+from utils.armazenamento_utils import ler_parquet, salvar_parquet, ler_metadados, salvar_metadados
+from utils.rede_utils import baixar_se_modificado
+from utils.instrumentacao_utils import instrumentar, cache_instrumentado
+
+# --- Gerenciador dos dados abertos da CVM (DOC/FCA e DOC/VLMO) ---
+# Cada arquivo é baixado, verificado, descompactado e parseado em um único lugar; todas as páginas
+# consomem as tabelas tipadas abaixo, e uma atualização custa uma requisição condicional por arquivo.
+def _preparar_movimentacoes(df_mov):
+    df_mov['Data_Movimentacao'] = pd.to_datetime(df_mov['Data_Movimentacao'], errors='coerce')
+    return df_mov.dropna(subset=['Data_Movimentacao']).reset_index(drop=True)
+
+ARQUIVOS_CVM = {
+    'FCA': {
+        'url': 'https://dados.cvm.gov.br/dados/CIA_ABERTA/DOC/FCA/DADOS/fca_cia_aberta_{ano}.zip',
+        'csv': 'fca_cia_aberta_valor_mobiliario_{ano}.csv',
+        'dtypes': {'CNPJ_Companhia': 'string', 'Codigo_Negociacao': 'string', 'Valor_Mobiliario': 'category', 'Mercado': 'category'},
+        'preparar': lambda df: df,
+    },
+    'VLMO': {
+        'url': 'https://dados.cvm.gov.br/dados/CIA_ABERTA/DOC/VLMO/DADOS/vlmo_cia_aberta_{ano}.zip',
+        'csv': 'vlmo_cia_aberta_con_{ano}.csv',
+        'dtypes': {'CNPJ_Companhia': 'category', 'Nome_Companhia': 'category', 'Tipo_Cargo': 'category', 'Tipo_Movimentacao': 'category', 'Data_Movimentacao': 'string', 'Volume': 'float64'},
+        'preparar': _preparar_movimentacoes,
+    },
+}
+
+def _ler_csv_do_zip(conteudo, nome_csv, dtypes):
+    """Verifica a integridade do zip e lê o membro direto da memória, carregando só as colunas usadas."""
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as z:
+        membro_corrompido = z.testzip()
+        if membro_corrompido is not None:
+            raise zipfile.BadZipFile(f"Membro corrompido no arquivo da CVM: {membro_corrompido}")
+        with z.open(nome_csv) as f:
+            return pd.read_csv(f, sep=';', encoding='ISO-8859-1', on_bad_lines='skip', usecols=list(dtypes), dtype=dtypes)
+
+@cache_instrumentado('cvm', ttl=3600*4, show_spinner=False)
+def obter_tabela_cvm(documento, ano):
+    """
+    Tabela parseada de um arquivo da CVM ('FCA' ou 'VLMO'). O resultado fica salvo em Parquet junto com o
+    ETag/Last-Modified da origem: sem mudança no arquivo, não há download nem parse.
+    """
+    config = ARQUIVOS_CVM[documento]
+    nome_base = f'cvm_{documento.lower()}_{ano}'
+    df_local = ler_parquet(nome_base)
+    metadados = ler_metadados(nome_base) if df_local is not None else {}
+    conteudo, novos_metadados = baixar_se_modificado(config['url'].format(ano=ano), metadados)
+    if conteudo is None: return df_local
+    df = config['preparar'](_ler_csv_do_zip(conteudo, config['csv'].format(ano=ano), config['dtypes']))
+    salvar_parquet(df, nome_base)
+    salvar_metadados(nome_base, novos_metadados)
+    return df
+
+def obter_universo_tickers(ano):
+    """Tickers de ações ordinárias e preferenciais negociadas em bolsa."""
+    df = obter_tabela_cvm('FCA', ano)
+    df_filtrado = df[(df['Valor_Mobiliario'].isin(['Ações Ordinárias', 'Ações Preferenciais'])) & (df['Mercado'] == 'Bolsa')]
+    return df_filtrado['Codigo_Negociacao'].dropna().unique().tolist()
+
+def obter_mapa_cnpj_ticker(ano):
+    """Um ticker por CNPJ (o primeiro listado no FCA)."""
+    df = obter_tabela_cvm('FCA', ano)
+    return df[['CNPJ_Companhia', 'Codigo_Negociacao']].dropna().drop_duplicates(subset=['CNPJ_Companhia']).astype(str).reset_index(drop=True)
+
+def obter_movimentacoes(ano):
+    return obter_tabela_cvm('VLMO', ano)
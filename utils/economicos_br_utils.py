@@ -1,18 +1,67 @@
-import streamlit as st
 import pandas as pd
 from bcb import sgs
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from utils.armazenamento_utils import ler_parquet, salvar_parquet, ler_snapshot
+from utils.rede_utils import executar_com_retentativas
+from utils.transporte_utils import chamar_fonte
+from utils.registro_dados_utils import obter_dataset, interface_carga
+from utils.instrumentacao_utils import instrumentar, cache_instrumentado
 
-@st.cache_data(ttl=3600*4)
+SERIES_CONFIG = {'Spread Bancário': {'id': 20783}, 'Inadimplência': {'id': 21082}, 'Crédito/PIB': {'id': 20622}, 'Juros Médio': {'id': 20714}, 'Confiança Consumidor': {'id': 4393}, 'IPCA': {'id': 16122}, 'Atraso 15-90d Total': {'id': 21006}, 'Atraso 15-90d Agro': {'id': 21069}, 'Inadimplência Crédito Rural': {'id': 21146}}
+DATA_INICIAL_BCB = '2010-01-01'
+MAX_CONEXOES_BCB = 4
+MAX_ULTIMAS_BCB = 20
+
+def _atualizar_serie_bcb(codigo):
+    """
+    Atualiza a série SGS armazenada localmente pedindo só as observações posteriores à última data salva.
+    Retorna (serie, erro); com histórico local, uma falha na atualização devolve a versão armazenada.
+    """
+    nome_base = f'bcb_sgs_{codigo}'
+    armazenada = ler_parquet(nome_base)
+    armazenada = armazenada['valor'] if armazenada is not None and not armazenada.empty else None
+    try:
+        if armazenada is None:
+            novos = executar_com_retentativas(chamar_fonte, 'bcb', f'{codigo}|historico', sgs.get, {'valor': codigo}, start=DATA_INICIAL_BCB)['valor']
+        else:
+            # O SGS responde com erro a intervalos sem observações; pedir as últimas N sempre retorna dados.
+            # N cobre o tempo desde a última observação, na periodicidade típica da série.
+            espacamento = max(armazenada.index.to_series().diff().median().days, 1) if len(armazenada) > 1 else 1
+            faltantes = (pd.Timestamp(datetime.now().date()) - armazenada.index.max()).days // espacamento + 1
+            if faltantes <= MAX_ULTIMAS_BCB:
+                novos = executar_com_retentativas(chamar_fonte, 'bcb', f'{codigo}|ultimas', sgs.get, {'valor': codigo}, last=int(faltantes))['valor']
+            else:
+                inicio = (armazenada.index.max() + timedelta(days=1)).strftime('%Y-%m-%d')
+                novos = executar_com_retentativas(chamar_fonte, 'bcb', f'{codigo}|incremental', sgs.get, {'valor': codigo}, start=inicio)['valor']
+    except Exception as e:
+        return armazenada, (e if armazenada is None else None)
+    serie = novos if armazenada is None else pd.concat([armazenada, novos[novos.index > armazenada.index.max()]])
+    if armazenada is None or len(serie) > len(armazenada):
+        salvar_parquet(serie.to_frame('valor'), nome_base)
+    return serie, None
+
+@instrumentar('bcb')
 def carregar_dados_bcb():
-    SERIES_CONFIG = {'Spread Bancário': {'id': 20783}, 'Inadimplência': {'id': 21082}, 'Crédito/PIB': {'id': 20622}, 'Juros Médio': {'id': 20714}, 'Confiança Consumidor': {'id': 4393}, 'IPCA': {'id': 16122}, 'Atraso 15-90d Total': {'id': 21006}, 'Atraso 15-90d Agro': {'id': 21069}, 'Inadimplência Crédito Rural': {'id': 21146}}
+    return obter_dataset('bcb_sgs', _carregar_dados_bcb, validade=3600*4, inicial=_bcb_do_snapshot)
+
+def _bcb_do_snapshot():
+    # Snapshot publicado pelo pipeline offline (python -m pipeline bcb)
+    df, _ = ler_snapshot('bcb')
+    if df is None: return None
+    return df, {nome: SERIES_CONFIG[nome] for nome in df.columns if nome in SERIES_CONFIG}
+
+def _carregar_dados_bcb():
+    with ThreadPoolExecutor(max_workers=MAX_CONEXOES_BCB) as executor:
+        futuros = {name: executor.submit(_atualizar_serie_bcb, config['id']) for name, config in SERIES_CONFIG.items()}
     lista_dfs_sucesso, config_sucesso = [], {}
-    for name, config in SERIES_CONFIG.items():
-        try:
-            df_temp = sgs.get({name: config['id']}, start='2010-01-01')
-            lista_dfs_sucesso.append(df_temp)
-            config_sucesso[name] = config
-        except Exception as e:
-            st.warning(f"Não foi possível carregar o indicador '{name}': {e}")
+    for name, futuro in futuros.items():
+        serie, erro = futuro.result()
+        if serie is None:
+            interface_carga().warning(f"Não foi possível carregar o indicador '{name}': {erro}")
+            continue
+        lista_dfs_sucesso.append(serie.rename(name).to_frame())
+        config_sucesso[name] = SERIES_CONFIG[name]
     if not lista_dfs_sucesso:
         return pd.DataFrame(), {}
     df_full = pd.concat(lista_dfs_sucesso, axis=1)
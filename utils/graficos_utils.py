@@ -0,0 +1,113 @@
+import time
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+# --- Redução de pontos no servidor para séries longas (LTTB / mínimo-máximo por balde) ---
+# O trecho recente (a janela exibida por padrão) permanece em resolução total; só o histórico
+# anterior é reduzido a um orçamento de pontos por trace, diminuindo o JSON enviado ao navegador.
+PONTOS_POR_TRACE = 1000
+DIAS_RESOLUCAO_TOTAL = 365
+
+def indices_minmax(y, n_pontos):
+    """Índices do mínimo e do máximo de cada balde (em ordem), totalmente vetorizado."""
+    n = len(y)
+    n_baldes = max(n_pontos // 2, 1)
+    if n <= n_pontos: return np.arange(n)
+    tamanho = int(np.ceil(n / n_baldes))
+    preenchido = np.full(n_baldes * tamanho, np.nan)
+    preenchido[:n] = y
+    baldes = preenchido.reshape(n_baldes, tamanho)
+    validos = ~np.isnan(baldes).all(axis=1)
+    base = np.arange(n_baldes)[validos] * tamanho
+    minimos = base + np.nanargmin(baldes[validos], axis=1)
+    maximos = base + np.nanargmax(baldes[validos], axis=1)
+    return np.unique(np.concatenate([minimos, maximos]))
+
+def indices_lttb(x, y, n_pontos):
+    """
+    Largest-Triangle-Three-Buckets: mantém o primeiro e o último ponto e, em cada balde intermediário,
+    o ponto que forma o maior triângulo com o ponto escolhido no balde anterior e a média do próximo.
+    A área é calculada de forma vetorizada dentro de cada balde.
+    """
+    n = len(y)
+    if n <= n_pontos or n_pontos < 3: return np.arange(n)
+    x, y = np.asarray(x, dtype='float64'), np.asarray(y, dtype='float64')
+    limites = np.linspace(1, n - 1, n_pontos - 1).astype(int)
+    escolhidos = np.empty(n_pontos, dtype=int)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    anterior = 0
+    for i in range(n_pontos - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        prox_inicio, prox_fim = fim, limites[i + 2] if i + 2 < len(limites) else n
+        media_x, media_y = x[prox_inicio:prox_fim].mean(), y[prox_inicio:prox_fim].mean()
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior]) - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        escolhidos[i + 1] = anterior
+    return escolhidos
+
+def indices_reduzidos(x, y, max_pontos=PONTOS_POR_TRACE, inicio_resolucao_total=None, metodo='lttb'):
+    """Índices (em ordem) que `reduzir_pontos` mantém: a seleção do trecho antigo mais todo o trecho recente."""
+    x, y = np.asarray(x), np.asarray(y, dtype='float64')
+    recente = np.zeros(len(x), dtype=bool) if inicio_resolucao_total is None else x >= np.datetime64(inicio_resolucao_total)
+    antigo = np.flatnonzero(~recente & ~np.isnan(y))
+    if len(antigo) <= max_pontos: return np.arange(len(x))
+    x_num = x[antigo].astype('datetime64[ns]').astype('int64') if np.issubdtype(x.dtype, np.datetime64) else x[antigo]
+    selecao = indices_lttb(x_num, y[antigo], max_pontos) if metodo == 'lttb' else indices_minmax(y[antigo], max_pontos)
+    return np.concatenate([antigo[selecao], np.flatnonzero(recente)])
+
+def reduzir_pontos(x, y, max_pontos=PONTOS_POR_TRACE, inicio_resolucao_total=None, metodo='lttb'):
+    """
+    Reduz (x, y) para no máximo `max_pontos` pontos antes de `inicio_resolucao_total`, mantendo todos
+    os pontos a partir dessa data. Pontos com y ausente são descartados no trecho reduzido.
+    """
+    x, y = np.asarray(x), np.asarray(y, dtype='float64')
+    manter = indices_reduzidos(x, y, max_pontos, inicio_resolucao_total, metodo)
+    return x[manter], y[manter]
+
+def reduzir_serie(serie, max_pontos=PONTOS_POR_TRACE, dias_resolucao_total=DIAS_RESOLUCAO_TOTAL, metodo='lttb'):
+    if serie.empty: return serie
+    inicio = serie.index.max() - pd.Timedelta(days=dias_resolucao_total)
+    x, y = reduzir_pontos(serie.index.values, serie.values, max_pontos, inicio, metodo)
+    return pd.Series(y, index=pd.DatetimeIndex(x), name=serie.name)
+
+def reduzir_figura(fig, max_pontos=PONTOS_POR_TRACE, dias_resolucao_total=DIAS_RESOLUCAO_TOTAL, metodo='lttb'):
+    """
+    Aplica a redução a todos os traces de linha com eixo x de datas da figura (in place) e a retorna.
+    Um trace preenchido até o anterior (fill='tonexty', ex.: bandas de Bollinger) é reduzido junto com ele, nos
+    mesmos índices (a união das seleções de cada um), para a área ser desenhada entre pontos correspondentes.
+    """
+    grupos, anterior = [], None
+    for posicao, trace in enumerate(fig.data):
+        if trace.type not in ('scatter', 'scattergl') or trace.x is None or trace.y is None: continue
+        x = np.asarray(trace.x)
+        if not np.issubdtype(x.dtype, np.datetime64):
+            try:
+                x = pd.to_datetime(x).values
+            except (ValueError, TypeError):
+                continue
+        preenche_anterior = (trace.fill or '').startswith('tonext')
+        if preenche_anterior and anterior is not None and anterior[0] == posicao - 1 and np.array_equal(anterior[1], x):
+            grupos[-1][1].append(trace)
+        else:
+            grupos.append((x, [trace]))
+        anterior = (posicao, x)
+    for x, grupo in grupos:
+        if len(x) <= max_pontos: continue
+        inicio = x.max() - np.timedelta64(dias_resolucao_total, 'D')
+        # O orçamento de pontos é dividido no grupo: a união não passa de `max_pontos` no trecho antigo
+        pontos = max(max_pontos // len(grupo), 3)
+        manter = np.unique(np.concatenate([indices_reduzidos(x, trace.y, pontos, inicio, metodo) for trace in grupo]))
+        for trace in grupo:
+            trace.x, trace.y = x[manter], np.asarray(trace.y, dtype='float64')[manter]
+    return fig
+
+def medir_figura(gerar, *args, serializar=False, **kwargs):
+    """
+    Gera a figura e retorna (figura, segundos de construção, bytes do JSON serializado).
+    Serializar custa quase tanto quanto o próprio st.plotly_chart: o tamanho só é calculado com `serializar=True`.
+    """
+    inicio = time.perf_counter()
+    fig = gerar(*args, **kwargs)
+    segundos = time.perf_counter() - inicio
+    return fig, segundos, (len(pio.to_json(fig, validate=False).encode('utf-8')) if serializar else None)
@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import threading
+import functools
+from collections import deque
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+from utils.armazenamento_utils import caminho_dados
+
+# --- Instrumentação dos carregadores, cálculos e gráficos ---
+# Cada chamada instrumentada vira um evento (latência, linhas, bytes recebidos, acerto/falha do st.cache_data,
+# tamanho do JSON da figura) em um buffer circular por processo, lido pela página de Diagnóstico.
+# Chamadas às bibliotecas de dados pelo transporte viram eventos 'transporte.<fonte>' com o tamanho da resposta.
+# MOBBT_INSTRUMENTACAO=0 desliga a camada: os decoradores devolvem as funções originais.
+# Medir o JSON das figuras é serializá-las de novo a cada chamada, então fica desligado até ser pedido
+# (MOBBT_MEDIR_PAYLOAD=1 ou o interruptor da página de Diagnóstico, que vale para o processo).
+ATIVA = os.environ.get('MOBBT_INSTRUMENTACAO', '1') != '0'
+CONFIG = {'medir_payload': os.environ.get('MOBBT_MEDIR_PAYLOAD', '0') == '1'}
+TAMANHO_BUFFER = 5000
+PERCENTIS = (50, 90, 99)
+
+_eventos = deque(maxlen=TAMANHO_BUFFER)
+_trava = threading.Lock()
+_execucao = threading.local()
+
+def registrar_evento(funcao, fonte, segundos, **medidas):
+    evento = {'momento': time.time(), 'funcao': funcao, 'fonte': fonte, 'segundos': segundos,
+              'linhas': None, 'bytes': None, 'cache': None, 'payload_bytes': None, 'erro': None}
+    evento.update(medidas)
+    with _trava: _eventos.append(evento)
+
+def _linhas(resultado):
+    if isinstance(resultado, (pd.DataFrame, pd.Series)): return len(resultado)
+    if isinstance(resultado, dict): return sum(_linhas(v) or 0 for v in resultado.values()) or None
+    if isinstance(resultado, tuple) and resultado: return _linhas(resultado[0])
+    return None
+
+def _bytes(resultado):
+    if isinstance(resultado, tuple) and resultado: resultado = resultado[0]
+    return len(resultado) if isinstance(resultado, (bytes, bytearray)) else None
+
+def configurar_instrumentacao(medir_payload=None):
+    if medir_payload is not None: CONFIG['medir_payload'] = bool(medir_payload)
+
+def _payload(resultado):
+    if not CONFIG['medir_payload']: return None
+    figuras = [resultado] if isinstance(resultado, go.Figure) else [r for r in resultado if isinstance(r, go.Figure)] if isinstance(resultado, tuple) else []
+    if not figuras: return None
+    return sum(len(pio.to_json(fig, validate=False).encode('utf-8')) for fig in figuras)
+
+def _nome(funcao):
+    return f"{funcao.__module__.replace('utils.', '')}.{funcao.__name__}"
+
+def _instrumentada(funcao, fonte, chamar, cache=False):
+    nome = _nome(funcao)
+    @functools.wraps(funcao)
+    def chamada(*args, **kwargs):
+        # Pilha por thread: chamadas instrumentadas aninhadas não confundem o acerto/falha umas das outras
+        pilha = _execucao.__dict__.setdefault('pilha', [])
+        pilha.append({'executou': False})
+        inicio = time.perf_counter()
+        try:
+            resultado = chamar(*args, **kwargs)
+        except Exception as e:
+            registrar_evento(nome, fonte, time.perf_counter() - inicio, erro=repr(e))
+            raise
+        finally:
+            marcador = pilha.pop()
+        segundos = time.perf_counter() - inicio
+        registrar_evento(nome, fonte, segundos, linhas=_linhas(resultado), bytes=_bytes(resultado), payload_bytes=_payload(resultado),
+                         cache=('falha' if marcador['executou'] else 'acerto') if cache else None)
+        return resultado
+    # __wrapped__ aponta para a função original, sem cache nem instrumentação (usado pelos benchmarks)
+    chamada.__wrapped__ = funcao
+    return chamada
+
+def instrumentar(fonte):
+    """Decorador para carregadores, cálculos e gráficos sem st.cache_data."""
+    def decorador(funcao):
+        return _instrumentada(funcao, fonte, funcao) if ATIVA else funcao
+    return decorador
+
+def cache_instrumentado(fonte, **opcoes_cache):
+    """Substitui @st.cache_data(**opcoes_cache), registrando também se cada chamada foi acerto ou falha de cache."""
+    def decorador(funcao):
+        if not ATIVA: return st.cache_data(**opcoes_cache)(funcao)
+        @functools.wraps(funcao)
+        def corpo(*args, **kwargs):
+            pilha = _execucao.__dict__.get('pilha')
+            if pilha: pilha[-1]['executou'] = True
+            return funcao(*args, **kwargs)
+        em_cache = st.cache_data(**opcoes_cache)(corpo)
+        chamada = _instrumentada(funcao, fonte, em_cache, cache=True)
+        chamada.clear = em_cache.clear
+        return chamada
+    return decorador
+
+def eventos():
+    with _trava: return pd.DataFrame(list(_eventos))
+
+def limpar_eventos():
+    with _trava: _eventos.clear()
+
+def resumo_eventos(df_eventos, por='funcao'):
+    """Percentis de latência e médias de volume agrupados por `por` ('funcao' ou 'fonte')."""
+    if df_eventos.empty: return pd.DataFrame()
+    grupos = df_eventos.groupby(por)
+    resumo = pd.DataFrame({'chamadas': grupos.size()})
+    for p in PERCENTIS:
+        resumo[f'p{p} (ms)'] = grupos['segundos'].quantile(p / 100) * 1000
+    resumo['total (s)'] = grupos['segundos'].sum()
+    com_cache = df_eventos.dropna(subset=['cache'])
+    resumo['acertos de cache (%)'] = (com_cache['cache'] == 'acerto').groupby(com_cache[por]).mean() * 100
+    resumo['linhas (média)'] = grupos['linhas'].mean()
+    resumo['bytes recebidos'] = grupos['bytes'].sum(min_count=1)
+    resumo['payload (KB, média)'] = grupos['payload_bytes'].mean() / 1024
+    resumo['erros'] = grupos['erro'].count()
+    return resumo.sort_values('total (s)', ascending=False)
+
+def exportar_eventos():
+    """Grava os eventos do buffer em JSON Lines no diretório de dados e retorna o caminho."""
+    caminho = caminho_dados('diagnostico', f"eventos_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+    with _trava: copia = list(_eventos)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        for evento in copia: f.write(json.dumps(evento, ensure_ascii=False, default=lambda v: v.item() if isinstance(v, np.generic) else str(v)) + '\n')
+    return caminho
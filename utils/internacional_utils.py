@@ -4,23 +4,64 @@ from fredapi import Fred
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from utils.armazenamento_utils import ler_parquet, salvar_parquet, ler_snapshot_em_dia
+from utils.rede_utils import executar_com_retentativas
+from utils.transporte_utils import chamar_fonte
+from utils.graficos_utils import reduzir_figura
+from utils.registro_dados_utils import obter_dataset
+from utils.instrumentacao_utils import instrumentar
 
-@st.cache_data(ttl=3600*4)
-def carregar_dados_fred(api_key, tickers_dict):
+MAX_CONEXOES_FRED = 4
+
+@instrumentar('fred')
+def obter_serie_fred(serie_id, api_key):
+    """
+    Série do FRED com o histórico armazenado localmente: só as observações posteriores à última data salva são pedidas.
+    Sem cache próprio: a validade é a do registro de datasets, que chama esta função a cada atualização.
+    """
+    nome_base = f'fred_{serie_id}'
+    armazenada = ler_parquet(nome_base)
+    armazenada = armazenada[serie_id] if armazenada is not None and not armazenada.empty else None
     fred = Fred(api_key=api_key)
+    if armazenada is None:
+        serie = executar_com_retentativas(chamar_fonte, 'fred', f'{serie_id}|historico', fred.get_series, serie_id)
+    else:
+        novos = executar_com_retentativas(chamar_fonte, 'fred', f'{serie_id}|incremental', fred.get_series, serie_id, observation_start=armazenada.index.max() + timedelta(days=1))
+        # Sem observações novas (fim de semana, feriado) o fredapi devolve uma Series vazia com RangeIndex
+        if novos.empty: return armazenada
+        novos.index = pd.to_datetime(novos.index)
+        novos = novos[novos.index > armazenada.index.max()]
+        if novos.empty: return armazenada
+        serie = pd.concat([armazenada, novos])
+    serie.name = serie_id
+    salvar_parquet(serie.to_frame(), nome_base)
+    return serie
+
+@instrumentar('fred')
+def carregar_dados_fred(api_key, tickers_dict):
+    """
+    Séries pedidas lado a lado. Cada série é um dataset próprio do registro (fred_<serie_id>): páginas que pedem
+    a mesma série compartilham uma única carga e uma única atualização, qualquer que seja o conjunto pedido.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    with ThreadPoolExecutor(max_workers=MAX_CONEXOES_FRED, initializer=lambda: add_script_run_ctx(ctx=ctx)) as executor:
+        futuros = {ticker: executor.submit(_obter_serie_registrada, ticker, api_key) for ticker in tickers_dict.keys()}
     lista_series = []
-    st.info("Carregando dados do FRED... (Cache de 4h)")
-    for ticker in tickers_dict.keys():
+    for ticker, futuro in futuros.items():
         try:
-            serie = fred.get_series(ticker)
-            serie.name = ticker
-            lista_series.append(serie)
+            lista_series.append(futuro.result())
         except Exception as e:
             st.warning(f"Não foi possível carregar o ticker '{ticker}' do FRED: {e}")
     if not lista_series:
         return pd.DataFrame()
     return pd.concat(lista_series, axis=1).ffill()
 
+def _obter_serie_registrada(serie_id, api_key):
+    return obter_dataset(f'fred_{serie_id}', lambda: obter_serie_fred(serie_id, api_key), validade=3600*4)
+
+@instrumentar('fred')
 def gerar_grafico_fred(df, ticker, titulo):
     if ticker not in df.columns or df[ticker].isnull().all():
         return go.Figure().update_layout(title_text=f"Dados para {ticker} não encontrados.")
@@ -42,13 +83,23 @@ def gerar_grafico_fred(df, ticker, titulo):
         min_y, max_y = filtered_series.min(), filtered_series.max()
         padding = (max_y - min_y) * 0.10 if (max_y - min_y) > 0 else 0.5
         fig.update_yaxes(range=[min_y - padding, max_y + padding])
-    return fig
+    return reduzir_figura(fig)
 
-def gerar_grafico_spread_br_eua(df_br, df_usa):
-    df_br.name = 'BR10Y'
+def calcular_spread_br_eua(df_br, df_usa):
+    df_br = df_br.rename('BR10Y')
     df_usa = df_usa['DGS10']
     df_merged = pd.merge(df_br, df_usa, left_index=True, right_index=True, how='inner')
     df_merged['Spread'] = df_merged['BR10Y'] - df_merged['DGS10']
+    return df_merged
+
+def obter_spread_br_eua(df_br, df_usa):
+    """Spread do snapshot do pipeline offline se ele cobre a última data comum às duas séries; senão, calculado."""
+    df = ler_snapshot_em_dia('spread_br_eua', df_br.index.intersection(df_usa.index).max())
+    return calcular_spread_br_eua(df_br, df_usa) if df is None else df
+
+@instrumentar('fred')
+def gerar_grafico_spread_br_eua(df_br, df_usa):
+    df_merged = obter_spread_br_eua(df_br, df_usa)
     fig = px.line(df_merged, y='Spread', title='Spread de Juros 10 Anos: NTN-B (Brasil) vs. Treasury (EUA)', template='plotly_dark')
     end_date = df_merged.index.max()
     buttons = []
@@ -67,4 +118,4 @@ def gerar_grafico_spread_br_eua(df_br, df_usa):
         min_y, max_y = filtered_series.min(), filtered_series.max()
         padding = (max_y - min_y) * 0.10 if (max_y - min_y) > 0 else 0.5
         fig.update_yaxes(range=[min_y - padding, max_y + padding])
-    return fig
+    return reduzir_figura(fig)
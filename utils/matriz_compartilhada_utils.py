@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.armazenamento_utils import caminho_dados, escrever_atomico
+
+# --- Matriz compartilhada (datas x tickers) em arquivos .npy mapeados em memória ---
+# Cada publicação grava uma nova versão em seu próprio diretório e só então troca, com os.replace, o
+# ponteiro ATUAL. Leitores mapeiam a versão apontada somente para leitura: todas as sessões e processos
+# compartilham as mesmas páginas do arquivo, sem cópia nem desserialização. Versões antigas são removidas
+# depois da troca (em POSIX, quem ainda as mapeia continua lendo até soltar o mapeamento).
+DIRETORIO_MATRIZES = 'matrizes'
+VERSOES_MANTIDAS = 2
+IDADE_TMP_ORFAO = 3600  # segundos; diretórios .tmp_ mais velhos são de publicações interrompidas
+
+def _diretorio_matriz(nome):
+    return os.path.dirname(caminho_dados(DIRETORIO_MATRIZES, nome, 'ATUAL'))
+
+def versao_atual(nome):
+    """Versão publicada de `nome` (None se nunca foi publicada)."""
+    try:
+        with open(os.path.join(_diretorio_matriz(nome), 'ATUAL'), 'r', encoding='utf-8') as f:
+            return json.load(f)['versao']
+    except (OSError, ValueError, KeyError):
+        return None
+
+def publicar_matriz(nome, df):
+    """Grava `df` como nova versão float32 de `nome` e a torna a atual atomicamente. Retorna a versão."""
+    diretorio = _diretorio_matriz(nome)
+    versao = pd.Timestamp.now().strftime('%Y%m%d%H%M%S%f')
+    tmp = tempfile.mkdtemp(dir=diretorio, prefix='.tmp_')
+    try:
+        np.save(os.path.join(tmp, 'valores.npy'), np.ascontiguousarray(df.to_numpy(dtype='float32')))
+        np.save(os.path.join(tmp, 'datas.npy'), pd.DatetimeIndex(df.index).to_numpy(dtype='datetime64[ns]'))
+        np.save(os.path.join(tmp, 'tickers.npy'), np.asarray(df.columns, dtype=str))
+        os.rename(tmp, os.path.join(diretorio, versao))
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    def _escrever(caminho_tmp):
+        with open(caminho_tmp, 'w', encoding='utf-8') as f: json.dump({'versao': versao}, f)
+    escrever_atomico(os.path.join(diretorio, 'ATUAL'), _escrever)
+
+    antigas = sorted(v for v in os.listdir(diretorio) if v.isdigit() and v != versao)
+    for antiga in antigas[:max(len(antigas) - (VERSOES_MANTIDAS - 1), 0)]:
+        shutil.rmtree(os.path.join(diretorio, antiga), ignore_errors=True)
+    _remover_tmp_orfaos(diretorio)
+    return versao
+
+def _remover_tmp_orfaos(diretorio):
+    # Publicações mortas no meio (processo encerrado antes do rename) deixam .tmp_ para trás; os recentes
+    # podem ser de uma publicação concorrente e ficam.
+    limite = time.time() - IDADE_TMP_ORFAO
+    for entrada in os.listdir(diretorio):
+        caminho = os.path.join(diretorio, entrada)
+        try:
+            if entrada.startswith('.tmp_') and os.path.getmtime(caminho) < limite:
+                shutil.rmtree(caminho, ignore_errors=True)
+        except OSError:
+            pass
+
+def abrir_matriz(nome, versao=None):
+    """DataFrame somente leitura sobre o arquivo mapeado da versão pedida (ou da atual); None se não existir."""
+    versao = versao or versao_atual(nome)
+    if versao is None: return None
+    diretorio = os.path.join(_diretorio_matriz(nome), versao)
+    try:
+        valores = np.load(os.path.join(diretorio, 'valores.npy'), mmap_mode='r')
+        datas = np.load(os.path.join(diretorio, 'datas.npy'))
+        tickers = np.load(os.path.join(diretorio, 'tickers.npy'))
+    except (OSError, ValueError):
+        return None
+    return pd.DataFrame(valores, index=pd.DatetimeIndex(datas), columns=tickers, copy=False)
+
+@st.cache_resource(max_entries=VERSOES_MANTIDAS)
+def _matriz_mapeada(nome, versao):
+    return abrir_matriz(nome, versao)
+
+def obter_matriz_compartilhada(nome):
+    """Matriz atual de `nome`, mapeada uma vez por processo e versão e compartilhada entre as sessões."""
+    versao = versao_atual(nome)
+    if versao is None: return None
+    df = _matriz_mapeada(nome, versao)
+    # O objeto em cache é o mesmo para todas as sessões: cada uma recebe sua própria visão (mesmo mapeamento,
+    # sem cópia dos valores), para que renomear ou atribuir colunas numa sessão não vaze para as outras
+    return None if df is None else df.copy(deep=False)
@@ -0,0 +1,111 @@
+import pandas as pd
+import yfinance as yf
+from datetime import datetime, timedelta
+from utils.armazenamento_utils import ler_parquet, salvar_parquet, ler_metadados, salvar_metadados
+from utils.instrumentacao_utils import instrumentar, cache_instrumentado
+from utils.transporte_utils import chamar_fonte
+
+# --- Armazém local de preços de fechamento (matriz datas x tickers) com downloads incrementais ---
+NOME_ARMAZEM_PRECOS = 'precos_acoes'
+TAMANHO_LOTE = 100
+DIAS_SOBREPOSICAO = 5
+DIAS_DEFASAGEM_ATIVO = 10
+TOLERANCIA_AJUSTE = 1e-4
+
+@instrumentar('yfinance')
+def baixar_fechamentos(tickers_sa, inicio, fim, ao_progredir=None):
+    """Baixa fechamentos ajustados em lotes de TAMANHO_LOTE. Retorna (matriz, lotes_com_falha)."""
+    fechamentos, falhas = [], []
+    total_lotes = max((len(tickers_sa) + TAMANHO_LOTE - 1) // TAMANHO_LOTE, 1)
+    # Para o transporte, histórico em anos e cauda recente são chamadas distintas: a gravação de uma atualização
+    # não toma o lugar da gravação da carga a frio dos mesmos tickers
+    janela = f"{round((fim - inicio).days / 365)}a" if (fim - inicio).days >= 365 else 'cauda'
+    for i, n in enumerate(range(0, len(tickers_sa), TAMANHO_LOTE)):
+        lote = tickers_sa[n:n+TAMANHO_LOTE]
+        try:
+            data = chamar_fonte('yfinance', f"{','.join(lote)}|{janela}", yf.download, lote, start=inicio, end=fim, auto_adjust=True, progress=False, threads=True)
+            if not data.empty:
+                if isinstance(data.columns, pd.MultiIndex):
+                    close_prices = data['Close']
+                elif 'Close' in data.columns:
+                    close_prices = data[['Close']].rename(columns={'Close': lote[0]})
+                else:
+                    close_prices = data
+                # float32 por lote: o concat final não passa por uma cópia float64 da matriz inteira
+                fechamentos.append(close_prices.astype('float32'))
+        except Exception as e:
+            falhas.append((i + 1, total_lotes, e))
+        if ao_progredir: ao_progredir(i + 1, total_lotes)
+    if not fechamentos:
+        return pd.DataFrame(dtype='float32'), falhas
+    matriz = pd.concat(fechamentos, axis=1)
+    return matriz.loc[:, ~matriz.columns.duplicated()].astype('float32', copy=False), falhas
+
+def _ultimas_datas(matriz):
+    ultimas = matriz.apply(pd.Series.last_valid_index)
+    return ultimas.dropna()
+
+def _tickers_ajustados(matriz, novos):
+    """Tickers cujo preço nas datas sobrepostas mudou: sinal de ajuste retroativo (proventos/desdobramentos).
+    O último pregão armazenado fica de fora, pois pode ter sido gravado com o pregão ainda em andamento."""
+    datas = matriz.index[:-1].intersection(novos.index)
+    colunas = matriz.columns.intersection(novos.columns)
+    if datas.empty or colunas.empty: return []
+    antigo, atual = matriz.loc[datas, colunas], novos.loc[datas, colunas]
+    diferenca = ((atual - antigo).abs() / antigo.abs()).max()
+    return diferenca[diferenca > TOLERANCIA_AJUSTE].index.tolist()
+
+def _tickers_sem_dados(pedidos, baixados, falhas):
+    """Tickers pedidos que o yfinance devolveu vazios. Os de lotes que falharam ficam de fora: são tentados de novo."""
+    em_lotes_com_falha = {t for lote, _, _ in falhas for t in pedidos[(lote - 1) * TAMANHO_LOTE:lote * TAMANHO_LOTE]}
+    return [t for t in pedidos if t not in baixados.columns and t not in em_lotes_com_falha]
+
+def atualizar_armazem_precos(tickers, anos_historico=15, dias_recarga_completa=7, ao_progredir=None):
+    """
+    Atualiza o armazém e retorna (matriz_de_precos, falhas). Tickers já armazenados e ativos recebem só
+    a cauda que falta; tickers novos (ou com histórico ajustado) recebem o histórico completo; a cada
+    `dias_recarga_completa` dias todo o universo é baixado novamente para capturar ajustes.
+    Tickers que vieram sem dados ficam registrados nos metadados e só são pedidos de novo na próxima recarga completa.
+    """
+    tickers_sa = [ticker + ".SA" for ticker in tickers]
+    data_final = datetime.now()
+    data_inicial = data_final - timedelta(days=anos_historico*365)
+    matriz = ler_parquet(NOME_ARMAZEM_PRECOS)
+    metadados = ler_metadados(NOME_ARMAZEM_PRECOS)
+
+    ultima_carga = pd.to_datetime(metadados.get('ultima_carga_completa'))
+    recarga_completa = (
+        matriz is None or matriz.empty or pd.isna(ultima_carga)
+        or data_final - ultima_carga > timedelta(days=dias_recarga_completa)
+        or metadados.get('anos_historico', 0) < anos_historico
+    )
+    if recarga_completa:
+        matriz, falhas = baixar_fechamentos(tickers_sa, data_inicial, data_final, ao_progredir)
+        if matriz.empty: return matriz, falhas
+        metadados['ultima_carga_completa'] = data_final.isoformat()
+        metadados['anos_historico'] = anos_historico
+        metadados['sem_dados'] = {t: data_final.isoformat() for t in _tickers_sem_dados(tickers_sa, matriz, falhas)}
+    else:
+        ultimas = _ultimas_datas(matriz)
+        data_mais_recente = ultimas.max()
+        ativos = [t for t in tickers_sa if t in ultimas.index and ultimas[t] >= data_mais_recente - timedelta(days=DIAS_DEFASAGEM_ATIVO)]
+        # Tickers fora da matriz (menos os já sabidos sem dados) são baixados por completo; os armazenados mas inativos esperam a recarga completa
+        sem_dados = metadados.get('sem_dados', {})
+        sem_historico = [t for t in tickers_sa if t not in matriz.columns and t not in sem_dados]
+        cauda, falhas = baixar_fechamentos(ativos, data_mais_recente - timedelta(days=DIAS_SOBREPOSICAO), data_final, ao_progredir)
+        ajustados = _tickers_ajustados(matriz, cauda)
+        completos, falhas_completos = baixar_fechamentos(sem_historico + ajustados, data_inicial, data_final)
+        falhas += falhas_completos
+        sem_dados.update({t: data_final.isoformat() for t in _tickers_sem_dados(sem_historico + ajustados, completos, falhas_completos) if t in sem_historico})
+        metadados['sem_dados'] = sem_dados
+        matriz = matriz.drop(columns=[t for t in ajustados if t in completos.columns])
+        for novos in (cauda.drop(columns=ajustados, errors='ignore'), completos):
+            if not novos.empty:
+                matriz = novos.combine_first(matriz)
+
+    matriz = matriz.loc[matriz.index >= pd.Timestamp(data_inicial).normalize()].sort_index().astype('float32')
+    salvar_parquet(matriz, NOME_ARMAZEM_PRECOS)
+    metadados['ultima_atualizacao'] = data_final.isoformat()
+    salvar_metadados(NOME_ARMAZEM_PRECOS, metadados)
+    colunas = [t for t in tickers_sa if t in matriz.columns]
+    return matriz[colunas], falhas
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+# --- Screener de ratios: z-scores de todos os N·(N-1)/2 pares de uma vez ---
+# Trabalha sobre a matriz de log-preços: o log do ratio A/B é a diferença dos log-preços, e a média e a
+# variância dessa diferença saem de produtos matriciais (somas, somas de quadrados e covariância cruzada)
+# restritos às datas em que os dois ativos têm preço. Os pares são processados em blocos de linhas para
+# limitar a memória, guardando só os mais esticados de cada bloco.
+TAMANHO_BLOCO_PARES = 256
+DIAS_PREENCHIMENTO_ATUAL = 5
+
+def _momentos_pares(log_precos, linhas):
+    """
+    Para os ativos `linhas` contra todos os ativos, retorna (n, media, desvio) do log-ratio em cada par,
+    considerando só as datas com preço nos dois ativos. Colunas centradas para evitar cancelamento numérico.
+    """
+    presente = ~np.isnan(log_precos)
+    centro = np.nanmean(log_precos, axis=0)
+    centro = np.where(np.isnan(centro), 0.0, centro)
+    x = np.where(presente, log_precos - centro, 0.0)
+    m = presente.astype('float64')
+    x_bloco, m_bloco = x[:, linhas], m[:, linhas]
+
+    n = m_bloco.T @ m
+    soma_a = x_bloco.T @ m                     # soma de A nas datas em que B existe
+    soma_b = m_bloco.T @ x                     # soma de B nas datas em que A existe
+    soma_quad = (x_bloco ** 2).T @ m + m_bloco.T @ (x ** 2) - 2 * (x_bloco.T @ x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = (soma_a - soma_b) / n
+        variancia = (soma_quad - n * media ** 2) / (n - 1)
+    desvio = np.sqrt(np.clip(variancia, 0, None))
+    # devolve a média no nível original (desfaz a centralização)
+    media = media + centro[linhas][:, None] - centro[None, :]
+    return n, media, desvio
+
+def calcular_ranking_pares(precos, janela=252, top_n=50, min_cobertura=0.8, tamanho_bloco=TAMANHO_BLOCO_PARES):
+    """
+    Ranking dos pares mais esticados de um universo de preços (datas x tickers).
+
+    Para cada par (A, B) com A antes de B nas colunas calcula o ratio atual A/B e dois z-scores do log-ratio:
+    contra a média/desvio móveis das últimas `janela` datas e contra a média/desvio de todo o histórico comum.
+    Z positivo indica A caro em relação a B. Pares com menos de `min_cobertura` da janela são descartados.
+    """
+    precos = precos.sort_index().dropna(axis=1, how='all')
+    precos = precos.loc[:, (precos > 0).any()]
+    tickers = precos.columns.to_numpy()
+    if len(tickers) < 2: return pd.DataFrame()
+
+    log_precos = np.log(precos.where(precos > 0).to_numpy(dtype='float64'))
+    atual = pd.DataFrame(log_precos).ffill(limit=DIAS_PREENCHIMENTO_ATUAL).to_numpy()[-1]
+    recente = log_precos[-janela:]
+    n_minimo = max(int(min_cobertura * min(janela, len(recente))), 2)
+
+    blocos = []
+    for inicio in range(0, len(tickers) - 1, tamanho_bloco):
+        linhas = np.arange(inicio, min(inicio + tamanho_bloco, len(tickers)))
+        n_movel, media_movel, desvio_movel = _momentos_pares(recente, linhas)
+        n_total, media_total, desvio_total = _momentos_pares(log_precos, linhas)
+        log_ratio = atual[linhas][:, None] - atual[None, :]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z_movel = (log_ratio - media_movel) / desvio_movel
+            z_total = (log_ratio - media_total) / desvio_total
+
+        i, j = np.nonzero(
+            (linhas[:, None] < np.arange(len(tickers))[None, :]) & (n_movel >= n_minimo)
+            & np.isfinite(z_movel) & np.isfinite(z_total)
+        )
+        if len(i) == 0: continue
+        # mantém só os top_n do bloco, o que limita a memória do ranking final
+        if len(i) > top_n:
+            selecao = np.argpartition(-np.abs(z_movel[i, j]), top_n - 1)[:top_n]
+            i, j = i[selecao], j[selecao]
+        blocos.append(pd.DataFrame({
+            'Ativo A': tickers[linhas[i]], 'Ativo B': tickers[j],
+            'Ratio Atual': np.exp(log_ratio[i, j]),
+            'Z Móvel': z_movel[i, j], 'Z Estático': z_total[i, j],
+            'Observações': n_total[i, j].astype(int),
+        }))
+
+    if not blocos: return pd.DataFrame()
+    ranking = pd.concat(blocos, ignore_index=True)
+    ranking = ranking.reindex(ranking['Z Móvel'].abs().sort_values(ascending=False).index).head(top_n)
+    return ranking.reset_index(drop=True)
+
+# --- Estatísticas móveis por somas prefixadas ---
+# Uma passada O(n) gera as somas acumuladas; a média e o desvio de qualquer janela saem de diferenças dessas
+# somas, sem refazer o rolling. Os valores são deslocados pela média da série antes de acumular, o que evita o
+# cancelamento catastrófico de sum(x²) - sum(x)²/n quando o nível da série é grande frente à sua variação.
+def somas_prefixadas(valores):
+    valores = np.asarray(valores, dtype='float64')
+    validos = ~np.isnan(valores)
+    deslocamento = valores[validos].mean() if validos.any() else 0.0
+    centrados = np.where(validos, valores - deslocamento, 0.0)
+    return {
+        'deslocamento': deslocamento,
+        'soma': np.concatenate(([0.0], np.cumsum(centrados))),
+        'soma_quad': np.concatenate(([0.0], np.cumsum(centrados ** 2))),
+        'contagem': np.concatenate(([0], np.cumsum(validos))),
+    }
+
+def media_desvio_movel(somas, janela):
+    """Média e desvio (ddof=1) móveis a partir das somas prefixadas; NaN onde a janela não tem `janela` valores, como no rolling do pandas."""
+    total = len(somas['contagem']) - 1
+    media, desvio = np.full(total, np.nan), np.full(total, np.nan)
+    if janela > total: return media, desvio
+    n = (somas['contagem'][janela:] - somas['contagem'][:-janela]).astype('float64')
+    soma = somas['soma'][janela:] - somas['soma'][:-janela]
+    soma_quad = somas['soma_quad'][janela:] - somas['soma_quad'][:-janela]
+    completos = n >= janela
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media_centrada = soma / n
+        variancia = np.clip(soma_quad - soma * media_centrada, 0, None) / (n - 1)
+    media[janela - 1:] = np.where(completos, media_centrada + somas['deslocamento'], np.nan)
+    desvio[janela - 1:] = np.where(completos, np.sqrt(variancia), np.nan)
+    return media, desvio
@@ -0,0 +1,59 @@
+import time
+import random
+import requests
+from utils.transporte_utils import GravacaoAusente, url_efetiva, conferir_resposta, gravar_resposta
+from utils.instrumentacao_utils import instrumentar, cache_instrumentado
+
+TIMEOUT_PADRAO = 60
+CABECALHOS_VALIDACAO = ('ETag', 'Last-Modified')
+
+def _validadores(headers):
+    return {nome: headers[nome] for nome in CABECALHOS_VALIDACAO if headers.get(nome)}
+
+@instrumentar('rede')
+def baixar_se_modificado(url, metadados=None, timeout=TIMEOUT_PADRAO):
+    """
+    Baixa `url` apenas se o recurso mudou desde `metadados` (ETag/Last-Modified salvos anteriormente).
+    Retorna (conteudo, novos_metadados); conteudo é None quando o arquivo não mudou, o que custa um único HEAD.
+    Passa pelo transporte: no modo 'reproduzir' a requisição vai ao servidor local de gravações.
+    """
+    metadados = metadados or {}
+    destino = url_efetiva(url)
+    validadores_salvos = _validadores(metadados)
+    if validadores_salvos:
+        try:
+            resposta_head = requests.head(destino, timeout=timeout, allow_redirects=True)
+            resposta_head.raise_for_status()
+            validadores_atuais = _validadores(resposta_head.headers)
+            if validadores_atuais and validadores_atuais == validadores_salvos:
+                return None, metadados
+        except requests.RequestException:
+            pass
+
+    cabecalhos = {}
+    if 'ETag' in validadores_salvos: cabecalhos['If-None-Match'] = validadores_salvos['ETag']
+    if 'Last-Modified' in validadores_salvos: cabecalhos['If-Modified-Since'] = validadores_salvos['Last-Modified']
+    resposta = requests.get(destino, headers=cabecalhos, timeout=timeout)
+    if resposta.status_code == 304:
+        return None, metadados
+    conferir_resposta(url, resposta)
+    resposta.raise_for_status()
+    tamanho_esperado = resposta.headers.get('Content-Length')
+    if tamanho_esperado and not resposta.headers.get('Content-Encoding') and int(tamanho_esperado) != len(resposta.content):
+        raise IOError(f"Download incompleto de {url}: {len(resposta.content)} de {tamanho_esperado} bytes")
+    gravar_resposta(url, resposta)
+    return resposta.content, _validadores(resposta.headers)
+
+def executar_com_retentativas(funcao, *args, tentativas=3, espera_inicial=1.0, **kwargs):
+    """
+    Chama `funcao` repetindo em caso de exceção, com espera exponencial (e um pouco de aleatoriedade) entre as tentativas.
+    A falta de uma gravação na reprodução não se resolve esperando: sobe na primeira tentativa.
+    """
+    for tentativa in range(tentativas):
+        try:
+            return funcao(*args, **kwargs)
+        except GravacaoAusente:
+            raise
+        except Exception:
+            if tentativa == tentativas - 1: raise
+            time.sleep(espera_inicial * (2 ** tentativa) * random.uniform(0.8, 1.2))
@@ -0,0 +1,146 @@
+import time
+import itertools
+import threading
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# --- Registro de datasets por processo, sem cópias ---
+# Diferente do st.cache_data, que serializa o resultado e entrega uma cópia desserializada a cada rerun,
+# o registro guarda uma única instância por processo e entrega visões rasas: com o Copy-on-Write do pandas,
+# o chamador pode alterar a sua visão (colunas novas, valores) sem tocar no dado registrado.
+# Cada registro recebe uma versão nova, útil como chave de cache de cálculos derivados.
+_datasets = {}
+_travas = {}
+_trava_registro = threading.Lock()
+_contador_versoes = itertools.count(1)
+
+# Visões rasas só são isoladas com Copy-on-Write (padrão a partir do pandas 3); sem ele, cada sessão recebe uma cópia
+COPIA_RASA_SEGURA = int(pd.__version__.split('.')[0]) >= 3 or pd.get_option('mode.copy_on_write') is True
+
+def _visao(valor):
+    if isinstance(valor, (pd.DataFrame, pd.Series)): return valor.copy(deep=not COPIA_RASA_SEGURA)
+    if isinstance(valor, dict): return {chave: _visao(v) for chave, v in valor.items()}
+    if isinstance(valor, tuple): return tuple(_visao(v) for v in valor)
+    return valor
+
+def _trava(nome):
+    with _trava_registro:
+        return _travas.setdefault(nome, threading.Lock())
+
+# --- Atualização em segundo plano (stale-while-revalidate) ---
+# Vencida a validade de um dataset, quem o pede recebe na hora a versão atual e uma thread recarrega a fonte;
+# a nova versão só substitui a anterior se a carga der certo. Um agendador por processo faz o mesmo
+# periodicamente para todas as fontes já usadas, de modo que normalmente nenhum usuário encontra dado vencido.
+FRACAO_VALIDADE_ATUALIZACAO = 0.9
+ESPERA_APOS_FALHA = 300
+INTERVALO_AGENDADOR = 60
+_agendador = {'thread': None}
+
+def _valido(valor):
+    if valor is None: return False
+    if isinstance(valor, (pd.DataFrame, pd.Series, dict)): return len(valor) > 0
+    if isinstance(valor, tuple): return len(valor) > 0 and _valido(valor[0])
+    return True
+
+def registrar_dataset(nome, valor, carregar=None, validade=None):
+    """Registra `valor` como a versão atual de `nome` e retorna o id da versão."""
+    versao = next(_contador_versoes)
+    agora = time.monotonic()
+    anterior = _datasets.get(nome, {})
+    carregar = carregar or anterior.get('carregar')
+    validade = validade if validade is not None else anterior.get('validade')
+    _datasets[nome] = {
+        'valor': valor, 'versao': versao, 'registrado_em': agora, 'carregar': carregar, 'validade': validade,
+        'proxima_atualizacao': None if validade is None else agora + validade * FRACAO_VALIDADE_ATUALIZACAO,
+    }
+    return versao
+
+def versao_dataset(nome):
+    registro = _datasets.get(nome)
+    return registro['versao'] if registro else None
+
+def idade_dataset(nome):
+    """Segundos desde o registro da versão atual (None se não registrado)."""
+    registro = _datasets.get(nome)
+    return time.monotonic() - registro['registrado_em'] if registro else None
+
+def _precisa_atualizar(registro):
+    return registro['carregar'] is not None and registro['proxima_atualizacao'] is not None and time.monotonic() >= registro['proxima_atualizacao']
+
+def atualizar_em_segundo_plano(nome):
+    """Recarrega `nome` em uma thread, se já não houver uma carga em andamento. Retorna a thread (ou None)."""
+    registro = _datasets.get(nome)
+    trava = _trava(nome)
+    if registro is None or registro['carregar'] is None or not trava.acquire(blocking=False): return None
+    def _executar():
+        try:
+            try:
+                valor = registro['carregar']()
+            except Exception:
+                valor = None
+            if _valido(valor):
+                registrar_dataset(nome, valor)
+            else:
+                # carga falhou ou veio vazia: segue servindo a versão anterior e tenta de novo mais tarde
+                registro['proxima_atualizacao'] = time.monotonic() + ESPERA_APOS_FALHA
+        finally:
+            trava.release()
+    thread = threading.Thread(target=_executar, daemon=True, name=f'atualizador-{nome}')
+    thread.start()
+    return thread
+
+# --- Mensagens dos carregadores ---
+# Recargas em segundo plano (e o pipeline offline) correm sem ScriptRunContext: st.info, st.progress e afins ali
+# não chegam a nenhuma sessão e só enchem o log de avisos "missing ScriptRunContext". Os carregadores escrevem
+# pela interface_carga(), que fora de uma sessão descarta as mensagens.
+class _InterfaceMuda:
+    def __getattr__(self, nome): return self._ignorar
+    def _ignorar(self, *args, **kwargs): return self
+    def __enter__(self): return self
+    def __exit__(self, *excecao): return False
+
+_INTERFACE_MUDA = _InterfaceMuda()
+
+def interface_carga():
+    """`st` quando a thread atende uma sessão; fora dela, um substituto que ignora mensagens e barras de progresso."""
+    return st if get_script_run_ctx(suppress_warning=True) is not None else _INTERFACE_MUDA
+
+def _executar_agendador():
+    while True:
+        time.sleep(INTERVALO_AGENDADOR)
+        for nome, registro in list(_datasets.items()):
+            if _precisa_atualizar(registro): atualizar_em_segundo_plano(nome)
+
+def _garantir_agendador():
+    with _trava_registro:
+        if _agendador['thread'] is None:
+            _agendador['thread'] = threading.Thread(target=_executar_agendador, daemon=True, name='agendador-datasets')
+            _agendador['thread'].start()
+
+def obter_dataset(nome, carregar=None, validade=None, inicial=None):
+    """
+    Visão da versão atual de `nome`. Sem versão registrada, carrega com `carregar` (sessões concorrentes esperam
+    uma única carga); se `inicial` for informado e devolver dados (ex.: a cópia local), eles são servidos na hora
+    e a carga corre em segundo plano. Com a validade vencida, a versão atual é servida e a recarga vai para uma thread.
+    """
+    if carregar is not None: _garantir_agendador()
+    registro = _datasets.get(nome)
+    if registro is None and carregar is not None:
+        with _trava(nome):
+            registro = _datasets.get(nome)
+            if registro is None:
+                valor_inicial = inicial() if inicial is not None else None
+                if _valido(valor_inicial):
+                    registrar_dataset(nome, valor_inicial, carregar, validade)
+                    _datasets[nome]['proxima_atualizacao'] = time.monotonic()
+                else:
+                    registrar_dataset(nome, carregar(), carregar, validade)
+                registro = _datasets[nome]
+    if registro is None: return None
+    if carregar is not None: registro['carregar'] = carregar
+    if _precisa_atualizar(registro): atualizar_em_segundo_plano(nome)
+    return _visao(registro['valor'])
+
+def descartar_dataset(nome):
+    _datasets.pop(nome, None)
@@ -1,62 +1,93 @@
-import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+import io
+from utils.armazenamento_utils import ler_parquet, salvar_parquet, ler_metadados, salvar_metadados, ler_snapshot_em_dia
+from utils.rede_utils import baixar_se_modificado
+from utils.graficos_utils import reduzir_figura
+from utils.registro_dados_utils import obter_dataset, interface_carga
+from utils.instrumentacao_utils import instrumentar, cache_instrumentado
 
-@st.cache_data(ttl=3600*4)
+URL_TESOURO = 'https://www.tesourotransparente.gov.br/ckan/dataset/df56aa42-484a-4a59-8184-7676580c81e3/resource/796d2059-14e9-44e3-80c9-2d9e30b405c1/download/precotaxatesourodireto.csv'
+NOME_BASE_TESOURO = 'tesouro_direto'
+
+def _converter_datas(coluna):
+    # O CSV repete poucas datas milhões de vezes: converte só os valores únicos e mapeia de volta
+    datas_unicas = pd.unique(coluna)
+    mapa = pd.Series(pd.to_datetime(datas_unicas, format='%d/%m/%Y'), index=datas_unicas)
+    return coluna.map(mapa)
+
+def _atualizar_base_tesouro():
+    """
+    Atualiza a base local em Parquet. Sem mudança na origem (mesmo ETag/Last-Modified) não há download nem parse;
+    quando o arquivo muda, a base é substituída pelo CSV inteiro, já que a origem pode corrigir linhas antigas.
+    """
+    df_local = ler_parquet(NOME_BASE_TESOURO)
+    metadados = ler_metadados(NOME_BASE_TESOURO) if df_local is not None else {}
+    conteudo, novos_metadados = baixar_se_modificado(URL_TESOURO, metadados)
+    if conteudo is None:
+        return df_local
+
+    df = pd.read_csv(io.BytesIO(conteudo), sep=';', decimal=',')
+    df['Data Base'] = _converter_datas(df['Data Base'])
+    df['Data Vencimento'] = _converter_datas(df['Data Vencimento'])
+    df['Tipo Titulo'] = df['Tipo Titulo'].astype('category')
+    salvar_parquet(df, NOME_BASE_TESOURO)
+    salvar_metadados(NOME_BASE_TESOURO, novos_metadados)
+    return df
+
+@instrumentar('tesouro')
 def obter_dados_tesouro():
-    url = 'https://www.tesourotransparente.gov.br/ckan/dataset/df56aa42-484a-4a59-8184-7676580c81e3/resource/796d2059-14e9-44e3-80c9-2d9e30b405c1/download/precotaxatesourodireto.csv'
-    st.info("Carregando dados do Tesouro Direto... (Cache de 4h)")
+    return obter_dataset(NOME_BASE_TESOURO, _carregar_dados_tesouro, validade=3600*4, inicial=lambda: ler_parquet(NOME_BASE_TESOURO))
+
+def _carregar_dados_tesouro():
+    tela = interface_carga()
+    tela.info("Carregando dados do Tesouro Direto... (Cache de 4h)")
     try:
-        df = pd.read_csv(url, sep=';', decimal=',')
-        df['Data Vencimento'] = pd.to_datetime(df['Data Vencimento'], format='%d/%m/%Y')
-        df['Data Base'] = pd.to_datetime(df['Data Base'], format='%d/%m/%Y')
-        df['Tipo Titulo'] = df['Tipo Titulo'].astype('category')
-        return df
+        return _atualizar_base_tesouro()
     except Exception as e:
-        st.error(f"Erro ao baixar dados do Tesouro: {e}")
+        df_local = ler_parquet(NOME_BASE_TESOURO)
+        if df_local is not None:
+            tela.warning(f"Falha ao atualizar dados do Tesouro, exibindo a última versão local: {e}")
+            return df_local
+        tela.error(f"Erro ao baixar dados do Tesouro: {e}")
         return pd.DataFrame()
 
-@st.cache_data
+def calcular_taxas_vencimento_constante(df_tesouro, tipos_titulo, prazos_anos=(10,), coluna='Taxa Compra Manha'):
+    """
+    Série de vencimento constante: para cada Data Base e prazo, a taxa do título cujo vencimento
+    é o mais próximo de Data Base + prazo. Resolve todas as datas e prazos em uma única passada
+    (merge_asof ordenado por vencimento) em vez de filtrar o DataFrame dia a dia.
+    Em empates (dois vencimentos equidistantes do alvo) prevalece o vencimento mais curto.
+    Retorna um DataFrame indexado por Data Base com uma coluna por prazo (em anos).
+    """
+    if isinstance(tipos_titulo, str): tipos_titulo = [tipos_titulo]
+    df = df_tesouro.loc[df_tesouro['Tipo Titulo'].isin(tipos_titulo), ['Data Base', 'Data Vencimento', coluna]]
+    if df.empty: return pd.DataFrame(columns=list(prazos_anos), dtype=float)
+    df = df.drop_duplicates(subset=['Data Base', 'Data Vencimento'], keep='first').sort_values('Data Vencimento', kind='stable')
+
+    datas_base = pd.DatetimeIndex(df['Data Base'].unique()).sort_values()
+    alvos = pd.concat([
+        pd.DataFrame({'Data Base': datas_base, 'Prazo': prazo, 'Alvo': datas_base + pd.DateOffset(years=prazo)})
+        for prazo in prazos_anos
+    ], ignore_index=True).sort_values('Alvo', kind='stable')
+
+    combinado = pd.merge_asof(alvos, df, left_on='Alvo', right_on='Data Vencimento', by='Data Base', direction='nearest')
+    resultado = combinado.pivot(index='Data Base', columns='Prazo', values=coluna).sort_index()
+    resultado.index.name, resultado.columns.name = None, None
+    return resultado[list(prazos_anos)]
+
+@cache_instrumentado('tesouro')
 def calcular_juro_real_10a_br(df_tesouro):
-    df_ntnb = df_tesouro[df_tesouro['Tipo Titulo'] == 'Tesouro IPCA+ com Juros Semestrais'].copy()
-    if df_ntnb.empty: return pd.Series(dtype=float)
-    resultados = {}
-    for data_base in df_ntnb['Data Base'].unique():
-        df_dia = df_ntnb[df_ntnb['Data Base'] == data_base]
-        vencimentos_do_dia = df_dia['Data Vencimento'].unique()
-        if len(vencimentos_do_dia) > 0:
-            target_10y = pd.to_datetime(data_base) + pd.DateOffset(years=10)
-            venc_10y = min(vencimentos_do_dia, key=lambda d: abs(d - target_10y))
-            taxa = df_dia[df_dia['Data Vencimento'] == venc_10y]['Taxa Compra Manha'].iloc[0]
-            resultados[data_base] = taxa
-    return pd.Series(resultados).sort_index()
-
-@st.cache_data
+    return calcular_taxas_vencimento_constante(df_tesouro, 'Tesouro IPCA+ com Juros Semestrais', (10,))[10].rename(None)
+
+@cache_instrumentado('tesouro')
 def calcular_juro_prefixado_10a_br(df_tesouro):
     """Calcula a série histórica do juro prefixado para o vencimento mais próximo de 10 anos."""
-    df_prefixado = df_tesouro[df_tesouro['Tipo Titulo'] == 'Tesouro Prefixado'].copy()
-    if df_prefixado.empty: return pd.Series(dtype=float)
-    
-    resultados = {}
-    datas_base = df_prefixado['Data Base'].unique()
-    
-    for data_base in datas_base:
-        df_dia = df_prefixado[df_prefixado['Data Base'] == data_base]
-        vencimentos_do_dia = df_dia['Data Vencimento'].unique()
-        
-        if len(vencimentos_do_dia) > 0:
-            target_10y = pd.to_datetime(data_base) + pd.DateOffset(years=10)
-            
-            # Encontra o vencimento mais próximo de 10 anos
-            venc_10y_proximo = min(vencimentos_do_dia, key=lambda d: abs(d - target_10y))
-            
-            taxa = df_dia[df_dia['Data Vencimento'] == venc_10y_proximo]['Taxa Compra Manha'].iloc[0]
-            resultados[data_base] = taxa
-            
-    return pd.Series(resultados).sort_index()
+    return calcular_taxas_vencimento_constante(df_tesouro, 'Tesouro Prefixado', (10,))[10].rename(None)
 
+@instrumentar('tesouro')
 def gerar_grafico_ntnb_multiplos_vencimentos(df_ntnb_all, vencimentos, metrica):
     fig = go.Figure()
     if not vencimentos:
@@ -85,9 +116,9 @@ def gerar_grafico_ntnb_multiplos_vencimentos(df_ntnb_all, vencimentos, metrica):
         end_date = df_ntnb_all['Data Base'].max()
         start_date = end_date - pd.DateOffset(years=5)
         fig.update_xaxes(range=[start_date, end_date])
-    return fig
+    return reduzir_figura(fig, dias_resolucao_total=5*365)
 
-@st.cache_data
+@cache_instrumentado('tesouro')
 def calcular_inflacao_implicita(df):
     df_recente = df[df['Data Base'] == df['Data Base'].max()].copy()
     tipos_ipca = ['Tesouro IPCA+ com Juros Semestrais', 'Tesouro IPCA+']
@@ -105,6 +136,21 @@ def calcular_inflacao_implicita(df):
     if not inflacao_implicita: return pd.DataFrame()
     return pd.DataFrame(inflacao_implicita).sort_values('Vencimento do Prefixo').set_index('Vencimento do Prefixo')
 
+# --- Séries derivadas: snapshot do pipeline offline quando em dia com a base, cálculo como alternativa ---
+def obter_juro_real_10a_br(df_tesouro):
+    df = ler_snapshot_em_dia('juro_real_10a', df_tesouro['Data Base'].max())
+    return calcular_juro_real_10a_br(df_tesouro) if df is None else df['juro_real_10a'].rename(None)
+
+def obter_juro_prefixado_10a_br(df_tesouro):
+    df = ler_snapshot_em_dia('juro_prefixado_10a', df_tesouro['Data Base'].max())
+    return calcular_juro_prefixado_10a_br(df_tesouro) if df is None else df['juro_prefixado_10a'].rename(None)
+
+def obter_inflacao_implicita(df_tesouro):
+    # O snapshot é indexado por vencimento; a Data Base de referência vai em uma coluna
+    df = ler_snapshot_em_dia('inflacao_implicita', df_tesouro['Data Base'].max(), coluna='Data Base')
+    return calcular_inflacao_implicita(df_tesouro) if df is None else df.drop(columns='Data Base')
+
+@instrumentar('tesouro')
 def gerar_grafico_ettj_curto_prazo(df):
     df_prefixado = df[df['Tipo Titulo'] == 'Tesouro Prefixado'].copy()
     if df_prefixado.empty: return go.Figure().update_layout(title_text="Não há dados para 'Tesouro Prefixado'.")
@@ -128,6 +174,7 @@ def gerar_grafico_ettj_curto_prazo(df):
     fig.update_layout(title_text='Curva de Juros (ETTJ) - Curto Prazo (últimos 5 dias)', title_x=0, xaxis_title='Dias Úteis até o Vencimento', yaxis_title='Taxa (% a.a.)', template='plotly_dark', legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
     return fig
 
+@instrumentar('tesouro')
 def gerar_grafico_ettj_longo_prazo(df):
     df_prefixado = df[df['Tipo Titulo'] == 'Tesouro Prefixado'].copy()
     if df_prefixado.empty: return go.Figure().update_layout(title_text="Não há dados para 'Tesouro Prefixado'.")
@@ -151,6 +198,7 @@ def gerar_grafico_ettj_longo_prazo(df):
     fig.update_layout(title_text='Curva de Juros (ETTJ) - Longo Prazo (Comparativo Histórico)', title_x=0, xaxis_title='Dias Úteis até o Vencimento', yaxis_title='Taxa (% a.a.)', template='plotly_dark', legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
     return fig
 
+@instrumentar('tesouro')
 def gerar_grafico_juro_real_10a_br(series_juro_10a):
     """Gera um gráfico de linha para a série de juros de 10 anos do Brasil."""
     if series_juro_10a.empty:
@@ -183,8 +231,9 @@ def gerar_grafico_juro_real_10a_br(series_juro_10a):
         padding = (max_y - min_y) * 0.10 if (max_y - min_y) > 0 else 0.5
         fig.update_yaxes(range=[min_y - padding, max_y + padding])
 
-    return fig
+    return reduzir_figura(fig)
 
+@instrumentar('tesouro')
 def gerar_grafico_juro_prefixado_10a_br(series_juro_10a):
     """Gera um gráfico de linha para a série de juros prefixados de 10 anos do Brasil."""
     if series_juro_10a.empty:
@@ -217,4 +266,4 @@ def gerar_grafico_juro_prefixado_10a_br(series_juro_10a):
         padding = (max_y - min_y) * 0.10 if (max_y - min_y) > 0 else 0.5
         fig.update_yaxes(range=[min_y - padding, max_y + padding])
 
-    return fig
+    return reduzir_figura(fig)
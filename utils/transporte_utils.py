@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import ipaddress
+import threading
+import requests
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from email.utils import parsedate_to_datetime
+from utils.armazenamento_utils import escrever_atomico
+from utils import instrumentacao_utils
+
+# --- Transporte gravar/reproduzir das fontes externas ---
+# MOBBT_TRANSPORTE escolhe o modo: 'real' (padrão) acessa as fontes; 'gravar' acessa e guarda cada resposta
+# em MOBBT_FIXTURES; 'reproduzir' não sai da máquina: tudo vem das gravações, servidas por um servidor HTTP local
+# com latência e banda configuráveis (MOBBT_SERVIDOR_REPLAY aponta para um já em execução; sem ele, um servidor
+# é iniciado no próprio processo com MOBBT_REPLAY_LATENCIA_MS e MOBBT_REPLAY_BANDA_KBPS).
+# Downloads HTTP (Tesouro, CVM, JGP) são gravados como respostas, com ETag/Last-Modified, e o servidor local
+# responde às requisições condicionais como a origem. Fontes acessadas por bibliotecas (SGS, FRED, yfinance)
+# são gravadas no nível da chamada: o resultado vai serializado e trafega pelo mesmo servidor.
+# O identificador de uma chamada deixa de fora datas e chaves de API: a gravação mais recente de cada
+# identificador é reproduzida em qualquer dia, e os carregadores já descartam o que veio a mais.
+MODOS = ('real', 'gravar', 'reproduzir')
+CONFIG = {
+    'modo': os.environ.get('MOBBT_TRANSPORTE', 'real'),
+    'servidor': os.environ.get('MOBBT_SERVIDOR_REPLAY'),
+    'fixtures': os.environ.get('MOBBT_FIXTURES', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.mobbt_fixtures')),
+    'latencia_ms': float(os.environ.get('MOBBT_REPLAY_LATENCIA_MS', '0')),
+    'banda_kbps': float(os.environ.get('MOBBT_REPLAY_BANDA_KBPS', '0')),
+}
+CABECALHOS_GRAVADOS = ('Content-Type', 'ETag', 'Last-Modified')
+TAMANHO_BLOCO_ENVIO = 64 * 1024
+_servidor_local = {'servidor': None, 'url': None}
+_trava_servidor = threading.Lock()
+# Identificadores pedidos na reprodução sem gravação, inclusive os que o carregador engoliu (lido pelo teste de carga)
+_gravacoes_ausentes = []
+
+class GravacaoAusente(LookupError):
+    """Chamada sem gravação no modo 'reproduzir'. Não é falha de rede: repetir não adianta, e quem faz retentativas a repassa."""
+
+def configurar_transporte(modo=None, **opcoes):
+    """Altera o modo e as opções do transporte no processo atual (o padrão vem das variáveis de ambiente)."""
+    if modo is not None:
+        if modo not in MODOS: raise ValueError(f"Modo de transporte desconhecido: {modo} (use {', '.join(MODOS)})")
+        CONFIG['modo'] = modo
+    CONFIG.update(opcoes)
+
+def modo_transporte():
+    return CONFIG['modo']
+
+def chave_fixture(tipo, identificador):
+    return hashlib.sha256(f'{tipo}|{identificador}'.encode('utf-8')).hexdigest()[:24]
+
+def _caminhos(chave):
+    base = os.path.join(CONFIG['fixtures'], chave)
+    return f'{base}.json', f'{base}.bin'
+
+def salvar_fixture(tipo, identificador, conteudo, fonte=None, status=200, cabecalhos=None):
+    chave = chave_fixture(tipo, identificador)
+    caminho_meta, caminho_conteudo = _caminhos(chave)
+    os.makedirs(CONFIG['fixtures'], exist_ok=True)
+    def _escrever_conteudo(caminho_tmp):
+        with open(caminho_tmp, 'wb') as f: f.write(conteudo)
+    def _escrever_meta(caminho_tmp):
+        meta = {'tipo': tipo, 'identificador': identificador, 'fonte': fonte, 'status': status,
+                'cabecalhos': cabecalhos or {}, 'bytes': len(conteudo), 'gravado_em': time.time()}
+        with open(caminho_tmp, 'w', encoding='utf-8') as f: json.dump(meta, f, ensure_ascii=False, indent=2)
+    # conteúdo antes dos metadados: uma fixture só "existe" quando o seu .json aparece
+    escrever_atomico(caminho_conteudo, _escrever_conteudo)
+    escrever_atomico(caminho_meta, _escrever_meta)
+    return chave
+
+def ler_fixture(chave):
+    """(metadados, conteudo) da gravação, ou (None, None) se não existir."""
+    caminho_meta, caminho_conteudo = _caminhos(chave)
+    if not os.path.exists(caminho_meta): return None, None
+    with open(caminho_meta, 'r', encoding='utf-8') as f: meta = json.load(f)
+    with open(caminho_conteudo, 'rb') as f: conteudo = f.read()
+    return meta, conteudo
+
+def listar_fixtures():
+    if not os.path.isdir(CONFIG['fixtures']): return []
+    metas = []
+    for arquivo in sorted(os.listdir(CONFIG['fixtures'])):
+        if arquivo.endswith('.json'):
+            with open(os.path.join(CONFIG['fixtures'], arquivo), 'r', encoding='utf-8') as f: metas.append(json.load(f))
+    return metas
+
+# --- Servidor local que reproduz as gravações ---
+class _ManipuladorReplay(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _nao_modificado(self, cabecalhos):
+        etag = self.headers.get('If-None-Match')
+        if etag: return etag == cabecalhos.get('ETag')
+        desde, modificado = self.headers.get('If-Modified-Since'), cabecalhos.get('Last-Modified')
+        if desde and modificado:
+            try:
+                return parsedate_to_datetime(modificado) <= parsedate_to_datetime(desde)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _responder(self, com_corpo):
+        time.sleep(self.server.latencia)
+        meta, conteudo = ler_fixture(self.path.strip('/').split('/')[-1])
+        if meta is None:
+            self.send_response(404); self.send_header('Content-Length', '0'); self.end_headers()
+            return
+        cabecalhos = meta['cabecalhos']
+        if self._nao_modificado(cabecalhos):
+            self.send_response(304)
+            for nome, valor in cabecalhos.items():
+                if nome != 'Content-Type': self.send_header(nome, valor)
+            self.send_header('Content-Length', '0'); self.end_headers()
+            return
+        self.send_response(meta['status'])
+        for nome, valor in cabecalhos.items(): self.send_header(nome, valor)
+        self.send_header('Content-Length', str(len(conteudo)))
+        self.end_headers()
+        if not com_corpo: return
+        for inicio in range(0, len(conteudo), TAMANHO_BLOCO_ENVIO):
+            bloco = conteudo[inicio:inicio + TAMANHO_BLOCO_ENVIO]
+            self.wfile.write(bloco)
+            if self.server.banda: time.sleep(len(bloco) / self.server.banda)
+
+    def do_GET(self):
+        self._responder(com_corpo=True)
+
+    def do_HEAD(self):
+        self._responder(com_corpo=False)
+
+def iniciar_servidor_replay(porta=0, latencia_ms=0, banda_kbps=0, host='127.0.0.1'):
+    """Sobe o servidor de reprodução em uma thread. Retorna (servidor, url_base); servidor.shutdown() encerra."""
+    servidor = ThreadingHTTPServer((host, porta), _ManipuladorReplay)
+    servidor.daemon_threads = True
+    servidor.latencia = latencia_ms / 1000
+    servidor.banda = banda_kbps * 1000 / 8 if banda_kbps else None
+    threading.Thread(target=servidor.serve_forever, daemon=True, name='servidor-replay').start()
+    return servidor, f'http://{host}:{servidor.server_address[1]}'
+
+def _local(host):
+    if host == 'localhost': return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def _url_servidor():
+    if CONFIG['servidor']:
+        # Só servidores na própria máquina: a reprodução não deve depender do que um host remoto responde
+        if not _local(urlparse(CONFIG['servidor']).hostname or ''):
+            raise ValueError(f"MOBBT_SERVIDOR_REPLAY deve apontar para o loopback (localhost/127.0.0.1/::1): {CONFIG['servidor']}")
+        return CONFIG['servidor'].rstrip('/')
+    with _trava_servidor:
+        if _servidor_local['servidor'] is None:
+            _servidor_local['servidor'], _servidor_local['url'] = iniciar_servidor_replay(latencia_ms=CONFIG['latencia_ms'], banda_kbps=CONFIG['banda_kbps'])
+        return _servidor_local['url']
+
+# --- Pontos de entrada usados pelos carregadores ---
+def url_efetiva(url):
+    """No modo 'reproduzir', a URL equivalente no servidor local; nos demais, a própria URL."""
+    if CONFIG['modo'] != 'reproduzir': return url
+    return f"{_url_servidor()}/http/{chave_fixture('http', url)}"
+
+def gravacoes_ausentes():
+    return list(_gravacoes_ausentes)
+
+def _sem_gravacao(identificador):
+    _gravacoes_ausentes.append(identificador)
+    return GravacaoAusente(f"Sem gravação para {identificador}")
+
+def conferir_resposta(url, resposta):
+    """No modo 'reproduzir', um 404 do servidor local significa que `url` não foi gravada: GravacaoAusente."""
+    if CONFIG['modo'] == 'reproduzir' and resposta.status_code == 404: raise _sem_gravacao(url)
+
+def gravar_resposta(url, resposta, fonte=None):
+    """No modo 'gravar', guarda uma resposta completa (status 200) do `requests` para `url`."""
+    if CONFIG['modo'] != 'gravar' or resposta.status_code != 200: return
+    cabecalhos = {nome: resposta.headers[nome] for nome in CABECALHOS_GRAVADOS if resposta.headers.get(nome)}
+    salvar_fixture('http', url, resposta.content, fonte=fonte or urlparse(url).hostname, cabecalhos=cabecalhos)
+
+def chamar_fonte(fonte, identificador, funcao, *args, **kwargs):
+    """
+    Chama `funcao(*args, **kwargs)` de uma biblioteca de acesso a dados passando pelo transporte.
+    `identificador` descreve a chamada de forma estável (sem datas nem chaves de API).
+    """
+    modo = CONFIG['modo']
+    inicio = time.perf_counter()
+    if modo == 'real':
+        resultado = funcao(*args, **kwargs)
+        if instrumentacao_utils.ATIVA: _registrar_resposta(fonte, inicio, len(pickle.dumps(resultado, protocol=pickle.HIGHEST_PROTOCOL)))
+        return resultado
+    identificador = f'{fonte}|{identificador}'
+    if modo == 'gravar':
+        resultado = funcao(*args, **kwargs)
+        conteudo = pickle.dumps(resultado, protocol=pickle.HIGHEST_PROTOCOL)
+        salvar_fixture('objeto', identificador, conteudo, fonte=fonte, cabecalhos={'Content-Type': 'application/octet-stream'})
+        _registrar_resposta(fonte, inicio, len(conteudo))
+        return resultado
+    chave = chave_fixture('objeto', identificador)
+    resposta = requests.get(f"{_url_servidor()}/objeto/{chave}", timeout=60)
+    if resposta.status_code == 404: raise _sem_gravacao(identificador)
+    resposta.raise_for_status()
+    # A resposta só reproduz o custo da transferência: o objeto vem da cópia local da gravação, nunca de bytes
+    # recebidos pela rede (pickle.loads de conteúdo alheio executaria código)
+    _, conteudo = ler_fixture(chave)
+    if conteudo is None: raise _sem_gravacao(identificador)
+    _registrar_resposta(fonte, inicio, len(resposta.content))
+    return pickle.loads(conteudo)
+
+def _registrar_resposta(fonte, inicio, tamanho):
+    # As bibliotecas (sgs, FRED, yfinance) não expõem o corpo HTTP: o tamanho registrado é o do resultado serializado
+    instrumentacao_utils.registrar_evento(f'transporte.{fonte}', 'transporte', time.perf_counter() - inicio, bytes=tamanho)
@@ -0,0 +1,109 @@
+import time
+import numpy as np
+import pandas as pd
+import requests
+import yfinance as yf
+from yfinance.exceptions import YFRateLimitError
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from utils.armazenamento_utils import ler_parquet, salvar_parquet
+from utils.precos_utils import NOME_ARMAZEM_PRECOS, baixar_fechamentos
+from utils.transporte_utils import GravacaoAusente, chamar_fonte
+
+# --- Valor de mercado = ações em circulação (cache local com validade) x último fechamento ---
+# Evita o yf.Ticker(...).info completo, a chamada mais lenta e mais sujeita a limite de requisições do yfinance.
+NOME_BASE_ACOES_CIRCULACAO = 'acoes_em_circulacao'
+VALIDADE_ACOES_CIRCULACAO = timedelta(days=7)
+# Tickers sem a informação (deslistados, inválidos) ficam no cache como falha e só são tentados de novo depois disso
+VALIDADE_FALHA_ACOES = timedelta(days=1)
+DIAS_FECHAMENTO_RECENTE = 10
+WORKERS_INICIAIS, WORKERS_MINIMOS, WORKERS_MAXIMOS = 8, 1, 16
+MAX_RODADAS = 4
+
+def _buscar_acoes_em_circulacao(ticker_sa):
+    # fast_info.shares consulta apenas a série de ações em circulação, não o scrape completo de .info
+    return int(chamar_fonte('yfinance', f'{ticker_sa}|acoes', lambda: yf.Ticker(ticker_sa).fast_info['shares']))
+
+def _tipo_falha(erro):
+    """'limite' (limite de requisições), 'transitoria' (rede) ou 'inexistente' (o ticker não tem o dado)."""
+    if isinstance(erro, YFRateLimitError) or '429' in str(erro) or 'Too Many Requests' in str(erro): return 'limite'
+    if isinstance(erro, (requests.ConnectionError, requests.Timeout, TimeoutError, ConnectionError)): return 'transitoria'
+    return 'inexistente'
+
+def _buscar_com_concorrencia_adaptativa(tickers_sa, ao_progredir=None):
+    """
+    Busca as ações em circulação em rodadas: se uma rodada tem muitas falhas por limite de requisições,
+    o número de workers cai pela metade e há uma pausa; rodadas limpas aumentam o paralelismo.
+    Falhas por limite ou de rede são tentadas de novo na rodada seguinte, até MAX_RODADAS; tickers sem o dado
+    não são repetidos. Retorna (resultados, inexistentes).
+    """
+    resultados, inexistentes, pendentes, workers = {}, [], list(tickers_sa), WORKERS_INICIAIS
+    total = len(tickers_sa)
+    for rodada in range(MAX_RODADAS):
+        if not pendentes: break
+        repetir, limitados = [], 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futuros = {ticker: executor.submit(_buscar_acoes_em_circulacao, ticker) for ticker in pendentes}
+            for ticker, futuro in futuros.items():
+                try:
+                    resultados[ticker] = futuro.result()
+                    if ao_progredir: ao_progredir(len(resultados), total)
+                except GravacaoAusente:
+                    # Na reprodução, falta de gravação não é limite, rede nem ticker sem o dado
+                    raise
+                except Exception as e:
+                    tipo = _tipo_falha(e)
+                    if tipo == 'inexistente':
+                        inexistentes.append(ticker)
+                        continue
+                    limitados += tipo == 'limite'
+                    repetir.append(ticker)
+        if limitados > 0.2 * len(pendentes):
+            workers = max(WORKERS_MINIMOS, workers // 2)
+            time.sleep(2 ** rodada)
+        else:
+            workers = min(WORKERS_MAXIMOS, workers + 2)
+        pendentes = repetir
+    return resultados, inexistentes
+
+def obter_acoes_em_circulacao(tickers_sa, ao_progredir=None):
+    """
+    Ações em circulação por ticker, buscando no yfinance apenas os ausentes ou vencidos no cache local.
+    Tickers sem o dado ficam registrados como falha (acoes NaN) por VALIDADE_FALHA_ACOES.
+    """
+    cache = ler_parquet(NOME_BASE_ACOES_CIRCULACAO)
+    if cache is None: cache = pd.DataFrame({'acoes': pd.Series(dtype='float64'), 'atualizado_em': pd.Series(dtype='datetime64[ns]')})
+    agora = datetime.now()
+    validade = np.where(cache['acoes'].isna(), agora - VALIDADE_FALHA_ACOES, agora - VALIDADE_ACOES_CIRCULACAO)
+    validos = cache[cache['atualizado_em'] >= validade]
+    faltantes = [t for t in tickers_sa if t not in validos.index]
+    if faltantes:
+        novos, inexistentes = _buscar_com_concorrencia_adaptativa(faltantes, ao_progredir)
+        if novos or inexistentes:
+            acoes = pd.Series(novos, dtype='float64').reindex(list(novos) + inexistentes)
+            df_novos = pd.DataFrame({'acoes': acoes, 'atualizado_em': pd.Timestamp(agora)})
+            cache = pd.concat([cache.drop(index=df_novos.index, errors='ignore'), df_novos])
+            salvar_parquet(cache, NOME_BASE_ACOES_CIRCULACAO)
+    return cache['acoes'].reindex(tickers_sa)
+
+def obter_ultimos_fechamentos(tickers_sa):
+    """Último fechamento de cada ticker, reaproveitando o armazém de preços e baixando em lote só o que faltar."""
+    data_limite = pd.Timestamp(datetime.now() - timedelta(days=DIAS_FECHAMENTO_RECENTE))
+    fechamentos = pd.Series(np.nan, index=pd.Index(tickers_sa), dtype='float64')
+    armazem = ler_parquet(NOME_ARMAZEM_PRECOS)
+    if armazem is not None:
+        recentes = armazem.loc[armazem.index >= data_limite, armazem.columns.intersection(tickers_sa)].ffill()
+        if not recentes.empty: fechamentos.update(recentes.iloc[-1].astype('float64'))
+    faltantes = fechamentos.index[fechamentos.isna()].tolist()
+    if faltantes:
+        baixados, _ = baixar_fechamentos(faltantes, data_limite, datetime.now())
+        if not baixados.empty: fechamentos.update(baixados.ffill().iloc[-1].astype('float64'))
+    return fechamentos
+
+def obter_valores_de_mercado(tickers, ao_progredir=None):
+    """Valor de mercado (ações em circulação x último fechamento) por ticker da B3, sem o sufixo .SA."""
+    tickers = [t for t in dict.fromkeys(tickers) if isinstance(t, str)]
+    tickers_sa = [f"{t.strip()}.SA" for t in tickers]
+    if not tickers_sa: return {}
+    valores = obter_acoes_em_circulacao(tickers_sa, ao_progredir) * obter_ultimos_fechamentos(tickers_sa)
+    return dict(zip(tickers, valores.values))